@@ -1,15 +1,21 @@
 """
 AI Client abstraction layer for HVAC Analysis Backend.
-Supports both Ollama (via OpenAI-compatible API) and Google Gemini.
+Supports both Ollama (via OpenAI-compatible or native API) and Google Gemini.
 """
 import base64
 import asyncio
-from typing import List, Dict, Any, Optional
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Tuple, Union
+import httpx
 from openai import AsyncOpenAI, OpenAIError
 from google import genai
 from google.genai import types
 from backend.config import get_settings
-from backend.utils import logger
+from backend.usage import record_usage
+from backend.utils import estimate_token_count, logger
 
 
 # Define custom exceptions for AI provider errors
@@ -38,6 +44,66 @@ class AIInvalidRequestError(AIProviderError):
     pass
 
 
+def to_data_url(image: Union[str, bytes], mime_type: str = "image/png") -> str:
+    """Return image (raw bytes or already a data URL) as a base64 data URL."""
+    if isinstance(image, bytes):
+        return f"data:{mime_type};base64,{base64.b64encode(image).decode('ascii')}"
+    return image
+
+
+def from_data_url(image: Union[str, bytes], mime_type: str = "image/png") -> Tuple[bytes, str]:
+    """Return (raw bytes, MIME type) of an image given as bytes, a data URL or bare base64."""
+    if isinstance(image, bytes):
+        return image, mime_type
+    if "data:" in image:
+        header_part = image.split(",")[0]
+        if ";" in header_part:
+            mime_type = header_part.split(":")[1].split(";")[0]
+        _, image = image.split("base64,", 1)
+    return base64.b64decode(image), mime_type
+
+
+def _openai_usage(usage: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens of an OpenAI-compatible response's usage block."""
+    if usage is None:
+        return None
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+
+def _ollama_usage(body: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens of a native Ollama response (the final chunk when streaming)."""
+    if "prompt_eval_count" not in body and "eval_count" not in body:
+        return None
+    return body.get("prompt_eval_count") or 0, body.get("eval_count") or 0
+
+
+def _gemini_usage(metadata: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens of Gemini usage metadata; thinking tokens are billed as output."""
+    if metadata is None:
+        return None
+    return (
+        metadata.prompt_token_count or 0,
+        (metadata.candidates_token_count or 0) + (getattr(metadata, "thoughts_token_count", None) or 0)
+    )
+
+
+def _prompt_text(messages_or_contents: Any) -> str:
+    """Text of chat messages or Gemini contents, for estimating prompt tokens."""
+    if isinstance(messages_or_contents, str):
+        return messages_or_contents
+    texts = []
+    for item in messages_or_contents:
+        if isinstance(item, str):
+            content = item
+        else:
+            content = item.get("content") if isinstance(item, dict) else getattr(item, "text", None)
+        if isinstance(content, list):
+            texts += [part.get("text", "") for part in content if isinstance(part, dict)]
+        elif isinstance(content, str):
+            texts.append(content)
+    return "\n".join(texts)
+
+
 class AIClient:
     """Unified AI client that works with both Ollama and Gemini."""
     
@@ -45,14 +111,33 @@ class AIClient:
         # Get fresh settings on each initialization
         settings = get_settings()
         self.provider = settings.ai_provider.lower()
+        self.ollama_url = settings.ollama_native_url()
+        
+        # One keep-alive connection pool for all Ollama traffic (chat, streaming, /api/model)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.ollama_max_connections,
+                max_keepalive_connections=settings.ollama_max_keepalive_connections,
+                keepalive_expiry=settings.ollama_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(settings.api_timeout, connect=10.0)
+        )
         
         if self.provider == "ollama":
             self.client = AsyncOpenAI(
                 base_url=settings.ollama_base_url,
-                api_key=settings.ollama_api_key
+                api_key=settings.ollama_api_key,
+                http_client=self.http_client
             )
             self.model_name = settings.model_name
-            logger.info(f"Initialized Ollama client with model: {self.model_name}")
+            self.ollama_native = settings.ollama_api_mode == "native"
+            # Fixed per process: a different num_ctx makes Ollama reload the model
+            self.ollama_options = {"num_ctx": settings.ollama_context_length()}
+            self.ollama_keep_alive = settings.ollama_keep_alive
+            logger.info(
+                f"Initialized Ollama client with model: {self.model_name} "
+                f"({settings.ollama_api_mode} API, num_ctx={self.ollama_options['num_ctx']})"
+            )
             
         elif self.provider == "gemini":
             if not settings.gemini_api_key or settings.gemini_api_key == "your-gemini-api-key-here" or settings.gemini_api_key == "":
@@ -60,11 +145,30 @@ class AIClient:
             
             self.client = genai.Client(api_key=settings.gemini_api_key)
             self.model_name = settings.gemini_model
+            # Only used when the SDK has no async client; never the event loop's default executor
+            self.gemini_executor: Optional[ThreadPoolExecutor] = None
+            self.gemini_executor_workers = settings.gemini_executor_workers
             logger.info(f"Initialized Gemini client with model: {self.model_name}")
             
         else:
             raise ValueError(f"Unsupported AI provider: {self.provider}. Use 'ollama' or 'gemini'")
     
+    def _record_usage(
+        self,
+        usage: Optional[Tuple[int, int]],
+        prompt: Any = "",
+        completion: str = ""
+    ) -> None:
+        """Count a call's tokens as reported by the provider, or estimated from its text if none were reported."""
+        if usage is not None:
+            record_usage(self.provider, self.model_name, *usage)
+        else:
+            # Streams closed early (stop conditions) never receive the final usage block
+            record_usage(
+                self.provider, self.model_name,
+                estimate_token_count(_prompt_text(prompt)), estimate_token_count(completion), estimated=True
+            )
+    
     def _handle_gemini_error(self, error: Exception) -> None:
         """
         Convert Gemini API errors to custom exceptions for better handling.
@@ -115,10 +219,12 @@ class AIClient:
     async def generate_with_image(
         self,
         prompt: str,
-        image_data_url: str,
+        image_data_url: str = "",
         max_tokens: int = 2000,
         temperature: float = 0.0,
-        system_instruction: Optional[str] = None
+        system_instruction: Optional[str] = None,
+        image_bytes: Optional[bytes] = None,
+        image_mime_type: str = "image/png"
     ) -> str:
         """
         Generate text from image and prompt.
@@ -129,27 +235,97 @@ class AIClient:
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             system_instruction: Optional system instruction
+            image_bytes: Raw image bytes, used instead of image_data_url when set
+            image_mime_type: MIME type of image_bytes
             
         Returns:
             Generated text response
         """
         if self.provider == "ollama":
+            if image_bytes is not None:
+                # Both Ollama APIs take base64 (the OpenAI-compatible one as a data URL): encode once, here
+                image_data_url = to_data_url(image_bytes, image_mime_type)
             return await self._generate_ollama_with_image(
                 prompt, image_data_url, max_tokens, temperature, system_instruction
             )
         elif self.provider == "gemini":
             return await self._generate_gemini_with_image(
-                prompt, image_data_url, max_tokens, temperature, system_instruction
+                prompt, image_data_url, max_tokens, temperature, system_instruction,
+                image_bytes, image_mime_type
             )
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
     
+    async def generate_with_images(
+        self,
+        prompt: str,
+        images: List[Union[str, bytes]],
+        image_mime_types: Optional[List[str]] = None,
+        max_tokens: int = 2000,
+        temperature: float = 0.0,
+        system_instruction: Optional[str] = None
+    ) -> str:
+        """
+        Generate text from several images (in order) and one prompt.
+        
+        Args:
+            prompt: Text prompt covering all images
+            images: Data URLs or raw image bytes
+            image_mime_types: MIME type per raw image (default image/png)
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_instruction: Optional system instruction
+            
+        Returns:
+            Generated text response
+        """
+        mime_types = image_mime_types or ["image/png"] * len(images)
+        if self.provider == "ollama":
+            messages = []
+            if system_instruction:
+                messages.append({"role": "system", "content": system_instruction})
+            data_urls = [to_data_url(image, mime) for image, mime in zip(images, mime_types)]
+            if self.ollama_native:
+                messages.append({
+                    "role": "user", "content": prompt,
+                    "images": [url.partition("base64,")[2] for url in data_urls]
+                })
+                return await self._ollama_chat(messages, max_tokens, temperature)
+            messages.append({"role": "user", "content": [{"type": "text", "text": prompt}] + [
+                {"type": "image_url", "image_url": {"url": url}} for url in data_urls
+            ]})
+            resp = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            self._record_usage(_openai_usage(getattr(resp, "usage", None)), messages, resp.choices[0].message.content)
+            return resp.choices[0].message.content
+        elif self.provider == "gemini":
+            try:
+                full_prompt = f"{system_instruction}\n\n{prompt}" if system_instruction else prompt
+                contents = [types.Part.from_text(text=full_prompt)]
+                for image, mime in zip(images, mime_types):
+                    data, mime = from_data_url(image, mime)
+                    contents.append(types.Part.from_bytes(data=data, mime_type=mime))
+                generation_config = types.GenerateContentConfig(
+                    max_output_tokens=max_tokens,
+                    temperature=temperature
+                )
+                return await self._gemini_generate_content(contents, generation_config)
+            except Exception as e:
+                self._handle_gemini_error(e)
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+    
     async def generate_text(
         self,
         prompt: str,
         max_tokens: int = 8000,
         temperature: float = 0.1,
-        system_instruction: Optional[str] = None
+        system_instruction: Optional[str] = None,
+        stop: Optional[Callable[[str], bool]] = None
     ) -> str:
         """
         Generate text from prompt.
@@ -159,10 +335,17 @@ class AIClient:
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             system_instruction: Optional system instruction
+            stop: Called with each chunk; generation ends once it returns True (streams internally)
             
         Returns:
             Generated text response
         """
+        if stop is not None:
+            return "".join([
+                chunk async for chunk in self.generate_text_stream(
+                    prompt, max_tokens, temperature, system_instruction, stop=stop
+                )
+            ])
         if self.provider == "ollama":
             return await self._generate_ollama_text(
                 prompt, max_tokens, temperature, system_instruction
@@ -174,6 +357,94 @@ class AIClient:
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
     
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 8000,
+        temperature: float = 0.1,
+        system_instruction: Optional[str] = None,
+        stop: Optional[Callable[[str], bool]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text from prompt as it is decoded.
+        
+        Args:
+            prompt: Text prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_instruction: Optional system instruction
+            stop: Called with each chunk; generation ends once it returns True
+            
+        Yields:
+            Text chunks in generation order
+        """
+        if self.provider == "ollama":
+            stream = self._stream_ollama_text(prompt, max_tokens, temperature, system_instruction)
+        elif self.provider == "gemini":
+            stream = self._stream_gemini_text(prompt, max_tokens, temperature, system_instruction)
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        async for chunk in self._stream_until(stream, stop):
+            yield chunk
+    
+    async def generate_with_image_stream(
+        self,
+        prompt: str,
+        image_data_url: str = "",
+        max_tokens: int = 2000,
+        temperature: float = 0.0,
+        system_instruction: Optional[str] = None,
+        image_bytes: Optional[bytes] = None,
+        image_mime_type: str = "image/png",
+        stop: Optional[Callable[[str], bool]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream text generated from image and prompt as it is decoded.
+        
+        Args:
+            prompt: Text prompt
+            image_data_url: Image data URL (data:image/png;base64,...)
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_instruction: Optional system instruction
+            image_bytes: Raw image bytes, used instead of image_data_url when set
+            image_mime_type: MIME type of image_bytes
+            stop: Called with each chunk; generation ends once it returns True
+            
+        Yields:
+            Text chunks in generation order
+        """
+        if self.provider == "ollama":
+            if image_bytes is not None:
+                image_data_url = to_data_url(image_bytes, image_mime_type)
+            stream = self._stream_ollama_with_image(
+                prompt, image_data_url, max_tokens, temperature, system_instruction
+            )
+        elif self.provider == "gemini":
+            stream = self._stream_gemini_with_image(
+                prompt, image_data_url, max_tokens, temperature, system_instruction,
+                image_bytes, image_mime_type
+            )
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        async for chunk in self._stream_until(stream, stop):
+            yield chunk
+    
+    async def _stream_until(
+        self,
+        stream: AsyncIterator[str],
+        stop: Optional[Callable[[str], bool]]
+    ) -> AsyncIterator[str]:
+        """Yield chunks from a provider stream, closing it (which aborts decoding) once stop returns True."""
+        try:
+            async for chunk in stream:
+                yield chunk
+                if stop is not None and stop(chunk):
+                    logger.debug(f"Stop condition met; ending {self.provider} generation early")
+                    break
+        finally:
+            await stream.aclose()
+    
     # Ollama implementation
     async def _generate_ollama_with_image(
         self,
@@ -183,18 +454,26 @@ class AIClient:
         temperature: float,
         system_instruction: Optional[str]
     ) -> str:
-        """Generate using Ollama's OpenAI-compatible API."""
+        """Generate using Ollama's OpenAI-compatible or native API."""
+        if self.ollama_native:
+            _, _, image_base64 = image_data_url.partition("base64,")
+            return await self._ollama_chat(
+                [{"role": "user", "content": prompt, "images": [image_base64 or image_data_url]}],
+                max_tokens, temperature
+            )
+        messages = [
+            {"role": "user", "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_data_url}}
+            ]}
+        ]
         resp = await self.client.chat.completions.create(
             model=self.model_name,
-            messages=[
-                {"role": "user", "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": image_data_url}}
-                ]}
-            ],
+            messages=messages,
             max_tokens=max_tokens,
             temperature=temperature
         )
+        self._record_usage(_openai_usage(getattr(resp, "usage", None)), messages, resp.choices[0].message.content)
         return resp.choices[0].message.content
     
     async def _generate_ollama_text(
@@ -204,20 +483,186 @@ class AIClient:
         temperature: float,
         system_instruction: Optional[str]
     ) -> str:
-        """Generate text using Ollama's OpenAI-compatible API."""
+        """Generate text using Ollama's OpenAI-compatible or native API."""
         messages = []
         if system_instruction:
             messages.append({"role": "system", "content": system_instruction})
         messages.append({"role": "user", "content": prompt})
         
+        if self.ollama_native:
+            return await self._ollama_chat(messages, max_tokens, temperature)
         resp = await self.client.chat.completions.create(
             model=self.model_name,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens
         )
+        self._record_usage(_openai_usage(getattr(resp, "usage", None)), messages, resp.choices[0].message.content)
         return resp.choices[0].message.content
     
+    async def _stream_ollama_text(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        system_instruction: Optional[str]
+    ) -> AsyncIterator[str]:
+        """Stream text using Ollama's OpenAI-compatible or native API."""
+        messages = []
+        if system_instruction:
+            messages.append({"role": "system", "content": system_instruction})
+        messages.append({"role": "user", "content": prompt})
+        
+        # aclosing: closing this generator closes the provider stream now rather than at garbage collection
+        async with aclosing(self._stream_ollama_messages(messages, max_tokens, temperature)) as stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _stream_ollama_with_image(
+        self,
+        prompt: str,
+        image_data_url: str,
+        max_tokens: int,
+        temperature: float,
+        system_instruction: Optional[str]
+    ) -> AsyncIterator[str]:
+        """Stream text from image and prompt using Ollama's OpenAI-compatible or native API."""
+        messages = []
+        if system_instruction:
+            messages.append({"role": "system", "content": system_instruction})
+        if self.ollama_native:
+            _, _, image_base64 = image_data_url.partition("base64,")
+            messages.append({"role": "user", "content": prompt, "images": [image_base64 or image_data_url]})
+        else:
+            messages.append({"role": "user", "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_data_url}}
+            ]})
+        
+        async with aclosing(self._stream_ollama_messages(messages, max_tokens, temperature)) as stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _stream_ollama_messages(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion from Ollama's OpenAI-compatible or native API."""
+        if self.ollama_native:
+            async with aclosing(self._stream_ollama_chat(messages, max_tokens, temperature)) as stream:
+                async for chunk in stream:
+                    yield chunk
+            return
+        stream = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            # Usage arrives in a final chunk without choices
+            stream_options={"include_usage": True}
+        )
+        usage = None
+        generated = []
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = _openai_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    generated.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Closing the response aborts generation server-side on early exit
+            await stream.close()
+            if usage is not None or generated:
+                self._record_usage(usage, messages, "".join(generated))
+    
+    def _ollama_chat_body(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        stream: bool
+    ) -> Dict[str, Any]:
+        """Build a native /api/chat request with context size, output limit and keep-alive."""
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.ollama_keep_alive,
+            "options": {**self.ollama_options, "num_predict": max_tokens, "temperature": temperature}
+        }
+    
+    def _handle_ollama_error(self, error: httpx.HTTPStatusError) -> None:
+        """Convert native Ollama API status errors to custom exceptions."""
+        status = error.response.status_code
+        detail = error.response.text[:500]
+        if status in (400, 404):
+            raise AIInvalidRequestError(f"Invalid request to Ollama ({status}): {detail}")
+        if status == 429:
+            raise AIRateLimitError(f"Ollama rate limit exceeded ({status}): {detail}")
+        raise AIProviderError(f"Ollama API error ({status}): {detail}")
+    
+    async def _ollama_chat(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        """Generate using Ollama's native /api/chat endpoint."""
+        resp = await self.http_client.post(
+            f"{self.ollama_url}/api/chat",
+            json=self._ollama_chat_body(messages, max_tokens, temperature, stream=False)
+        )
+        try:
+            resp.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            self._handle_ollama_error(e)
+        body = resp.json()
+        self._record_usage(_ollama_usage(body), messages, body["message"]["content"])
+        return body["message"]["content"]
+    
+    async def _stream_ollama_chat(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        """Stream text from Ollama's native /api/chat endpoint (one JSON object per line)."""
+        usage = None
+        generated = []
+        try:
+            async with self.http_client.stream(
+                "POST",
+                f"{self.ollama_url}/api/chat",
+                json=self._ollama_chat_body(messages, max_tokens, temperature, stream=True)
+            ) as resp:
+                # Leaving the block closes the response, which aborts generation server-side on early exit
+                if resp.is_error:
+                    await resp.aread()
+                    try:
+                        resp.raise_for_status()
+                    except httpx.HTTPStatusError as e:
+                        self._handle_ollama_error(e)
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise AIProviderError(f"Ollama API error: {chunk['error']}")
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        generated.append(content)
+                        yield content
+                    if chunk.get("done"):
+                        usage = _ollama_usage(chunk)
+                        break
+        finally:
+            if usage is not None or generated:
+                self._record_usage(usage, messages, "".join(generated))
+    
     # Gemini implementation
     async def _generate_gemini_with_image(
         self,
@@ -225,58 +670,86 @@ class AIClient:
         image_data_url: str,
         max_tokens: int,
         temperature: float,
-        system_instruction: Optional[str]
+        system_instruction: Optional[str],
+        image_bytes: Optional[bytes] = None,
+        image_mime_type: str = "image/png"
     ) -> str:
         """Generate using Google Gemini API with proper error handling."""
         try:
-            # Extract base64 image data and determine MIME type
-            mime_type = "image/png"  # default
-            if "data:" in image_data_url:
-                # Extract MIME type from data URL
-                header_part = image_data_url.split(",")[0]
-                if ";" in header_part:
-                    mime_type = header_part.split(":")[1].split(";")[0]
-                _, base64_data = image_data_url.split("base64,", 1)
-            else:
-                base64_data = image_data_url
-            
-            # Decode base64 to bytes
-            image_bytes = base64.b64decode(base64_data)
-            
-            # Build content with system instruction if provided
-            full_prompt = prompt
-            if system_instruction:
-                full_prompt = f"{system_instruction}\n\n{prompt}"
-            
-            # Configure generation
+            contents = self._gemini_image_contents(
+                prompt, image_data_url, system_instruction, image_bytes, image_mime_type
+            )
             generation_config = types.GenerateContentConfig(
                 max_output_tokens=max_tokens,
                 temperature=temperature
             )
-            
-            # Create content parts: text + image
-            contents = [
-                types.Part.from_text(text=full_prompt),
-                types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
-            ]
-            
-            # Generate content using async executor
-            loop = asyncio.get_event_loop()
-            
-            def _sync_generate():
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=contents,
-                    config=generation_config
-                )
-                return response.text
-            
-            result = await loop.run_in_executor(None, _sync_generate)
-            return result
+            return await self._gemini_generate_content(contents, generation_config)
         except Exception as e:
             # Convert to custom exception for better handling
             self._handle_gemini_error(e)
     
+    def _gemini_image_contents(
+        self,
+        prompt: str,
+        image_data_url: str,
+        system_instruction: Optional[str],
+        image_bytes: Optional[bytes],
+        image_mime_type: str
+    ) -> List[types.Part]:
+        """Build Gemini content parts (text + image) from raw bytes or a data URL."""
+        # Extract image bytes and MIME type from the data URL unless raw bytes were given
+        image_bytes, mime_type = from_data_url(
+            image_bytes if image_bytes is not None else image_data_url, image_mime_type
+        )
+        
+        # Build content with system instruction if provided
+        full_prompt = prompt
+        if system_instruction:
+            full_prompt = f"{system_instruction}\n\n{prompt}"
+        
+        # Create content parts: text + image
+        return [
+            types.Part.from_text(text=full_prompt),
+            types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+        ]
+    
+    async def _gemini_generate_content(
+        self,
+        contents: Any,
+        generation_config: types.GenerateContentConfig
+    ) -> str:
+        """
+        Call Gemini's native async API, or the sync API on a dedicated bounded executor.
+        
+        Cancelling the awaiting task aborts an async call in flight; with the executor,
+        calls still queued are dropped and only ones already running finish in the background.
+        """
+        aio = getattr(self.client, "aio", None)
+        if aio is not None:
+            response = await aio.models.generate_content(
+                model=self.model_name,
+                contents=contents,
+                config=generation_config
+            )
+            self._record_usage(_gemini_usage(getattr(response, "usage_metadata", None)), contents, response.text or "")
+            return response.text
+        
+        if self.gemini_executor is None:
+            self.gemini_executor = ThreadPoolExecutor(
+                max_workers=self.gemini_executor_workers, thread_name_prefix="gemini"
+            )
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.gemini_executor,
+            functools.partial(
+                self.client.models.generate_content,
+                model=self.model_name,
+                contents=contents,
+                config=generation_config
+            )
+        )
+        self._record_usage(_gemini_usage(getattr(response, "usage_metadata", None)), contents, response.text or "")
+        return response.text
+    
     async def _generate_gemini_text(
         self,
         prompt: str,
@@ -297,19 +770,83 @@ class AIClient:
                 temperature=temperature
             )
             
-            # Generate content using async executor
-            loop = asyncio.get_event_loop()
-            
-            def _sync_generate():
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=full_prompt,
-                    config=generation_config
-                )
-                return response.text
-            
-            result = await loop.run_in_executor(None, _sync_generate)
-            return result
+            return await self._gemini_generate_content(full_prompt, generation_config)
+        except Exception as e:
+            # Convert to custom exception for better handling
+            self._handle_gemini_error(e)
+    
+    async def _stream_gemini_text(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        system_instruction: Optional[str]
+    ) -> AsyncIterator[str]:
+        """Stream text using Google Gemini's async streaming API."""
+        full_prompt = prompt
+        if system_instruction:
+            full_prompt = f"{system_instruction}\n\n{prompt}"
+        
+        async with aclosing(self._stream_gemini(full_prompt, max_tokens, temperature)) as stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _stream_gemini_with_image(
+        self,
+        prompt: str,
+        image_data_url: str,
+        max_tokens: int,
+        temperature: float,
+        system_instruction: Optional[str],
+        image_bytes: Optional[bytes] = None,
+        image_mime_type: str = "image/png"
+    ) -> AsyncIterator[str]:
+        """Stream text from image and prompt using Google Gemini's async streaming API."""
+        try:
+            contents = self._gemini_image_contents(
+                prompt, image_data_url, system_instruction, image_bytes, image_mime_type
+            )
+        except Exception as e:
+            self._handle_gemini_error(e)
+        async with aclosing(self._stream_gemini(contents, max_tokens, temperature)) as stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _stream_gemini(
+        self,
+        contents: Any,
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        """Stream Gemini content; without an async client the whole response is one chunk."""
+        generation_config = types.GenerateContentConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature
+        )
+        
+        try:
+            if getattr(self.client, "aio", None) is None:
+                yield await self._gemini_generate_content(contents, generation_config)
+                return
+            stream = await self.client.aio.models.generate_content_stream(
+                model=self.model_name,
+                contents=contents,
+                config=generation_config
+            )
+            usage = None
+            generated = []
+            try:
+                async for chunk in stream:
+                    # Each chunk carries the usage so far; the last one has the totals
+                    usage = _gemini_usage(getattr(chunk, "usage_metadata", None)) or usage
+                    if chunk.text:
+                        generated.append(chunk.text)
+                        yield chunk.text
+            finally:
+                # Closing the response aborts generation server-side on early exit
+                await stream.aclose()
+                if usage is not None or generated:
+                    self._record_usage(usage, contents, "".join(generated))
         except Exception as e:
             # Convert to custom exception for better handling
             self._handle_gemini_error(e)
@@ -321,6 +858,13 @@ class AIClient:
     def get_provider(self) -> str:
         """Get the current provider name."""
         return self.provider
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP connection pool and the Gemini executor."""
+        await self.http_client.aclose()
+        executor = getattr(self, "gemini_executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Global AI client instance
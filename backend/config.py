@@ -47,6 +47,39 @@ class Settings(BaseSettings):
         default="qwen2.5vl",
         description="Vision-language model name for Ollama"
     )
+    ollama_api_mode: str = Field(
+        default="openai",
+        pattern="^(openai|native)$",
+        description="Ollama endpoint: OpenAI-compatible '/v1' or 'native' /api/chat with num_ctx, num_predict and keep_alive"
+    )
+    ollama_num_ctx: int = Field(
+        default=0,
+        ge=0,
+        le=131072,
+        description="KV-cache size requested in native mode (0 = context_window_max_tokens)"
+    )
+    ollama_keep_alive: str = Field(
+        default="30m",
+        description="How long Ollama keeps the model loaded after a native-mode request ('5m', '1h', '-1' = forever)"
+    )
+    ollama_max_connections: int = Field(
+        default=16,
+        ge=1,
+        le=256,
+        description="Connections in the shared HTTP pool for Ollama traffic"
+    )
+    ollama_max_keepalive_connections: int = Field(
+        default=8,
+        ge=0,
+        le=256,
+        description="Idle connections kept open in the shared HTTP pool"
+    )
+    ollama_keepalive_expiry: float = Field(
+        default=120.0,
+        ge=1.0,
+        le=3600.0,
+        description="Seconds an idle pooled connection stays open"
+    )
     
     # Google Gemini Configuration
     gemini_api_key: str = Field(
@@ -57,6 +90,22 @@ class Settings(BaseSettings):
         default="gemini-2.0-flash-exp",
         description="Gemini model name (gemini-2.0-flash-exp or gemini-2.0-flash-thinking-exp-01-21)"
     )
+    gemini_executor_workers: int = Field(
+        default=4,
+        ge=1,
+        le=64,
+        description="Threads for sync Gemini calls when the SDK has no async client (dedicated pool)"
+    )
+    gemini_input_cost_per_million_tokens: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="USD per million Gemini input tokens, for cost accounting (0 = not priced)"
+    )
+    gemini_output_cost_per_million_tokens: float = Field(
+        default=0.0,
+        ge=0.0,
+        description="USD per million Gemini output tokens, for cost accounting (0 = not priced)"
+    )
     
     # Processing Limits
     max_pages_default: int = Field(
@@ -104,6 +153,76 @@ class Settings(BaseSettings):
         description="Maximum context window tokens"
     )
     
+    # Native Text Layer (CAD-exported PDFs)
+    text_layer_mode: str = Field(
+        default="verify",
+        pattern="^(off|skip|verify)$",
+        description="Pages with a rich embedded text layer: 'skip' the vision call, 'verify' with a short vision pass, or 'off'"
+    )
+    text_layer_min_chars: int = Field(
+        default=200,
+        ge=1,
+        le=100000,
+        description="Minimum non-whitespace characters for a page's text layer to count as rich"
+    )
+    text_layer_max_drawings: int = Field(
+        default=2000,
+        ge=0,
+        description="Pages with more vector paths than this are drawings (labels may be outlined) and always go to vision"
+    )
+    text_layer_min_coverage: float = Field(
+        default=0.02,
+        ge=0.0,
+        le=1.0,
+        description="Minimum share of the page area in text blocks; below it the text is title-block boilerplate"
+    )
+    text_layer_max_garbled_ratio: float = Field(
+        default=0.02,
+        ge=0.0,
+        le=1.0,
+        description="Maximum share of unmappable glyphs for a text layer to be trusted"
+    )
+    text_layer_verify_max_tokens: int = Field(
+        default=400,
+        ge=50,
+        le=4096,
+        description="Max tokens for the vision verification pass in 'verify' mode"
+    )
+
+    # Page Extraction Concurrency (per provider)
+    ollama_page_concurrency: int = Field(
+        default=1,
+        ge=1,
+        le=16,
+        description="Pages extracted in parallel with Ollama (match OLLAMA_NUM_PARALLEL; 1 for 8GB VRAM)"
+    )
+    gemini_page_concurrency: int = Field(
+        default=4,
+        ge=1,
+        le=32,
+        description="Pages extracted in parallel with Gemini"
+    )
+
+    # Batched Vision Extraction (several page images per call, per provider)
+    ollama_vision_batch_size: int = Field(
+        default=1,
+        ge=1,
+        le=8,
+        description="Page images sent per Ollama extraction call (1 = one call per page)"
+    )
+    gemini_vision_batch_size: int = Field(
+        default=1,
+        ge=1,
+        le=16,
+        description="Page images sent per Gemini extraction call (1 = one call per page)"
+    )
+    vision_batch_max_megapixels: float = Field(
+        default=2.0,
+        ge=0.1,
+        le=100.0,
+        description="Pages rendered larger than this always get a vision call of their own"
+    )
+    
     # PDF Rendering
     pdf_zoom_factor: float = Field(
         default=2.0,
@@ -111,7 +230,237 @@ class Settings(BaseSettings):
         le=4.0,
         description="PDF to image zoom factor (higher = better quality but larger size)"
     )
-    
+    pdf_auto_zoom_target_px: float = Field(
+        default=12.0,
+        ge=6.0,
+        le=48.0,
+        description="quality=auto: rendered pixel height targeted for a page's small text"
+    )
+    pdf_auto_zoom_max_megapixels: float = Field(
+        default=40.0,
+        ge=1.0,
+        le=400.0,
+        description="quality=auto: zoom is capped so one page stays within this many megapixels"
+    )
+    pdf_tile_max_megapixels: float = Field(
+        default=4.0,
+        ge=0.0,
+        le=100.0,
+        description="Pages rendering larger than this are split into overlapping tiles of at most this size (0 disables)"
+    )
+    pdf_tile_overlap_px: int = Field(
+        default=96,
+        ge=0,
+        le=1024,
+        description="Pixels shared by neighbouring tiles so edge text is whole in at least one tile"
+    )
+    pdf_page_transport: str = Field(
+        default="file",
+        pattern="^(file|inline)$",
+        description="How rendered pages reach the API for analysis: 'file' (spooled raw PNG) or 'inline' (base64 over MCP)"
+    )
+    pdf_spool_dir: str = Field(
+        default="",
+        description="Directory for spooled page renders (empty = /dev/shm/hvac-pages or the temp dir)"
+    )
+    preview_cache_dir: str = Field(
+        default="backend/state/previews",
+        description="Directory for cached page preview images served by /api/uploads/{id}/pages/{n}"
+    )
+    preview_cache_max_mb: int = Field(
+        default=256,
+        ge=1,
+        le=100000,
+        description="Size budget of the preview cache in megabytes (least recently served files are evicted)"
+    )
+    preview_default_width: int = Field(
+        default=640,
+        ge=32,
+        le=4096,
+        description="Preview width in pixels when the request does not give one"
+    )
+    pdf_image_format: str = Field(
+        default="png",
+        pattern="^(png|jpeg|webp)$",
+        description="Default encoding of rendered pages sent to the vision model"
+    )
+    pdf_image_color: str = Field(
+        default="rgb",
+        pattern="^(rgb|gray|bilevel|palette)$",
+        description="Default color reduction before encoding: rgb, gray, bilevel (1-bit) or palette (16 colors)"
+    )
+    pdf_image_quality: int = Field(
+        default=85,
+        ge=1,
+        le=100,
+        description="JPEG/WebP quality for rendered pages (WebP 100 is lossless)"
+    )
+    pdf_png_compression: int = Field(
+        default=-1,
+        ge=-1,
+        le=9,
+        description="PNG zlib compression level (-1 = encoder default)"
+    )
+
+    # PDF Worker Pool
+    pdf_pool_size: int = Field(
+        default=2,
+        ge=1,
+        le=16,
+        description="Number of long-lived pdf_server.py MCP workers kept warm"
+    )
+    pdf_pool_health_check_interval: float = Field(
+        default=30.0,
+        ge=0.0,
+        le=600.0,
+        description="Seconds between health-check pings of idle PDF workers (0 disables)"
+    )
+    pdf_pool_checkout_timeout: float = Field(
+        default=120.0,
+        ge=1.0,
+        le=600.0,
+        description="Seconds to wait for a free PDF worker before failing the request"
+    )
+
+    # PDF Document Sessions (inside each pdf_server.py worker)
+    pdf_prefetch_depth: int = Field(
+        default=2,
+        ge=1,
+        le=32,
+        description="Rendered pages buffered ahead of vision extraction per analysis"
+    )
+    pdf_doc_ttl_seconds: float = Field(
+        default=300.0,
+        ge=5.0,
+        le=86400.0,
+        description="Idle seconds before an open document handle is closed"
+    )
+    pdf_max_open_documents: int = Field(
+        default=8,
+        ge=1,
+        le=256,
+        description="Maximum parsed documents kept open per PDF worker"
+    )
+    pdf_render_cache_mb: float = Field(
+        default=64.0,
+        ge=0.0,
+        le=4096.0,
+        description="Per-worker in-memory cache of rendered pages in MB (0 disables)"
+    )
+    pdf_render_processes: int = Field(
+        default=0,
+        ge=0,
+        le=64,
+        description="Render processes per PDF worker (0 = CPU cores divided among the workers, 1 = render in the worker itself)"
+    )
+    pdf_render_batch_size: int = Field(
+        default=4,
+        ge=1,
+        le=64,
+        description="Pages rendered per render_pages call during analysis (spread across the render processes)"
+    )
+    pdf_region_crop: bool = Field(
+        default=True,
+        description="Send only a sheet's schedules, notes, legend and title block (found by layout analysis) instead of the whole page"
+    )
+    pdf_region_zoom: float = Field(
+        default=3.0,
+        ge=1.0,
+        le=4.0,
+        description="Zoom for region-of-interest crops"
+    )
+    pdf_region_max_page_fraction: float = Field(
+        default=0.5,
+        ge=0.05,
+        le=1.0,
+        description="Render the whole page when its regions cover more than this share of it"
+    )
+
+    # Extraction Cache
+    extraction_cache_enabled: bool = Field(
+        default=True,
+        description="Reuse per-page vision extraction results for identical renders"
+    )
+    extraction_cache_path: str = Field(
+        default="backend/cache/extraction_cache.sqlite3",
+        description="SQLite file backing the extraction cache"
+    )
+    extraction_cache_max_mb: int = Field(
+        default=256,
+        ge=1,
+        le=10240,
+        description="Maximum extraction cache size in MB before LRU eviction"
+    )
+    extraction_cache_max_entries: int = Field(
+        default=50000,
+        ge=10,
+        le=10000000,
+        description="Maximum number of cached page extractions before LRU eviction"
+    )
+
+    # Sheet Classification
+    page_classification: str = Field(
+        default="prioritize",
+        pattern="^(off|prioritize|mechanical_only)$",
+        description="Pre-pass over all pages: 'prioritize' skips blank pages and extracts mechanical sheets first, "
+                    "'mechanical_only' extracts only mechanical, schedule and unreadable sheets, 'off' takes pages in order"
+    )
+
+    # Incremental Re-analysis
+    revision_max_changed_fraction: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=0.05,
+        description="Share of differing pixels up to which a page of a revised set counts as unchanged "
+                    "(0 = pixel-identical; a changed number and a new plot date differ by similar amounts)"
+    )
+
+    # Duplicate Sheet Detection
+    page_dedup_enabled: bool = Field(
+        default=True,
+        description="Reuse the extraction of identical or near-identical pages (by perceptual hash) instead of calling the vision model"
+    )
+    page_dedup_similarity: float = Field(
+        default=0.97,
+        ge=0.5,
+        le=1.0,
+        description="Minimum fraction of matching perceptual hash bits for two pages to count as duplicates (1.0 = identical hashes only)"
+    )
+    page_dedup_match_text: bool = Field(
+        default=True,
+        description="Also require identical embedded text when the pages have a text layer (the hash cannot see small text)"
+    )
+
+    # Background Jobs
+    job_workers: int = Field(
+        default=1,
+        ge=1,
+        le=16,
+        description="In-process workers draining the /api/jobs analysis queue"
+    )
+    job_store_path: str = Field(
+        default="backend/state/jobs.sqlite3",
+        description="SQLite file persisting queued, running and finished jobs"
+    )
+    job_max_attempts: int = Field(
+        default=3,
+        ge=1,
+        le=10,
+        description="Startups allowed to resume an interrupted job before it is failed"
+    )
+    job_retention_hours: float = Field(
+        default=168.0,
+        ge=0.0,
+        le=8760.0,
+        description="Hours finished jobs are kept before purge at startup (0 keeps forever)"
+    )
+    job_progress_interval_seconds: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=60.0,
+        description="Minimum seconds between progress writes of a running job (0 writes every event)"
+    )
+
     # Retry Configuration
     max_retries: int = Field(
         default=2,
@@ -131,6 +480,36 @@ class Settings(BaseSettings):
         le=5.0,
         description="Backoff multiplier for retries"
     )
+    retry_budget_ratio: float = Field(
+        default=0.2,
+        ge=0.0,
+        le=1.0,
+        description="Retries allowed per provider as a fraction of recent calls"
+    )
+    retry_budget_min_retries: int = Field(
+        default=10,
+        ge=0,
+        le=1000,
+        description="Retries always allowed per provider within the budget window"
+    )
+    retry_budget_window_seconds: float = Field(
+        default=60.0,
+        ge=1.0,
+        le=3600.0,
+        description="Sliding window for the per-provider retry budget"
+    )
+    circuit_breaker_failure_threshold: int = Field(
+        default=5,
+        ge=1,
+        le=100,
+        description="Consecutive transient failures before a provider's circuit opens"
+    )
+    circuit_breaker_reset_seconds: float = Field(
+        default=30.0,
+        ge=1.0,
+        le=3600.0,
+        description="Seconds an open circuit fails fast before admitting a probe call"
+    )
     
     # Paths
     upload_dir: str = Field(
@@ -168,6 +547,47 @@ class Settings(BaseSettings):
         le=32768,
         description="Max tokens allowed for structured JSON generation"
     )
+    llm_structured_early_stop: bool = Field(
+        default=True,
+        description="Stream structured JSON generation and stop decoding once the report's JSON object closes"
+    )
+
+    def render_processes_per_worker(self) -> int:
+        """Return the render process count for each PDF worker (auto-sized when 0)."""
+        if self.pdf_render_processes:
+            return self.pdf_render_processes
+        return max(1, (os.cpu_count() or 1) // self.pdf_pool_size)
+
+    def page_dedup_max_distance(self) -> int:
+        """Return the largest perceptual hash Hamming distance still treated as a duplicate."""
+        return int((1.0 - self.page_dedup_similarity) * 256 + 1e-9)
+
+    def ollama_context_length(self) -> int:
+        """Return the num_ctx sent to Ollama's native API (fixed, so the model is never reloaded)."""
+        return self.ollama_num_ctx or self.context_window_max_tokens
+
+    def ollama_native_url(self) -> str:
+        """Return Ollama's native API root, derived from the OpenAI-compatible base URL."""
+        url = self.ollama_base_url.rstrip("/")
+        return url[:-3] if url.endswith("/v1") else url
+
+    def token_prices(self, provider: str) -> tuple[float, float]:
+        """Return (input, output) USD per million tokens for an AI provider; local Ollama is free."""
+        if (provider or "").lower() == "gemini":
+            return self.gemini_input_cost_per_million_tokens, self.gemini_output_cost_per_million_tokens
+        return 0.0, 0.0
+
+    def vision_batch_size(self, provider: str) -> int:
+        """Return how many page images an AI provider gets per extraction call."""
+        if (provider or "").lower() == "gemini":
+            return self.gemini_vision_batch_size
+        return self.ollama_vision_batch_size
+
+    def page_concurrency(self, provider: str) -> int:
+        """Return the page extraction concurrency limit for an AI provider."""
+        if (provider or "").lower() == "gemini":
+            return self.gemini_page_concurrency
+        return self.ollama_page_concurrency
 
     @property
     def cors_origins(self) -> list[str]:
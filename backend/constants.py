@@ -222,3 +222,15 @@ Return ONLY valid JSON matching this structure. Do not include markdown fencing,
 """
 
 BLUEPRINT_EXTRACTION_PROMPT = """OCR TASK: Transcribe all text visible in this blueprint. List every room name, every numerical dimension (e.g. 12'6"), and every equipment label. Do not chat. Output raw data only. Be literal — copy text exactly, include units and punctuation. If something is unreadable, mark it as [UNREADABLE]."""
+
+# Several pages per vision call; split_batched_extraction() relies on the delimiter lines
+BATCH_EXTRACTION_PROMPT = """You are given {count} blueprint page images, in this order: pages {pages}. Do the task below for each image separately.
+
+""" + BLUEPRINT_EXTRACTION_PROMPT + """
+
+Start each page's output with a delimiter line of its own, exactly "=== PAGE <number> ===" using the page numbers above, and keep the pages in the given order. Never mix text from different images."""
+
+TEXT_LAYER_VERIFICATION_PROMPT = """VERIFY TASK: The text below was read from this blueprint's embedded PDF text layer. Compare it with the image. List ONLY room names, numerical dimensions and equipment labels that are visible in the image but missing or different in the text. Copy them literally, one per line. If nothing is missing, output exactly NONE. Do not chat.
+
+TEXT LAYER:
+{text_layer}"""
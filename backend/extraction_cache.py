@@ -0,0 +1,336 @@
+"""
+Persistent, content-addressed cache for per-page vision extraction results.
+
+Entries are keyed by a SHA-256 over the rendered page image, the extraction
+prompt, the model name, the zoom factor and the temperature, so any change to
+what the model would see or how it is asked produces a new key. Storage is a
+single SQLite file with least-recently-used eviction bounded by total bytes and
+entry count.
+
+Whole-page extractions can additionally be stored with the page's perceptual
+hash (see pdf_server.page_fingerprint) and the content hash of their
+document, so a near-identical sheet of the same document analyzed again can
+reuse them through find_similar. Across documents only exact keys match: a
+perceptual hash can't tell two projects' sheets with the same layout apart.
+Fingerprints are indexed by band (see FINGERPRINT_BANDS), so a lookup reads
+only the rows sharing a band with the page instead of every fingerprint.
+
+The methods are synchronous SQLite calls; the API awaits the a*-prefixed
+variants, which run them in a worker thread.
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from backend.config import get_settings
+from backend.utils import logger
+
+# Perceptual hashes are split into this many bands for the lookup index. Two
+# hashes at most FINGERPRINT_BANDS - 1 bits apart share at least one band
+# exactly (pigeonhole), so the index finds every match up to that distance.
+FINGERPRINT_BANDS = 8
+# Recency updates from hits are written in one transaction once this many are pending
+ACCESS_FLUSH_BATCH = 64
+
+
+def make_cache_key(
+    image_digest: str,
+    prompt: str,
+    model: str,
+    zoom_factor: Optional[float],
+    temperature: float
+) -> str:
+    """Build the content address for one page extraction.
+
+    Args:
+        image_digest: SHA-256 hex digest of the rendered page image
+        prompt: Extraction prompt sent with the image
+        model: Model name that produced the text
+        zoom_factor: Render zoom (None for non-PDF images)
+        temperature: Sampling temperature
+
+    Returns:
+        Hex SHA-256 cache key
+    """
+    prompt_digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    zoom = "none" if zoom_factor is None else f"{float(zoom_factor):.3f}"
+    material = "\n".join([image_digest, prompt_digest, model, zoom, f"{float(temperature):.3f}"])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def make_dedup_context(prompt: str, model: str, zoom_factor: Optional[float], temperature: float) -> str:
+    """Build the key for everything but the image that must match for a near-duplicate reuse."""
+    return make_cache_key("phash", prompt, model, zoom_factor, temperature)
+
+
+def make_fingerprint_key(context: str, phash: str, text_digest: Optional[str]) -> str:
+    """Build the cache key a whole-page extraction is stored under by its fingerprint."""
+    material = "\n".join([context, phash, text_digest or "none"])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def hash_distance(phash_a: str, phash_b: str) -> int:
+    """Return the Hamming distance between two hex perceptual hashes."""
+    return bin(int(phash_a, 16) ^ int(phash_b, 16)).count("1")
+
+
+def fingerprint_bands(phash: str) -> list:
+    """Return the band index values of a hex perceptual hash."""
+    width = max(1, len(phash) // FINGERPRINT_BANDS)
+    return [f"{i}:{phash[i * width:(i + 1) * width]}" for i in range(FINGERPRINT_BANDS)]
+
+
+def digest_image_payload(image_data_url: str) -> str:
+    """Return the SHA-256 of an image data URL's payload (header excluded)."""
+    payload = image_data_url.split("base64,", 1)[1] if "base64," in image_data_url else image_data_url
+    return hashlib.sha256(payload.encode("ascii", errors="ignore")).hexdigest()
+
+
+def digest_image_bytes(image_bytes: bytes) -> str:
+    """Return the SHA-256 of raw image bytes (spooled page renders)."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class ExtractionCache:
+    """SQLite-backed LRU cache of extracted page text."""
+
+    def __init__(self, path: str, max_bytes: int, max_entries: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.similar_hits = 0
+        self.evictions = 0
+        # key -> last access time of hits not yet written back
+        self._accessed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")}
+        # Fingerprint columns were added after the first release; migrate older cache files
+        for column in ("context", "phash", "text_digest", "document"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE extractions ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_access ON extractions(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_context ON extractions(context)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprint_bands (
+                band TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (band, key)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fingerprint_bands_key ON fingerprint_bands(key)")
+        # Index fingerprints stored before the band index existed
+        unindexed = self._conn.execute(
+            "SELECT key, phash FROM extractions WHERE phash IS NOT NULL "
+            "AND key NOT IN (SELECT key FROM fingerprint_bands)"
+        ).fetchall()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO fingerprint_bands (band, key) VALUES (?, ?)",
+            [(band, key) for key, phash in unindexed for band in fingerprint_bands(phash)]
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached text for key and refresh its recency, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touch_locked(key)
+            self.hits += 1
+            return row[0]
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() in a worker thread."""
+        return await asyncio.to_thread(self.get, key)
+
+    def _touch_locked(self, key: str) -> None:
+        # Recency only orders eviction, so hits don't each need a write and a commit
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= ACCESS_FLUSH_BATCH:
+            self._flush_access_locked()
+            self._conn.commit()
+
+    def _flush_access_locked(self) -> None:
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE extractions SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def find_similar(
+        self,
+        context: str,
+        document: str,
+        phash: str,
+        text_digest: Optional[str],
+        max_distance: int,
+        match_text: bool = True
+    ) -> Optional[Tuple[str, int]]:
+        """Return (text, distance) of the closest fingerprinted page within max_distance, or None.
+
+        Only entries stored with the same context and document are
+        considered. With match_text the stored page must also have the same
+        text_digest, and a page without text (scanned or outlined) has nothing
+        to confirm a near match with, so it must match its phash exactly.
+        """
+        query = "SELECT key, text, phash FROM extractions WHERE context = ? AND document = ? AND phash IS NOT NULL"
+        params: tuple = (context, document)
+        if match_text:
+            query += " AND text_digest IS ?"
+            params += (text_digest,)
+            if text_digest is None:
+                max_distance = 0
+        if max_distance < FINGERPRINT_BANDS:
+            # Candidates must share a band; wider tolerances fall back to the document's rows
+            bands = fingerprint_bands(phash)
+            query += f" AND key IN (SELECT key FROM fingerprint_bands WHERE band IN ({', '.join('?' * len(bands))}))"
+            params += tuple(bands)
+        with self._lock:
+            best = None
+            for key, text, candidate in self._conn.execute(query, params):
+                distance = hash_distance(phash, candidate)
+                if distance <= max_distance and (best is None or distance < best[2]):
+                    best = (key, text, distance)
+                    if distance == 0:
+                        break
+            if best is None:
+                return None
+            self._touch_locked(best[0])
+            self.similar_hits += 1
+            return best[1], best[2]
+
+    async def afind_similar(self, *args: Any, **kwargs: Any) -> Optional[Tuple[str, int]]:
+        """find_similar() in a worker thread."""
+        return await asyncio.to_thread(self.find_similar, *args, **kwargs)
+
+    def put(
+        self,
+        key: str,
+        text: str,
+        context: Optional[str] = None,
+        phash: Optional[str] = None,
+        text_digest: Optional[str] = None,
+        document: Optional[str] = None
+    ) -> None:
+        """Store text under key and evict least-recently-used entries if over budget.
+
+        Pass context, phash and document (and text_digest, if the page has
+        text) to make a whole-page extraction findable by find_similar.
+        """
+        if not text:
+            return
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions "
+                "(key, text, size, created_at, last_access, context, phash, text_digest, document) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, text, size, now, now, context, phash, text_digest, document)
+            )
+            self._conn.execute("DELETE FROM fingerprint_bands WHERE key = ?", (key,))
+            if phash:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO fingerprint_bands (band, key) VALUES (?, ?)",
+                    [(band, key) for band in fingerprint_bands(phash)]
+                )
+            self._accessed.pop(key, None)
+            self._flush_access_locked()
+            self._evict_locked()
+            self._conn.commit()
+
+    async def aput(self, *args: Any, **kwargs: Any) -> None:
+        """put() in a worker thread."""
+        await asyncio.to_thread(self.put, *args, **kwargs)
+
+    def _evict_locked(self) -> None:
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM extractions ORDER BY last_access ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM extractions WHERE key = ?", evicted)
+        self._conn.executemany("DELETE FROM fingerprint_bands WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+        logger.info(f"Extraction cache evicted {len(evicted)} entries")
+
+    def clear(self) -> None:
+        """Remove every entry (counters are kept)."""
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.execute("DELETE FROM fingerprint_bands")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "similar_hits": self.similar_hits,
+            "evictions": self.evictions,
+            "entries": count,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries
+        }
+
+
+# Global cache instance
+_extraction_cache: Optional[ExtractionCache] = None
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Get or create the global extraction cache, or None when disabled."""
+    global _extraction_cache
+    settings = get_settings()
+    if not settings.extraction_cache_enabled:
+        return None
+    if _extraction_cache is None:
+        try:
+            _extraction_cache = ExtractionCache(
+                path=settings.extraction_cache_path,
+                max_bytes=settings.extraction_cache_max_mb * 1024 * 1024,
+                max_entries=settings.extraction_cache_max_entries
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Extraction cache unavailable, continuing without it: {e}")
+            return None
+    return _extraction_cache
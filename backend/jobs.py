@@ -0,0 +1,286 @@
+"""
+Asynchronous analysis job queue with a persistent SQLite job store.
+
+``POST /api/jobs`` records the request and returns immediately; a configurable
+number of in-process workers run the regular analysis pipeline and write the
+result back to the store. Queued jobs, and jobs that were running when the
+backend stopped, are picked up again on the next startup.
+
+Every store call runs in a worker thread (``asyncio.to_thread``) so SQLite
+reads and commits never block the event loop, and progress is written at most once per ``progress_interval`` seconds
+(the final counters go out with the job's result or error).
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from backend.config import get_settings
+from backend.models import AnalyzeRequest, AnalyzeResponse, JobStatus
+from backend.utils import logger
+
+
+# run_analysis(request, request_id, emit) -> AnalyzeResponse
+AnalysisRunner = Callable[..., Awaitable[AnalyzeResponse]]
+
+
+class JobStore:
+    """SQLite persistence for job requests, progress and results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                request_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                request_json TEXT NOT NULL,
+                progress_json TEXT NOT NULL DEFAULT '{}',
+                result_json TEXT,
+                error TEXT,
+                error_status_code INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def create(self, job_id: str, request_id: str, request_json: str) -> None:
+        self._execute(
+            "INSERT INTO jobs (job_id, request_id, status, request_json, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, request_id, JobStatus.QUEUED.value, request_json, time.time())
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def queued_ids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at", (JobStatus.QUEUED.value,)
+            ).fetchall()
+        return [r["job_id"] for r in rows]
+
+    def recover_interrupted(self, max_attempts: int) -> int:
+        """Requeue jobs left running by a previous process (or fail them past max_attempts)."""
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, error_status_code = 500, finished_at = ? "
+            "WHERE status = ? AND attempts >= ?",
+            (JobStatus.FAILED.value, "Job interrupted too many times", now, JobStatus.RUNNING.value, max_attempts)
+        )
+        cursor = self._execute(
+            "UPDATE jobs SET status = ? WHERE status = ?",
+            (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+        )
+        return cursor.rowcount
+
+    def mark_running(self, job_id: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+            (JobStatus.RUNNING.value, time.time(), job_id)
+        )
+
+    def mark_queued(self, job_id: str) -> None:
+        self._execute("UPDATE jobs SET status = ? WHERE job_id = ?", (JobStatus.QUEUED.value, job_id))
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        self._execute("UPDATE jobs SET progress_json = ? WHERE job_id = ?", (json.dumps(progress), job_id))
+
+    def mark_succeeded(self, job_id: str, result_json: str, progress: Optional[Dict[str, Any]] = None) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, result_json = ?, error = NULL, error_status_code = NULL, finished_at = ?, "
+            "progress_json = COALESCE(?, progress_json) WHERE job_id = ?",
+            (JobStatus.SUCCEEDED.value, result_json, time.time(), json.dumps(progress) if progress else None, job_id)
+        )
+
+    def mark_failed(
+        self, job_id: str, error: str, status_code: int, progress: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, error_status_code = ?, finished_at = ?, "
+            "progress_json = COALESCE(?, progress_json) WHERE job_id = ?",
+            (JobStatus.FAILED.value, error, status_code, time.time(), json.dumps(progress) if progress else None, job_id)
+        )
+
+    def purge_finished(self, older_than: float) -> int:
+        cursor = self._execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, older_than)
+        )
+        return cursor.rowcount
+
+
+class JobQueue:
+    """In-process worker pool that drains the job store through the analysis pipeline."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: AnalysisRunner,
+        workers: int = 1,
+        max_attempts: int = 3,
+        retention_seconds: float = 0.0,
+        progress_interval: float = 1.0
+    ):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.progress_interval = progress_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Recover persisted work and start the worker tasks."""
+        self._queue = asyncio.Queue()
+        recovered = await asyncio.to_thread(self.store.recover_interrupted, self.max_attempts)
+        if recovered:
+            logger.warning(f"Requeued {recovered} job(s) interrupted by a previous shutdown")
+        if self.retention_seconds > 0:
+            purged = await asyncio.to_thread(self.store.purge_finished, time.time() - self.retention_seconds)
+            if purged:
+                logger.info(f"Purged {purged} finished job(s) past retention")
+        for job_id in await asyncio.to_thread(self.store.queued_ids):
+            self._queue.put_nowait(job_id)
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}") for n in range(self.workers)
+        ]
+        logger.info(f"Job queue started with {self.workers} worker(s), {self._queue.qsize()} queued job(s)")
+
+    async def stop(self) -> None:
+        """Cancel workers; running jobs are requeued for the next startup."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job queue stopped")
+
+    async def submit(self, request: AnalyzeRequest) -> Dict[str, str]:
+        """Persist a job and schedule it; returns its job_id and request_id."""
+        job_id = f"job-{uuid4().hex[:12]}"
+        request_id = f"req-{uuid4().hex[:12]}"
+        await asyncio.to_thread(self.store.create, job_id, request_id, request.model_dump_json())
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        logger.info(f"[{request_id}] Queued job {job_id}")
+        return {"job_id": job_id, "request_id": request_id}
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {n} crashed on {job_id}: {e}")
+
+    async def _run_job(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] != JobStatus.QUEUED.value:
+            return
+        request_id = job["request_id"]
+        await asyncio.to_thread(self.store.mark_running, job_id)
+        progress: Dict[str, Any] = {"stage": "started", "pages_extracted": 0, "pages_failed": 0}
+        last_write = 0.0
+        writing = False
+
+        async def record(event: Dict[str, Any]) -> None:
+            nonlocal last_write, writing
+            name = event.get("event")
+            if name == "reasoning_token":
+                return
+            if name == "document":
+                progress["max_pages"] = event.get("max_pages")
+                progress["total_pages"] = event.get("total_pages")
+            elif name == "page_extracted":
+                progress["pages_extracted"] += 1
+            elif name == "page_failed":
+                progress["pages_failed"] += 1
+            progress["stage"] = name
+            # Page events arrive from concurrent consumers: skip while a write is in flight or
+            # within the interval, since the next write (or the final one) carries these counters
+            now = time.monotonic()
+            if writing or now - last_write < self.progress_interval:
+                return
+            writing, last_write = True, now
+            try:
+                await asyncio.to_thread(self.store.update_progress, job_id, dict(progress))
+            finally:
+                writing = False
+
+        try:
+            request = AnalyzeRequest.model_validate_json(job["request_json"])
+            result = await self.runner(request, request_id, emit=record)
+        except asyncio.CancelledError:
+            # Shutdown mid-job: leave it for the next process to pick up
+            await asyncio.to_thread(self.store.mark_queued, job_id)
+            raise
+        except Exception as e:
+            status_code = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"[{request_id}] Job {job_id} failed: {detail}")
+            await asyncio.to_thread(self.store.mark_failed, job_id, str(detail), status_code, dict(progress))
+            return
+        progress["stage"] = "complete"
+        await asyncio.to_thread(self.store.mark_succeeded, job_id, result.model_dump_json(), dict(progress))
+        logger.info(f"[{request_id}] Job {job_id} succeeded")
+
+
+def load_job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a stored job row into JobStatusResponse fields."""
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "request_id": job["request_id"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "attempts": job["attempts"],
+        "progress": json.loads(job["progress_json"] or "{}"),
+        "result": json.loads(job["result_json"]) if job["result_json"] else None,
+        "error": job["error"],
+        "error_status_code": job["error_status_code"]
+    }
+
+
+def create_job_queue(runner: AnalysisRunner) -> JobQueue:
+    """Build the job queue from settings around the given pipeline runner."""
+    settings = get_settings()
+    return JobQueue(
+        JobStore(settings.job_store_path),
+        runner,
+        workers=settings.job_workers,
+        max_attempts=settings.job_max_attempts,
+        retention_seconds=settings.job_retention_hours * 3600,
+        progress_interval=settings.job_progress_interval_seconds
+    )
@@ -1,45 +1,197 @@
 from mcp.server.fastmcp import FastMCP
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Optional
 import base64
+import hashlib
 import io
 import json
+import math
+import mmap
+import multiprocessing
+import re
+import time
 import fitz  # PyMuPDF
 import logging
 import os
+import tempfile
+import uuid
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# stdout is the MCP stdio channel. PyMuPDF prints its messages (e.g. from the
+# table finder) there by default, which corrupts the JSON-RPC stream.
+# Swapping fd 1 around such calls would race the MCP writer thread, so route
+# them to logging (stderr) instead.
+fitz.set_messages(pylogging=True)
 
 mcp = FastMCP("pdf-processor")
 
 # Load zoom factor from environment or use default
 PDF_ZOOM_FACTOR = float(os.environ.get("PDF_ZOOM_FACTOR", "2.0"))
 
+# Document sessions: idle handles are closed after this many seconds
+PDF_DOC_TTL_SECONDS = float(os.environ.get("PDF_DOC_TTL_SECONDS", "300"))
+PDF_MAX_OPEN_DOCUMENTS = int(os.environ.get("PDF_MAX_OPEN_DOCUMENTS", "8"))
+PDF_RENDER_CACHE_BYTES = int(float(os.environ.get("PDF_RENDER_CACHE_MB", "64")) * 1024 * 1024)
+# Rasterization is CPU-bound: above 1, batches of pages and tiles are rendered
+# in parallel by this many child processes
+PDF_RENDER_PROCESSES = int(os.environ.get("PDF_RENDER_PROCESSES", "1"))
+# Documents each render process keeps open (reopened from file on a miss)
+RENDER_PROCESS_MAX_DOCUMENTS = 4
+
+
+def _default_spool_dir() -> str:
+    # tmpfs keeps spooled pages in RAM where available
+    base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, "hvac-pages")
+
+
+# transport="file" renders are written here and returned by path; the reader deletes them
+PDF_SPOOL_DIR = os.environ.get("PDF_SPOOL_DIR") or _default_spool_dir()
+# Spooled pages never picked up (e.g. the API process died) are swept after this long
+PDF_SPOOL_MAX_AGE_SECONDS = 600
+
+# Auto zoom: render the small text of a page at roughly this many pixels tall,
+# without exceeding the pixel budget (1 PDF point = 1 pixel at zoom 1.0)
+PDF_AUTO_ZOOM_TARGET_PX = float(os.environ.get("PDF_AUTO_ZOOM_TARGET_PX", "12"))
+PDF_AUTO_ZOOM_MAX_PIXELS = int(float(os.environ.get("PDF_AUTO_ZOOM_MAX_MEGAPIXELS", "40")) * 1_000_000)
+# Vector linework above this count means a dense drawing that needs at least the default zoom
+DENSE_DRAWINGS = 2000
+
+# Sheet classification (classify_pages)
+BLANK_INK_COVERAGE = 0.002  # share of inked thumbnail pixels below which a page counts as blank
+INK_THRESHOLD = 208  # thumbnail gray level below which a pixel counts as ink (thin lines render light)
+BLANK_MAX_CHARS = 20
+# A drawing-dense page (DENSE_DRAWINGS) with no more text than a title block has its labels outlined
+OUTLINED_MAX_CHARS = 1500
+CLASSIFY_THUMBNAIL_WIDTH = 160
+TITLE_BLOCK_FRACTION = 0.6  # sheet numbers are looked for right of / below this fraction of the page
+SHEET_NUMBER_PATTERN = re.compile(r"^([A-Z]{1,2})[-.]?\d{1,3}(?:\.\d{1,3})?[A-Z]?$")
+SHEET_DISCIPLINES = {
+    "M": "mechanical", "H": "mechanical", "P": "mechanical", "MH": "mechanical", "MP": "mechanical",
+    "G": "general", "GN": "general", "T": "general", "CS": "general",
+    "A": "non_mechanical", "AD": "non_mechanical", "S": "non_mechanical", "E": "non_mechanical",
+    "C": "non_mechanical", "L": "non_mechanical", "I": "non_mechanical", "ID": "non_mechanical",
+    "FP": "non_mechanical", "LS": "non_mechanical"
+}
+HVAC_TERMS = (
+    "HVAC", "MECHANICAL", "CFM", "DUCT", "DUCTWORK", "AHU", "RTU", "VAV", "FCU", "ERV", "HRV",
+    "FURNACE", "BOILER", "CHILLER", "CONDENSER", "HEAT PUMP", "BTU", "BTUH", "MBH", "TONS", "DIFFUSER",
+    "GRILLE", "REGISTER", "EXHAUST FAN", "DAMPER", "THERMOSTAT", "REFRIGERANT", "SEER", "AFUE", "HSPF",
+    "SUPPLY AIR", "RETURN AIR", "OUTSIDE AIR", "MANUAL J"
+)
+HVAC_TERMS_MIN = 2
+COVER_TERMS = (
+    "COVER SHEET", "TITLE SHEET", "SHEET INDEX", "DRAWING INDEX", "INDEX OF DRAWINGS",
+    "LIST OF DRAWINGS", "VICINITY MAP", "LOCATION MAP"
+)
+_HVAC_TERMS_RE = re.compile(r"\b(" + "|".join(re.escape(t) for t in HVAC_TERMS) + r")\b")
+_COVER_TERMS_RE = re.compile(r"\b(" + "|".join(re.escape(t) for t in COVER_TERMS) + r")\b")
+_INK_TABLE = bytes(1 if value < INK_THRESHOLD else 0 for value in range(256))
+
+# Region-of-interest cropping (render_page region_zoom)
+REGION_PADDING_PT = 6
+REGION_CLUSTER_GAP_PT = 14  # text blocks closer than this (and overlapping horizontally) form one cluster
+REGION_MIN_LINES = 4  # smaller text clusters are plan labels, not notes
+REGION_MIN_CHARS = 80
+REGION_MIN_TABLE_CELLS = 4
+REGION_MAX_COUNT = 12  # more candidate regions than this means no clear layout: render the whole page
+LEGEND_TERMS = ("LEGEND", "SYMBOLS", "ABBREVIATIONS")
+
+# Perceptual page hash: difference hash over a PAGE_HASH_GRID x PAGE_HASH_GRID cell grid (256 bits)
+PAGE_HASH_GRID = 16
+
+# Revision matching (match_pages): candidate previous pages are compared pixel by pixel at this zoom
+PAGE_DIFF_ZOOM = 1.0
+PAGE_DIFF_MAX_CANDIDATES = 3
+PAGE_DIFF_MAX_HASH_DISTANCE = 32  # previous pages hashing further away are not worth diffing
+
+# Vision payload encodings: format -> (MIME type, spool file extension)
+IMAGE_FORMATS = {"png": ("image/png", "png"), "jpeg": ("image/jpeg", "jpg"), "webp": ("image/webp", "webp")}
+IMAGE_COLOR_MODES = ("rgb", "gray", "bilevel", "palette")
+# Gray level below which a pixel counts as ink in bilevel mode; kept high so
+# anti-aliased hairlines and small text survive the threshold
+BILEVEL_THRESHOLD = 200
+PALETTE_COLORS = 16
+
+
+@contextmanager
+def open_pdf(pdf_base64: str = "", pdf_path: str = ""):
+    """Open a PDF from a local path or base64 data and close it afterwards.
+    
+    Paths are memory-mapped read-only and handed to PyMuPDF as a memoryview,
+    so the file is never copied into Python memory; if mapping fails the file
+    is opened by name instead. Yields None for empty or too-short input.
+    """
+    if pdf_path:
+        with open(pdf_path, "rb") as fh:
+            try:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError) as e:
+                logger.warning(f"mmap unavailable for {pdf_path} ({e}); opening by name")
+                mapped = None
+            if mapped is None:
+                doc = fitz.open(pdf_path)
+                try:
+                    yield doc
+                finally:
+                    doc.close()
+                return
+            view = memoryview(mapped)
+            try:
+                if len(view) < 10:
+                    yield None
+                    return
+                doc = fitz.open(stream=view, filetype="pdf")
+                try:
+                    yield doc
+                finally:
+                    doc.close()
+            finally:
+                view.release()
+                mapped.close()
+        return
+
+    # Handle data URI prefix if present
+    if ',' in pdf_base64 and pdf_base64.startswith('data:'):
+        pdf_base64 = pdf_base64.split(',', 1)[1]
+    
+    pdf_bytes = base64.b64decode(pdf_base64)
+    
+    if not pdf_bytes or len(pdf_bytes) < 10:
+        yield None
+        return
+    
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        yield doc
+    finally:
+        doc.close()
+
+
 @mcp.tool()
-def split_pdf_metadata(pdf_base64: str) -> str:
+def split_pdf_metadata(pdf_base64: str = "", pdf_path: str = "") -> str:
     """Returns page count and metadata without heavy image data.
     
     Args:
         pdf_base64: Base64-encoded PDF data (with or without data URI prefix)
+        pdf_path: Local path to a stored PDF (used instead of pdf_base64 when set)
         
     Returns:
         JSON string with total_pages and metadata, or error field
     """
     try:
-        # Handle data URI prefix if present
-        if ',' in pdf_base64 and pdf_base64.startswith('data:'):
-            pdf_base64 = pdf_base64.split(',', 1)[1]
-        
-        pdf_bytes = base64.b64decode(pdf_base64)
-        
-        if not pdf_bytes or len(pdf_bytes) < 10:
-            return json.dumps({"error": "Invalid or empty PDF data"})
-        
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        result = {
-            "total_pages": len(doc),
-            "metadata": doc.metadata or {}
-        }
-        doc.close()
+        with open_pdf(pdf_base64, pdf_path) as doc:
+            if doc is None:
+                return json.dumps({"error": "Invalid or empty PDF data"})
+            
+            result = {
+                "total_pages": len(doc),
+                "metadata": doc.metadata or {}
+            }
         
         logger.info(f"PDF metadata extracted: {result['total_pages']} pages")
         return json.dumps(result)
@@ -52,8 +204,17 @@ def split_pdf_metadata(pdf_base64: str) -> str:
         return json.dumps({"error": str(e)})
 
 @mcp.tool()
-def render_page_for_vision(pdf_base64: str, page_number: int, zoom_factor: float = 2.0) -> str:
-    """Renders a specific page as a High-Res PNG for Qwen VL.
+def render_page_for_vision(
+    pdf_base64: str = "",
+    page_number: int = 1,
+    zoom_factor: float = 2.0,
+    pdf_path: str = "",
+    image_format: str = "png",
+    image_color: str = "rgb",
+    image_quality: int = 85,
+    png_compression: int = -1
+) -> str:
+    """Renders a specific page as a High-Res image (PNG by default) for Qwen VL.
     
     Uses configurable zoom for crisp text recognition while balancing
     payload size for 8GB VRAM constraint.
@@ -62,59 +223,1285 @@ def render_page_for_vision(pdf_base64: str, page_number: int, zoom_factor: float
         pdf_base64: Base64-encoded PDF data
         page_number: Page number to render (1-indexed)
         zoom_factor: Zoom multiplier (1.5=fast, 2.0=balanced, 3.0=detailed, 4.0=ultra)
+        pdf_path: Local path to a stored PDF (used instead of pdf_base64 when set)
+        image_format, image_color, image_quality, png_compression: See encode_pixmap
         
     Returns:
-        JSON string with image_data (base64 PNG) and dimensions, or error field
+        JSON string with image_data (base64), mime_type, dimensions, byte_size
+        and encode_ms, or error field
+    """
+    try:
+        encoding_error = _check_encoding(image_format, image_color)
+        if encoding_error:
+            return json.dumps({"error": encoding_error})
+        
+        with open_pdf(pdf_base64, pdf_path) as doc:
+            if doc is None:
+                return json.dumps({"error": "Invalid or empty PDF data"})
+            
+            if page_number < 1 or page_number > len(doc):
+                return json.dumps({"error": f"Page {page_number} out of range (1-{len(doc)})"})
+            
+            page = doc.load_page(page_number - 1)  # 0-indexed
+            
+            # Use provided zoom factor (with fallback to environment or default)
+            if zoom_factor <= 0:
+                zoom_factor = PDF_ZOOM_FACTOR
+            
+            # Clamp zoom factor to reasonable range
+            zoom_factor = max(1.0, min(zoom_factor, 4.0))
+            
+            zoom_matrix = fitz.Matrix(zoom_factor, zoom_factor)
+            pix = page.get_pixmap(matrix=zoom_matrix, colorspace=_pixmap_colorspace(image_color))
+            
+            started = time.perf_counter()
+            image = encode_pixmap(pix, image_format, image_color, image_quality, png_compression)
+            encode_ms = round((time.perf_counter() - started) * 1000, 1)
+            img_base64 = base64.b64encode(image).decode("utf-8")
+            
+            result = {
+                "image_data": img_base64,
+                "mime_type": IMAGE_FORMATS[image_format][0],
+                "page_number": page_number,
+                "width": pix.width,
+                "height": pix.height,
+                "zoom_factor": zoom_factor,
+                "byte_size": len(image),
+                "encode_ms": encode_ms
+            }
+        
+        logger.info(f"Rendered page {page_number}: {pix.width}x{pix.height}px (zoom={zoom_factor}x, {image_format}/{image_color} {len(image)} bytes in {encode_ms}ms)")
+        
+        return json.dumps(result)
+        
+    except base64.binascii.Error as e:
+        logger.error(f"Base64 decode error: {e}")
+        return json.dumps({"error": f"Invalid base64 encoding: {str(e)}"})
+    except Exception as e:
+        logger.error(f"Page rendering error: {e}")
+        return json.dumps({"error": str(e)})
+
+class OpenDocument:
+    """A parsed PDF kept open across tool calls, addressed by content hash."""
+
+    def __init__(
+        self,
+        handle: str,
+        doc,
+        view: Optional[memoryview] = None,
+        mapped: Optional[mmap.mmap] = None,
+        path: Optional[str] = None
+    ):
+        self.handle = handle
+        self.doc = doc
+        self._view = view
+        self._mapped = mapped
+        # Render processes open the document by path; base64 documents get a spooled copy on demand
+        self._path = path
+        self._owns_path = False
+        self.refs = 0
+        self.last_used = time.monotonic()
+        # page_number -> content profile computed by profile_page
+        self.profiles: dict = {}
+        # page_number -> text layer extracted by extract_text_layer
+        self.text_layers: dict = {}
+        # page_number -> perceptual hash and text digest from page_fingerprint
+        self.fingerprints: dict = {}
+        # page_number -> regions of interest from find_regions
+        self.regions: dict = {}
+        # page_number -> page_content_hash
+        self.content_hashes: dict = {}
+
+    def fingerprint(self, page_number: int) -> dict:
+        if page_number not in self.fingerprints:
+            self.fingerprints[page_number] = page_fingerprint(self.doc.load_page(page_number - 1))
+        return self.fingerprints[page_number]
+
+    def content_hash(self, page_number: int) -> str:
+        if page_number not in self.content_hashes:
+            self.content_hashes[page_number] = page_content_hash(self.doc, self.doc.load_page(page_number - 1))
+        return self.content_hashes[page_number]
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    def file_path(self) -> str:
+        # Recreated if a spool sweep or the caller removed it
+        if self._path is None or not os.path.exists(self._path):
+            os.makedirs(PDF_SPOOL_DIR, exist_ok=True)
+            path = os.path.join(PDF_SPOOL_DIR, f"{self.handle}.pdf")
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "wb") as fh:
+                fh.write(self.doc.tobytes())
+            os.replace(tmp_path, path)
+            self._path = path
+            self._owns_path = True
+        return self._path
+
+    def release_path(self) -> None:
+        """Forget a caller-supplied file path once no caller holds the handle.
+
+        The caller may delete its file after closing, so later child-process
+        renders spool a copy of their own instead.
+        """
+        if not self._owns_path:
+            self._path = None
+
+    def close(self) -> None:
+        self.doc.close()
+        if self._view is not None:
+            self._view.release()
+        if self._mapped is not None:
+            self._mapped.close()
+        if self._owns_path:
+            try:
+                os.unlink(self._path)
+            except OSError:
+                pass
+
+
+# handle -> OpenDocument, least recently used first
+_documents: "OrderedDict[str, OpenDocument]" = OrderedDict()
+# (handle, page_number, zoom_factor, clip, encoding) -> (image bytes, width, height, encode_ms), least recently used first
+_render_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_render_cache_bytes = 0
+# Started on first batch render when PDF_RENDER_PROCESSES > 1
+_render_pool: Optional[ProcessPoolExecutor] = None
+# Inside a render process: handle -> fitz document, least recently used first
+_child_documents: "OrderedDict[str, object]" = OrderedDict()
+
+
+def _drop_render_cache(handle: str) -> None:
+    global _render_cache_bytes
+    for key in [k for k in _render_cache if k[0] == handle]:
+        _render_cache_bytes -= len(_render_cache.pop(key)[0])
+
+
+def _sweep_spool() -> None:
+    """Delete spooled page files older than PDF_SPOOL_MAX_AGE_SECONDS."""
+    try:
+        entries = list(os.scandir(PDF_SPOOL_DIR))
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - PDF_SPOOL_MAX_AGE_SECONDS
+    for entry in entries:
+        try:
+            if entry.name.endswith(".pdf") and entry.name[:-4] in _documents:
+                continue
+            if not entry.name.endswith(".tmp") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+def _spool_page(image: bytes, handle: str, page_number: int, extension: str = "png") -> str:
+    """Write a rendered page to the spool directory and return its path."""
+    os.makedirs(PDF_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(PDF_SPOOL_DIR, f"{handle[:16]}-p{page_number}-{uuid.uuid4().hex[:8]}.{extension}")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(image)
+    # Atomic rename: readers never see a partially written page
+    os.replace(tmp_path, path)
+    return path
+
+
+def _evict_documents() -> None:
+    """Close documents idle past their TTL, then unreferenced LRU overflow.
+    
+    The TTL applies even to referenced handles so a client that disappeared
+    without calling close_document cannot pin a document forever.
+    """
+    now = time.monotonic()
+    for handle, entry in list(_documents.items()):
+        if now - entry.last_used > PDF_DOC_TTL_SECONDS:
+            _close_entry(handle)
+            logger.info(f"Closed idle document {handle}")
+    for handle, entry in list(_documents.items()):
+        if len(_documents) <= PDF_MAX_OPEN_DOCUMENTS:
+            break
+        if entry.refs <= 0:
+            _close_entry(handle)
+
+
+def _close_entry(handle: str) -> None:
+    entry = _documents.pop(handle, None)
+    if entry is not None:
+        entry.close()
+    _drop_render_cache(handle)
+
+
+def profile_page(page) -> dict:
+    """Collect content-density signals for one page without rasterizing it."""
+    sizes = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                if span.get("text", "").strip():
+                    sizes.append(span.get("size", 0.0))
+    sizes.sort()
+    return {
+        "text_spans": len(sizes),
+        # 10th percentile rather than min so a stray tiny glyph does not force 4x
+        "small_font_pt": round(sizes[len(sizes) // 10], 2) if sizes else None,
+        "drawings": len(page.get_cdrawings()),
+        "images": len(page.get_images()),
+        "width_pt": round(page.rect.width, 1),
+        "height_pt": round(page.rect.height, 1)
+    }
+
+
+def choose_zoom(profile: dict) -> float:
+    """Pick the smallest zoom (in 0.5 steps, 1.0-4.0) that keeps small text legible."""
+    if profile["small_font_pt"]:
+        zoom = PDF_AUTO_ZOOM_TARGET_PX / profile["small_font_pt"]
+        if profile["drawings"] > DENSE_DRAWINGS:
+            zoom = max(zoom, PDF_ZOOM_FACTOR)
+    elif profile["drawings"] > DENSE_DRAWINGS:
+        # Outlined (vectorized) text: no font sizes to go on, so render generously
+        zoom = 3.0
+    elif profile["images"]:
+        # Scanned sheet: zooming past the scan's own resolution adds pixels, not detail
+        zoom = PDF_ZOOM_FACTOR
+    else:
+        # Blank or near-blank sheet
+        zoom = 1.0
+    
+    zoom = max(1.0, min(4.0, math.ceil(zoom * 2) / 2))
+    # Respect the pixel budget on oversized sheets
+    area = profile["width_pt"] * profile["height_pt"]
+    if area > 0:
+        zoom = min(zoom, max(1.0, math.floor(math.sqrt(PDF_AUTO_ZOOM_MAX_PIXELS / area) * 2) / 2))
+    return zoom
+
+
+def page_content_hash(doc, page) -> str:
+    """Return a SHA-256 over what a page draws: its size, rotation, content stream and images.
+    
+    Identical pages in two revisions of a drawing set hash the same wherever
+    they sit in the set; any change to the drawing commands or an embedded
+    image changes the hash.
+    """
+    digest = hashlib.sha256(f"{tuple(page.rect)}|{page.rotation}".encode("utf-8"))
+    digest.update(page.read_contents())
+    for xref, *_ in page.get_images(full=True) + page.get_xobjects():
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    return digest.hexdigest()
+
+
+def _changed_fraction(page_a, page_b) -> float:
+    """Share of pixels that differ between two pages rendered in grayscale at PAGE_DIFF_ZOOM (1.0 if sizes differ)."""
+    matrix = fitz.Matrix(PAGE_DIFF_ZOOM, PAGE_DIFF_ZOOM)
+    pix_a = page_a.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+    pix_b = page_b.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+    if (pix_a.width, pix_a.height) != (pix_b.width, pix_b.height):
+        return 1.0
+    samples_a, samples_b = pix_a.samples, pix_b.samples
+    if samples_a == samples_b:
+        return 0.0
+    # XOR as big integers keeps the comparison in C; changed pixels are the non-zero bytes
+    diff = (int.from_bytes(samples_a, "big") ^ int.from_bytes(samples_b, "big")).to_bytes(len(samples_a), "big")
+    return (len(diff) - diff.count(0)) / len(diff)
+
+
+def page_fingerprint(page) -> dict:
+    """Compute a zoom-independent perceptual hash and a text digest for one page.
+    
+    phash is a difference hash of the page's grayscale thumbnail: each bit says
+    whether a cell is brighter than its right neighbour, so near-identical
+    sheets (a revision cloud, a moved note) differ in a few bits. Line art
+    hides differences in small text, so text_digest (SHA-256 of the page's
+    whitespace-normalized text, None without a text layer) lets callers
+    require identical text as well.
     """
+    grid = PAGE_HASH_GRID
+    rect = page.rect
+    # Supersample 4x per cell, then average, so thin lines still register
+    matrix = fitz.Matrix(4 * (grid + 1) / rect.width, 4 * grid / rect.height)
+    pix = page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+    sums = [[0] * (grid + 1) for _ in range(grid)]
+    counts = [[0] * (grid + 1) for _ in range(grid)]
+    samples = pix.samples
+    for y in range(pix.height):
+        row = y * grid // pix.height
+        offset = y * pix.stride
+        for x in range(pix.width):
+            col = x * (grid + 1) // pix.width
+            sums[row][col] += samples[offset + x]
+            counts[row][col] += 1
+    cells = [[sums[r][c] / max(counts[r][c], 1) for c in range(grid + 1)] for r in range(grid)]
+    bits = 0
+    for r in range(grid):
+        for c in range(grid):
+            bits = (bits << 1) | (cells[r][c] > cells[r][c + 1])
+    
+    text = " ".join(page.get_text().split())
+    return {
+        "phash": f"{bits:0{grid * grid // 4}x}",
+        "text_digest": hashlib.sha256(text.encode("utf-8")).hexdigest() if text else None
+    }
+
+
+def find_sheet_number(page) -> Optional[str]:
+    """Return the title-block sheet number (largest matching text in the bottom-right), or None."""
+    span = _find_sheet_number_span(page)
+    return span[0] if span else None
+
+
+def _find_sheet_number_span(page) -> Optional[tuple]:
+    rect = page.rect
+    best = None
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                text = span.get("text", "").strip().upper()
+                x0, y0 = span["bbox"][0], span["bbox"][1]
+                in_title_block = (
+                    x0 >= rect.x0 + rect.width * TITLE_BLOCK_FRACTION
+                    or y0 >= rect.y0 + rect.height * TITLE_BLOCK_FRACTION
+                )
+                if in_title_block and SHEET_NUMBER_PATTERN.match(text):
+                    if best is None or span.get("size", 0) > best[0]:
+                        best = (span.get("size", 0), text, fitz.Rect(span["bbox"]))
+    return best[1:] if best else None
+
+
+def _cluster_text_blocks(blocks: list) -> list:
+    """Merge text blocks stacked closer than REGION_CLUSTER_GAP_PT into (rect, line_count, text) clusters."""
+    clusters = [[fitz.Rect(b["bbox"]), len(b["lines"]), _block_text(b)] for b in blocks]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(clusters)):
+            for j in range(i + 1, len(clusters)):
+                a, b = clusters[i][0], clusters[j][0]
+                gap = max(b.y0 - a.y1, a.y0 - b.y1)
+                overlaps_horizontally = min(a.x1, b.x1) - max(a.x0, b.x0) > 0
+                if gap <= REGION_CLUSTER_GAP_PT and overlaps_horizontally:
+                    clusters[i] = [a | b, clusters[i][1] + clusters[j][1], f"{clusters[i][2]} {clusters[j][2]}"]
+                    del clusters[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return clusters
+
+
+def _block_text(block: dict) -> str:
+    return " ".join(span.get("text", "") for line in block.get("lines", []) for span in line.get("spans", [])).strip()
+
+
+def find_regions(page) -> list:
+    """Find the parts of a sheet that carry facts rather than linework.
+    
+    Returns {"kind", "rect"} dicts (rect in PDF points, reading order) for
+    vector-ruled tables ("schedule"), the text around the title-block sheet
+    number ("title_block") and multi-line text clusters ("notes", or
+    "legend" when they say so). Scanned pages have no text layer to go on and
+    yield no regions.
+    """
+    rect = page.rect
+    found = []
     try:
-        # Handle data URI prefix if present
-        if ',' in pdf_base64 and pdf_base64.startswith('data:'):
-            pdf_base64 = pdf_base64.split(',', 1)[1]
+        for table in page.find_tables().tables:
+            cells = [cell for row in table.extract() for cell in row if cell and cell.strip()]
+            if len(cells) >= REGION_MIN_TABLE_CELLS:
+                found.append(("schedule", fitz.Rect(table.bbox)))
+    except Exception as e:
+        logger.warning(f"Table detection failed on page {page.number + 1}: {e}")
+    
+    blocks = [
+        b for b in page.get_text("dict").get("blocks", [])
+        if b.get("type") == 0 and _block_text(b)
+    ]
+    sheet_number = _find_sheet_number_span(page)
+    if sheet_number:
+        # Title blocks sit in the corner around the sheet number
+        _, number_rect = sheet_number
+        corner = fitz.Rect(number_rect.x0 - rect.width * 0.15, number_rect.y0 - rect.height * 0.25, rect.x1, rect.y1)
+        title_block = fitz.Rect(number_rect)
+        for block in blocks:
+            if fitz.Rect(block["bbox"]) in corner:
+                title_block |= fitz.Rect(block["bbox"])
+        found.append(("title_block", title_block))
+    
+    claimed = [region for _, region in found]
+    free_blocks = [b for b in blocks if not any(fitz.Rect(b["bbox"]).intersects(region) for region in claimed)]
+    for cluster_rect, line_count, text in _cluster_text_blocks(free_blocks):
+        if line_count >= REGION_MIN_LINES and len(text) >= REGION_MIN_CHARS:
+            kind = "legend" if any(term in text.upper() for term in LEGEND_TERMS) else "notes"
+            found.append((kind, cluster_rect))
+    
+    regions = []
+    for i, (kind, region) in enumerate(found):
+        # Drop regions inside another one (a notes table found both as table and text)
+        if any(region in other and (region != other or j < i) for j, (_, other) in enumerate(found) if j != i):
+            continue
+        region = fitz.Rect(region.x0 - REGION_PADDING_PT, region.y0 - REGION_PADDING_PT,
+                           region.x1 + REGION_PADDING_PT, region.y1 + REGION_PADDING_PT) & rect
+        if not region.is_empty:
+            regions.append({"kind": kind, "rect": [round(v, 1) for v in region]})
+    regions.sort(key=lambda r: (r["rect"][1], r["rect"][0]))
+    return regions
+
+
+def classify_page(page) -> dict:
+    """Classify a sheet as blank, cover, general, mechanical, schedule, non_mechanical or unknown.
+    
+    Cheap signals only: a grayscale thumbnail's ink coverage, the text layer
+    (HVAC and cover-sheet vocabulary), the title-block sheet number's
+    discipline prefix and the vector path count. Pages without a text layer
+    that are not blank, and drawings whose labels are outlined rather than
+    text, are unknown, since only the vision model can read them.
+    """
+    rect = page.rect
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(CLASSIFY_THUMBNAIL_WIDTH / rect.width, CLASSIFY_THUMBNAIL_WIDTH / rect.width),
+        colorspace=fitz.csGRAY, alpha=False
+    )
+    ink = pix.samples.translate(_INK_TABLE).count(1) / max(len(pix.samples), 1)
+    text = " ".join(page.get_text().split()).upper()
+    char_count = len(text.replace(" ", ""))
+    sheet_number = find_sheet_number(page) if char_count else None
+    discipline = SHEET_DISCIPLINES.get(SHEET_NUMBER_PATTERN.match(sheet_number).group(1)) if sheet_number else None
+    hvac_terms = sorted(set(_HVAC_TERMS_RE.findall(text)))
+    cover_terms = sorted(set(_COVER_TERMS_RE.findall(text)))
+    drawings = len(page.get_cdrawings())
+    
+    reasons = [f"ink coverage {ink:.1%}"]
+    if sheet_number:
+        reasons.append(f"sheet number {sheet_number}" + (f" ({discipline})" if discipline else ""))
+    if hvac_terms:
+        reasons.append(f"HVAC terms: {', '.join(hvac_terms[:6])}")
+    if cover_terms:
+        reasons.append(f"cover terms: {', '.join(cover_terms)}")
+    
+    if ink < BLANK_INK_COVERAGE and char_count < BLANK_MAX_CHARS:
+        category = "blank"
+    elif discipline == "mechanical" or (discipline is None and len(hvac_terms) >= HVAC_TERMS_MIN):
+        category = "schedule" if "SCHEDULE" in text else "mechanical"
+    elif cover_terms and discipline in (None, "general"):
+        category = "cover"
+    elif discipline is not None:
+        category = discipline
+    elif char_count < BLANK_MAX_CHARS:
+        category = "unknown"
+        reasons.append("no text layer")
+    elif drawings > DENSE_DRAWINGS and char_count <= OUTLINED_MAX_CHARS:
+        # The text is title-block boilerplate; the drawing's own labels are vector paths
+        category = "unknown"
+        reasons.append(f"{drawings} vector paths with little text (labels likely outlined)")
+    else:
+        category = "non_mechanical"
+        reasons.append("text layer has no HVAC terms")
+    
+    return {
+        "category": category,
+        "sheet_number": sheet_number,
+        "ink_coverage": round(ink, 4),
+        "char_count": char_count,
+        "reasons": reasons
+    }
+
+
+@mcp.tool()
+def open_document(pdf_base64: str = "", pdf_path: str = "", handle: str = "") -> str:
+    """Opens a PDF once and returns a handle for page rendering by handle.
+    
+    The handle is the document's content hash, so opening identical content
+    again reuses the already-parsed document. Every open should be paired with
+    close_document; documents are closed after an idle TTL either way.
+    
+    Args:
+        pdf_base64: Base64-encoded PDF data (with or without data URI prefix)
+        pdf_path: Local path to a stored PDF (memory-mapped, used instead of pdf_base64 when set)
+        handle: Handle from an earlier open of the same content; if this worker still has
+            it open, it is reused without reading or hashing the PDF again (the other
+            arguments are the fallback when it does not)
         
-        pdf_bytes = base64.b64decode(pdf_base64)
+    Returns:
+        JSON string with handle, total_pages, metadata and cached flag, or error field
+    """
+    try:
+        _evict_documents()
+        _sweep_spool()
+        if handle and handle in _documents:
+            return _open_result(_documents[handle], cached=True)
+        view = mapped = None
+        if pdf_path:
+            with open(pdf_path, "rb") as fh:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+            data = view
+        else:
+            if ',' in pdf_base64 and pdf_base64.startswith('data:'):
+                pdf_base64 = pdf_base64.split(',', 1)[1]
+            data = base64.b64decode(pdf_base64)
         
-        if not pdf_bytes or len(pdf_bytes) < 10:
+        if len(data) < 10:
+            if view is not None:
+                view.release()
+                mapped.close()
             return json.dumps({"error": "Invalid or empty PDF data"})
         
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        handle = hashlib.sha256(data).hexdigest()[:32]
+        entry = _documents.get(handle)
+        cached = entry is not None
+        if cached:
+            if view is not None:
+                view.release()
+                mapped.close()
+        else:
+            try:
+                doc = fitz.open(stream=data, filetype="pdf")
+            except Exception:
+                if view is not None:
+                    view.release()
+                    mapped.close()
+                raise
+            entry = OpenDocument(handle, doc, view, mapped, path=os.path.abspath(pdf_path) if pdf_path else None)
+            _documents[handle] = entry
+        return _open_result(entry, cached)
         
-        if page_number < 1 or page_number > len(doc):
-            doc.close()
-            return json.dumps({"error": f"Page {page_number} out of range (1-{len(doc)})"})
+    except base64.binascii.Error as e:
+        logger.error(f"Base64 decode error: {e}")
+        return json.dumps({"error": f"Invalid base64 encoding: {str(e)}"})
+    except Exception as e:
+        logger.error(f"Document open error: {e}")
+        return json.dumps({"error": str(e)})
+
+
+def _open_result(entry: OpenDocument, cached: bool) -> str:
+    """Take a reference on an open document and describe it as open_document does."""
+    entry.refs += 1
+    entry.touch()
+    _documents.move_to_end(entry.handle)
+    result = {
+        "handle": entry.handle,
+        "total_pages": len(entry.doc),
+        "metadata": entry.doc.metadata or {},
+        "cached": cached
+    }
+    logger.info(f"Opened document {entry.handle}: {result['total_pages']} pages (cached={cached})")
+    return json.dumps(result)
+
+
+def _check_encoding(image_format: str, image_color: str) -> Optional[str]:
+    if image_format not in IMAGE_FORMATS:
+        return f"Unsupported image_format {image_format!r} (expected one of {', '.join(IMAGE_FORMATS)})"
+    if image_color not in IMAGE_COLOR_MODES:
+        return f"Unsupported image_color {image_color!r} (expected one of {', '.join(IMAGE_COLOR_MODES)})"
+    return None
+
+
+def _pixmap_colorspace(image_color: str):
+    # Gray and bilevel pages are rasterized with one channel, a third of the RGB work
+    return fitz.csGRAY if image_color in ("gray", "bilevel") else fitz.csRGB
+
+
+def encode_pixmap(
+    pix,
+    image_format: str = "png",
+    image_color: str = "rgb",
+    quality: int = 85,
+    png_compression: int = -1
+) -> bytes:
+    """Encode a rendered pixmap for the vision model.
+    
+    PNG (at MuPDF's default compression) and JPEG in RGB or gray are encoded
+    by MuPDF directly. WebP, bilevel (1-bit), palette and explicit PNG
+    compression levels go through Pillow.
+    
+    Args:
+        pix: Pixmap rendered with _pixmap_colorspace(image_color)
+        image_format: "png", "jpeg" or "webp"
+        image_color: "rgb", "gray", "bilevel" (thresholded 1-bit) or "palette"
+            (16-color adaptive palette, keeps colored linework distinguishable)
+        quality: JPEG/WebP quality 1-100 (WebP 100 is lossless)
+        png_compression: zlib level 0-9 for PNG, -1 for the encoder default
+    """
+    if image_color in ("rgb", "gray"):
+        if image_format == "jpeg":
+            return pix.tobytes("jpeg", jpg_quality=quality)
+        if image_format == "png" and png_compression < 0:
+            return pix.tobytes("png")
+    
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError(f"{image_format}/{image_color} encoding requires Pillow (pip install pillow)")
+    
+    img = Image.frombytes("L" if pix.n == 1 else "RGB", (pix.width, pix.height), pix.samples)
+    if image_color == "bilevel":
+        img = img.point(lambda v: 255 if v >= BILEVEL_THRESHOLD else 0, mode="1")
+    elif image_color == "palette":
+        img = img.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    
+    buffer = io.BytesIO()
+    if image_format == "png":
+        img.save(buffer, "PNG", compress_level=6 if png_compression < 0 else png_compression)
+    elif image_format == "webp":
+        img.save(buffer, "WEBP", quality=quality, lossless=quality >= 100)
+    else:
+        # JPEG has no 1-bit or palette mode
+        img.convert("RGB" if img.mode == "P" else "L").save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _rasterize(doc, page_number: int, zoom_factor: float, encoding: tuple, clip: Optional[tuple] = None) -> tuple:
+    """Rasterize and encode a page, or a clip of it in PDF points, to (image, width, height, encode_ms).
+    
+    encoding is (image_format, image_color, quality, png_compression).
+    """
+    image_format, image_color, quality, png_compression = encoding
+    page = doc.load_page(page_number - 1)
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(zoom_factor, zoom_factor),
+        clip=fitz.Rect(clip) if clip else None,
+        colorspace=_pixmap_colorspace(image_color)
+    )
+    started = time.perf_counter()
+    image = encode_pixmap(pix, image_format, image_color, quality, png_compression)
+    encode_ms = round((time.perf_counter() - started) * 1000, 1)
+    return image, pix.width, pix.height, encode_ms
+
+
+def _init_render_process() -> None:
+    # Children inherit stdout, which carries the MCP stdio stream; send stray output to stderr
+    os.dup2(2, 1)
+
+
+def _rasterize_in_process(handle: str, pdf_path: str, page_number: int, zoom_factor: float, encoding: tuple, clip: Optional[tuple]) -> tuple:
+    """Render-pool entry point: rasterize from a per-process cache of documents opened by path."""
+    doc = _child_documents.get(handle)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+        _child_documents[handle] = doc
+        while len(_child_documents) > RENDER_PROCESS_MAX_DOCUMENTS:
+            _child_documents.popitem(last=False)[1].close()
+    _child_documents.move_to_end(handle)
+    return _rasterize(doc, page_number, zoom_factor, encoding, clip)
+
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the render process pool, starting it on first use (None when PDF_RENDER_PROCESSES <= 1)."""
+    global _render_pool
+    if _render_pool is None and PDF_RENDER_PROCESSES > 1:
+        # spawn, not fork: this process runs asyncio and stdio threads that fork would copy mid-flight
+        _render_pool = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_process
+        )
+        logger.info(f"Started render pool with {PDF_RENDER_PROCESSES} processes")
+    return _render_pool
+
+
+def _cache_render(cache_key: tuple, rendered: tuple) -> None:
+    global _render_cache_bytes
+    if len(rendered[0]) <= PDF_RENDER_CACHE_BYTES:
+        _render_cache[cache_key] = rendered
+        _render_cache_bytes += len(rendered[0])
+        while _render_cache_bytes > PDF_RENDER_CACHE_BYTES:
+            _, evicted = _render_cache.popitem(last=False)
+            _render_cache_bytes -= len(evicted[0])
+
+
+def _render_images(entry: OpenDocument, requests: list, encoding: tuple) -> list:
+    """Render (page_number, zoom_factor, clip) requests to (image, width, height, encode_ms) each.
+    
+    Hits come from the LRU render cache. With a render pool, two or more
+    misses are rasterized in parallel across its processes; a single miss is
+    rendered here to skip the IPC round trip.
+    """
+    results: list = [None] * len(requests)
+    misses = []
+    for i, (page_number, zoom_factor, clip) in enumerate(requests):
+        cache_key = (entry.handle, page_number, zoom_factor, clip, encoding)
+        cached = _render_cache.get(cache_key)
+        if cached is not None:
+            _render_cache.move_to_end(cache_key)
+            results[i] = cached
+        else:
+            misses.append(i)
+    
+    rendered = {}
+    pool = _get_render_pool() if len(misses) > 1 else None
+    if pool is not None:
+        global _render_pool
+        try:
+            pdf_path = entry.file_path()
+            futures = {
+                i: pool.submit(_rasterize_in_process, entry.handle, pdf_path, requests[i][0], requests[i][1], encoding, requests[i][2])
+                for i in misses
+            }
+            rendered = {i: future.result() for i, future in futures.items()}
+        except BrokenProcessPool as e:
+            logger.warning(f"Render pool died, rendering in-process: {e}")
+            _render_pool = None
+            rendered = {}
+        except Exception as e:
+            logger.warning(f"Render pool failed, rendering in-process: {e}")
+            rendered = {}
+    for i in misses:
+        if i not in rendered:
+            rendered[i] = _rasterize(entry.doc, requests[i][0], requests[i][1], encoding, requests[i][2])
+    
+    for i in misses:
+        page_number, zoom_factor, clip = requests[i]
+        image, width, height, encode_ms = rendered[i]
+        logger.info(
+            f"Rendered page {page_number} of {entry.handle}{' clip' if clip else ''}: {width}x{height}px "
+            f"(zoom={zoom_factor}x, {encoding[0]}/{encoding[1]} {len(image)} bytes in {encode_ms}ms)"
+        )
+        _cache_render((entry.handle, page_number, zoom_factor, clip, encoding), rendered[i])
+        results[i] = rendered[i]
+    return results
+
+
+def plan_tiles(width: int, height: int, max_pixels: int, overlap: int) -> list:
+    """Split a width x height pixel area into overlapping tiles of at most max_pixels.
+    
+    Returns (row, col, x0, y0, x1, y1) pixel rects in reading order. Neighbouring
+    tiles share ``overlap`` pixels so text cut by one tile edge is whole in the next.
+    """
+    side = int(math.sqrt(max_pixels))
+    overlap = max(0, min(overlap, side // 4))
+    
+    def spans(length: int) -> list:
+        if length <= side:
+            return [(0, length)]
+        count = math.ceil((length - overlap) / (side - overlap))
+        step = (length - overlap) / count
+        return [(round(i * step), min(length, round(i * step + step + overlap))) for i in range(count)]
+    
+    return [
+        (row, col, x0, y0, x1, y1)
+        for row, (y0, y1) in enumerate(spans(height))
+        for col, (x0, x1) in enumerate(spans(width))
+    ]
+
+
+def _attach_image(result: dict, image: bytes, handle: str, page_number: int, transport: str, extension: str) -> dict:
+    if transport == "file":
+        # Only the path crosses the stdio pipe; the API reads the raw bytes
+        result["image_path"] = _spool_page(image, handle, page_number, extension)
+    else:
+        result["image_data"] = base64.b64encode(image).decode("utf-8")
+    return result
+
+
+def _render_page_results(
+    entry: OpenDocument,
+    page_numbers: list,
+    zoom_factor: float,
+    transport: str,
+    auto_zoom: bool,
+    tile_max_pixels: int,
+    tile_overlap_px: int,
+    image_format: str,
+    image_color: str,
+    image_quality: int,
+    png_compression: int,
+    fingerprint: bool = False,
+    region_zoom: float = 0,
+    region_max_fraction: float = 0.5,
+    max_pixels: int = 0
+) -> list:
+    """Build render_page results for several pages, rasterizing all pages, tiles and crops in one batch."""
+    mime_type, extension = IMAGE_FORMATS[image_format]
+    encoding = (image_format, image_color, max(1, min(image_quality, 100)), min(png_compression, 9))
+    
+    plans = []
+    requests = []
+    for page_number in page_numbers:
+        if page_number < 1 or page_number > len(entry.doc):
+            plans.append(({"page_number": page_number, "error": f"Page {page_number} out of range (1-{len(entry.doc)})"}, None, []))
+            continue
         
-        page = doc.load_page(page_number - 1)  # 0-indexed
+        profile = None
+        page_zoom = zoom_factor
+        if auto_zoom:
+            profile = entry.profiles.get(page_number)
+            if profile is None:
+                profile = profile_page(entry.doc.load_page(page_number - 1))
+                entry.profiles[page_number] = profile
+            page_zoom = choose_zoom(profile)
+        elif page_zoom <= 0:
+            page_zoom = PDF_ZOOM_FACTOR
+        page_zoom = max(1.0, min(page_zoom, 4.0))
         
-        # Use provided zoom factor (with fallback to environment or default)
-        if zoom_factor <= 0:
-            zoom_factor = PDF_ZOOM_FACTOR
+        rect = entry.doc.load_page(page_number - 1).rect
+        if max_pixels > 0 and rect.width * rect.height * page_zoom ** 2 > max_pixels:
+            # Whole-page budget: scale down instead of tiling, below 1.0 if need be
+            page_zoom = round(math.sqrt(max_pixels / (rect.width * rect.height)), 3)
+        width, height = round(rect.width * page_zoom), round(rect.height * page_zoom)
+        result = {
+            "page_number": page_number,
+            "width": width,
+            "height": height,
+            "zoom_factor": page_zoom,
+            "mime_type": mime_type
+        }
+        if profile is not None:
+            result["zoom_signals"] = profile
+        if fingerprint:
+            result.update(entry.fingerprint(page_number))
         
-        # Clamp zoom factor to reasonable range
-        zoom_factor = max(1.0, min(zoom_factor, 4.0))
+        regions = []
+        if region_zoom > 0:
+            if page_number not in entry.regions:
+                entry.regions[page_number] = find_regions(entry.doc.load_page(page_number - 1))
+            candidates = entry.regions[page_number]
+            covered = sum((r[2] - r[0]) * (r[3] - r[1]) for r in (c["rect"] for c in candidates))
+            if 0 < len(candidates) <= REGION_MAX_COUNT and covered <= rect.width * rect.height * region_max_fraction:
+                regions = [dict(candidate) for candidate in candidates]
         
-        zoom_matrix = fitz.Matrix(zoom_factor, zoom_factor)
-        pix = page.get_pixmap(matrix=zoom_matrix)
+        parts = []
+        if regions:
+            # Facts live in schedules, notes and the title block: crop those at high zoom
+            for region in regions:
+                x0, y0, x1, y1 = region["rect"]
+                crop_zoom = max(1.0, min(region_zoom, 4.0))
+                if tile_max_pixels > 0 and (x1 - x0) * (y1 - y0) * crop_zoom ** 2 > tile_max_pixels:
+                    crop_zoom = max(1.0, math.sqrt(tile_max_pixels / ((x1 - x0) * (y1 - y0))))
+                region["zoom_factor"] = round(crop_zoom, 2)
+                parts.append(region)
+                requests.append((page_number, region["zoom_factor"], tuple(region["rect"])))
+        elif tile_max_pixels > 0 and width * height > tile_max_pixels:
+            for row, col, x0, y0, x1, y1 in plan_tiles(width, height, tile_max_pixels, tile_overlap_px):
+                clip = (
+                    rect.x0 + x0 / page_zoom, rect.y0 + y0 / page_zoom,
+                    rect.x0 + x1 / page_zoom, rect.y0 + y1 / page_zoom
+                )
+                parts.append({"row": row, "col": col, "x0": x0, "y0": y0, "x1": x1, "y1": y1})
+                requests.append((page_number, page_zoom, clip))
+        else:
+            requests.append((page_number, page_zoom, None))
+        plans.append((result, "regions" if regions else "tiles", parts))
+    
+    images = iter(_render_images(entry, requests, encoding))
+    results = []
+    for result, parts_key, parts in plans:
+        if "error" not in result:
+            page_number = result["page_number"]
+            if parts:
+                for part in parts:
+                    image, part["width"], part["height"], part["encode_ms"] = next(images)
+                    part["mime_type"] = mime_type
+                    part["byte_size"] = len(image)
+                    _attach_image(part, image, entry.handle, page_number, transport, extension)
+                result[parts_key] = parts
+                result["byte_size"] = sum(p["byte_size"] for p in parts)
+                result["encode_ms"] = round(sum(p["encode_ms"] for p in parts), 1)
+                if parts_key == "regions":
+                    logger.info(
+                        f"Cropped page {page_number} of {entry.handle} to {len(parts)} regions "
+                        f"({', '.join(p['kind'] for p in parts)})"
+                    )
+                else:
+                    logger.info(f"Tiled page {page_number} of {entry.handle} into {len(parts)} tiles")
+            else:
+                image, result["width"], result["height"], result["encode_ms"] = next(images)
+                result["byte_size"] = len(image)
+                _attach_image(result, image, entry.handle, page_number, transport, extension)
+        results.append(result)
+    return results
+
+
+def _checkout_document(handle: str) -> Optional[OpenDocument]:
+    _evict_documents()
+    entry = _documents.get(handle)
+    if entry is not None:
+        entry.touch()
+        _documents.move_to_end(handle)
+    return entry
+
+
+@mcp.tool()
+def render_page(
+    handle: str,
+    page_number: int,
+    zoom_factor: float = 2.0,
+    transport: str = "inline",
+    auto_zoom: bool = False,
+    tile_max_pixels: int = 0,
+    tile_overlap_px: int = 96,
+    image_format: str = "png",
+    image_color: str = "rgb",
+    image_quality: int = 85,
+    png_compression: int = -1,
+    fingerprint: bool = False,
+    region_zoom: float = 0,
+    region_max_fraction: float = 0.5,
+    max_pixels: int = 0
+) -> str:
+    """Renders a page of an open document (same output as render_page_for_vision).
+    
+    Repeat renders of the same page and zoom are served from an in-memory
+    LRU cache. The tiles of an oversized page are rendered in parallel when
+    the render pool is enabled.
+    
+    Args:
+        handle: Handle returned by open_document
+        page_number: Page number to render (1-indexed)
+        zoom_factor: Zoom multiplier (1.5=fast, 2.0=balanced, 3.0=detailed, 4.0=ultra)
+        transport: "inline" returns base64 image_data; "file" writes the image to the
+            spool directory and returns image_path instead (the caller deletes it)
+        auto_zoom: Ignore zoom_factor and pick one from the page's text size and
+            drawing density (reported as zoom_factor plus zoom_signals)
+        tile_max_pixels: When the rendered page would exceed this many pixels, return
+            overlapping tiles of at most this size instead of one image (0 disables)
+        tile_overlap_px: Pixels shared by neighbouring tiles
+        image_format: "png", "jpeg" or "webp"
+        image_color: "rgb", "gray", "bilevel" or "palette"
+        image_quality: JPEG/WebP quality 1-100
+        png_compression: PNG zlib level 0-9, -1 for the encoder default
+        fingerprint: Also return the page's phash and text_digest (see page_fingerprint)
+            for near-duplicate detection
+        region_zoom: When > 0, render only the page's schedules, notes, legend and title
+            block (see find_regions) as crops at this zoom, returned as a regions list with
+            kind and rect; pages whose regions are missing or cover more than
+            region_max_fraction of the page are rendered whole
+        region_max_fraction: Largest share of the page area the regions may cover
+        max_pixels: Lower the zoom (even below 1.0) so the whole page fits in this many
+            pixels; with tile_max_pixels=0 this gives one downscaled image (0 disables)
+        
+    Returns:
+        JSON string with image_data or image_path, mime_type, dimensions,
+        byte_size, encode_ms and zoom_factor (or a tiles list with per-tile
+        images and pixel rects, or a regions list of crops), or error field
+    """
+    try:
+        encoding_error = _check_encoding(image_format, image_color)
+        if encoding_error:
+            return json.dumps({"error": encoding_error})
+        entry = _checkout_document(handle)
+        if entry is None:
+            return json.dumps({"error": f"Unknown or expired document handle: {handle}"})
+        
+        result = _render_page_results(
+            entry, [page_number], zoom_factor, transport, auto_zoom, tile_max_pixels, tile_overlap_px,
+            image_format, image_color, image_quality, png_compression, fingerprint,
+            region_zoom, region_max_fraction, max_pixels
+        )[0]
+        if "error" in result:
+            return json.dumps({"error": result["error"]})
+        return json.dumps(result)
+        
+    except Exception as e:
+        logger.error(f"Page rendering error: {e}")
+        return json.dumps({"error": str(e)})
+
+
+@mcp.tool()
+def render_pages(
+    handle: str,
+    page_numbers: list[int],
+    zoom_factor: float = 2.0,
+    transport: str = "inline",
+    auto_zoom: bool = False,
+    tile_max_pixels: int = 0,
+    tile_overlap_px: int = 96,
+    image_format: str = "png",
+    image_color: str = "rgb",
+    image_quality: int = 85,
+    png_compression: int = -1,
+    fingerprint: bool = False,
+    region_zoom: float = 0,
+    region_max_fraction: float = 0.5,
+    max_pixels: int = 0
+) -> str:
+    """Renders several pages of an open document in one call.
+    
+    With PDF_RENDER_PROCESSES > 1 the pages (and their tiles) are rasterized
+    in parallel across the render process pool; otherwise one after another.
+    Arguments are those of render_page, with page_numbers instead of page_number.
+    
+    Returns:
+        JSON string with a pages list of render_page results in the requested
+        order (a page that cannot be rendered has its own error field), or error field
+    """
+    try:
+        encoding_error = _check_encoding(image_format, image_color)
+        if encoding_error:
+            return json.dumps({"error": encoding_error})
+        entry = _checkout_document(handle)
+        if entry is None:
+            return json.dumps({"error": f"Unknown or expired document handle: {handle}"})
         
-        img_base64 = base64.b64encode(pix.tobytes("png")).decode("utf-8")
+        started = time.perf_counter()
+        results = _render_page_results(
+            entry, page_numbers, zoom_factor, transport, auto_zoom, tile_max_pixels, tile_overlap_px,
+            image_format, image_color, image_quality, png_compression, fingerprint,
+            region_zoom, region_max_fraction, max_pixels
+        )
+        logger.info(f"Rendered {len(page_numbers)} pages of {handle} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return json.dumps({"pages": results})
         
+    except Exception as e:
+        logger.error(f"Batch rendering error: {e}")
+        return json.dumps({"error": str(e)})
+
+
+@mcp.tool()
+def render_preview(handle: str, page_number: int, width: int = 640, transport: str = "inline") -> str:
+    """Renders a page of an open document as a PNG preview of the given pixel width.
+    
+    Unlike render_page the zoom is derived from the width and may go below
+    1.0, and the result bypasses the render cache (the API caches previews
+    on disk).
+    
+    Args:
+        handle: Handle returned by open_document
+        page_number: Page number to render (1-indexed)
+        width: Target image width in pixels (height keeps the page's aspect ratio)
+        transport: "inline" for base64 image_data, "file" for a spooled image_path
+        
+    Returns:
+        JSON string with image_data or image_path, mime_type, width, height and
+        byte_size, or error field
+    """
+    try:
+        _evict_documents()
+        entry = _documents.get(handle)
+        if entry is None:
+            return json.dumps({"error": f"Unknown or expired document handle: {handle}"})
+        entry.touch()
+        _documents.move_to_end(handle)
+        
+        if page_number < 1 or page_number > len(entry.doc):
+            return json.dumps({"error": f"Page {page_number} out of range (1-{len(entry.doc)})"})
+        
+        page = entry.doc.load_page(page_number - 1)
+        zoom_factor = max(0.05, min(width / page.rect.width, 4.0))
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor))
+        image = pix.tobytes("png")
         result = {
-            "image_data": img_base64,
             "page_number": page_number,
             "width": pix.width,
             "height": pix.height,
-            "zoom_factor": zoom_factor
+            "mime_type": "image/png",
+            "byte_size": len(image)
         }
+        logger.info(f"Rendered preview of page {page_number} of {handle}: {pix.width}x{pix.height}px")
+        return json.dumps(_attach_image(result, image, handle, page_number, transport, "png"))
         
-        doc.close()
-        logger.info(f"Rendered page {page_number}: {pix.width}x{pix.height}px (zoom={zoom_factor}x)")
+    except Exception as e:
+        logger.error(f"Preview rendering error: {e}")
+        return json.dumps({"error": str(e)})
+
+
+@mcp.tool()
+def classify_pages(handle: str, page_numbers: list[int]) -> str:
+    """Classifies pages of an open document before extraction (see classify_page).
+    
+    Costs a low-resolution thumbnail and a text-layer read per page, so the
+    caller can skip blank sheets and extract mechanical ones first.
+    
+    Args:
+        handle: Handle returned by open_document
+        page_numbers: Pages to classify (1-indexed)
         
-        return json.dumps(result)
+    Returns:
+        JSON string with a pages list of page_number, category, sheet_number,
+        ink_coverage, char_count and reasons (or a per-page error), or error field
+    """
+    try:
+        entry = _checkout_document(handle)
+        if entry is None:
+            return json.dumps({"error": f"Unknown or expired document handle: {handle}"})
+        
+        started = time.perf_counter()
+        results = []
+        for page_number in page_numbers:
+            if page_number < 1 or page_number > len(entry.doc):
+                results.append({"page_number": page_number, "error": f"Page {page_number} out of range (1-{len(entry.doc)})"})
+                continue
+            results.append({"page_number": page_number, **classify_page(entry.doc.load_page(page_number - 1))})
+        logger.info(f"Classified {len(page_numbers)} pages of {handle} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return json.dumps({"pages": results})
         
-    except base64.binascii.Error as e:
-        logger.error(f"Base64 decode error: {e}")
-        return json.dumps({"error": f"Invalid base64 encoding: {str(e)}"})
     except Exception as e:
-        logger.error(f"Page rendering error: {e}")
+        logger.error(f"Page classification error: {e}")
+        return json.dumps({"error": str(e)})
+
+
+@mcp.tool()
+def match_pages(handle: str, previous_handle: str, page_numbers: list[int], max_changed_fraction: float = 0.0) -> str:
+    """Matches pages of a revised drawing set to unchanged pages of an earlier revision.
+    
+    A page matches a previous page with the same content hash (wherever it
+    sits in the set). Otherwise up to PAGE_DIFF_MAX_CANDIDATES previous pages
+    (the same page number first, then the nearest perceptual hashes) are
+    rendered and diffed pixel by pixel; the page matches if at most
+    max_changed_fraction of its pixels differ.
+    
+    Args:
+        handle: Handle of the new revision, from open_document
+        previous_handle: Handle of the earlier revision, from open_document
+        page_numbers: Pages of the new revision to match (1-indexed)
+        max_changed_fraction: Largest share of differing pixels still treated as unchanged
+        
+    Returns:
+        JSON string with a pages list of page_number, previous_page (None if
+        changed), method ("content_hash" or "page_diff") and changed_fraction, or error field
+    """
+    try:
+        entry = _checkout_document(handle)
+        previous = _checkout_document(previous_handle)
+        if entry is None or previous is None:
+            missing = handle if entry is None else previous_handle
+            return json.dumps({"error": f"Unknown or expired document handle: {missing}"})
+        
+        started = time.perf_counter()
+        previous_pages = range(1, len(previous.doc) + 1)
+        by_hash = {}
+        for q in previous_pages:
+            by_hash.setdefault(previous.content_hash(q), q)
+        
+        results = []
+        for page_number in page_numbers:
+            if page_number < 1 or page_number > len(entry.doc):
+                results.append({"page_number": page_number, "error": f"Page {page_number} out of range (1-{len(entry.doc)})"})
+                continue
+            result = {"page_number": page_number, "previous_page": None, "method": None, "changed_fraction": None}
+            q = by_hash.get(entry.content_hash(page_number))
+            if q is not None:
+                result.update(previous_page=q, method="content_hash", changed_fraction=0.0)
+            else:
+                phash = int(entry.fingerprint(page_number)["phash"], 16)
+                distances = sorted(
+                    (bin(phash ^ int(previous.fingerprint(q)["phash"], 16)).count("1"), q != page_number, q)
+                    for q in previous_pages
+                )
+                candidates = [q for d, _, q in distances if d <= PAGE_DIFF_MAX_HASH_DISTANCE][:PAGE_DIFF_MAX_CANDIDATES]
+                page = entry.doc.load_page(page_number - 1)
+                for q in candidates:
+                    changed = _changed_fraction(page, previous.doc.load_page(q - 1))
+                    if result["changed_fraction"] is None or changed < result["changed_fraction"]:
+                        result["changed_fraction"] = round(changed, 6)
+                    if changed <= max_changed_fraction:
+                        result.update(previous_page=q, method="page_diff")
+                        break
+            results.append(result)
+        
+        matched = sum(1 for r in results if r.get("previous_page"))
+        logger.info(
+            f"Matched {matched}/{len(page_numbers)} pages of {handle} to {previous_handle} "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return json.dumps({"pages": results})
+        
+    except Exception as e:
+        logger.error(f"Page matching error: {e}")
+        return json.dumps({"error": str(e)})
+
+
+def _is_garbled(ch: str) -> bool:
+    # Replacement and private-use glyphs come from fonts without a usable ToUnicode map
+    code = ord(ch)
+    return ch == "\ufffd" or 0xE000 <= code <= 0xF8FF
+
+
+@mcp.tool()
+def extract_text_layer(handle: str, page_number: int, include_tables: bool = True) -> str:
+    """Returns a page's embedded text layer and tables without rasterizing it.
+    
+    CAD-exported sheets usually carry every label, dimension and schedule
+    cell as real text; reading it directly is far cheaper than vision OCR.
+    
+    Args:
+        handle: Handle returned by open_document
+        page_number: Page number (1-indexed)
+        include_tables: Also detect ruled tables and return them as Markdown
+        
+    Returns:
+        JSON string with text (reading order), tables, char_count, span_count,
+        garbled_ratio (share of unmappable glyphs), drawings (vector paths) and
+        text_coverage (share of the page area in text blocks), or error field
+    """
+    try:
+        entry = _documents.get(handle)
+        if entry is None:
+            return json.dumps({"error": f"Unknown or expired document handle: {handle}"})
+        entry.touch()
+        if page_number < 1 or page_number > len(entry.doc):
+            return json.dumps({"error": f"Page {page_number} out of range (1-{len(entry.doc)})"})
+        
+        cache_key = (page_number, include_tables)
+        cached = entry.text_layers.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        page = entry.doc.load_page(page_number - 1)
+        text = page.get_text("text", sort=True).strip()
+        text_blocks = [b for b in page.get_text("dict").get("blocks", []) if b.get("type") == 0]
+        span_count = sum(
+            1
+            for block in text_blocks
+            for line in block.get("lines", [])
+            for span in line.get("spans", [])
+            if span.get("text", "").strip()
+        )
+        page_area = page.rect.width * page.rect.height
+        # A title block's boilerplate covers ~1% of a sheet; notes and schedules far more
+        text_area = sum((fitz.Rect(b["bbox"]) & page.rect).get_area() for b in text_blocks)
+        visible = [ch for ch in text if not ch.isspace()]
+        garbled = sum(1 for ch in visible if _is_garbled(ch))
+        
+        tables = []
+        if include_tables and visible:
+            try:
+                for table in page.find_tables().tables:
+                    markdown = table.to_markdown().strip()
+                    if markdown:
+                        tables.append(markdown)
+            except Exception as e:
+                logger.warning(f"Table detection failed on page {page_number} of {handle}: {e}")
+        
+        result = json.dumps({
+            "page_number": page_number,
+            "text": text,
+            "tables": tables,
+            "char_count": len(visible),
+            "span_count": span_count,
+            "garbled_ratio": round(garbled / len(visible), 4) if visible else 0.0,
+            "drawings": len(page.get_cdrawings()),
+            "text_coverage": round(min(1.0, text_area / page_area), 4) if page_area else 0.0
+        })
+        entry.text_layers[cache_key] = result
+        logger.info(f"Text layer of page {page_number} of {handle}: {len(visible)} chars, {span_count} spans, {len(tables)} tables")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Text layer extraction error: {e}")
         return json.dumps({"error": str(e)})
 
+
+@mcp.tool()
+def close_document(handle: str) -> str:
+    """Releases a handle obtained from open_document.
+    
+    The parsed document stays cached until it has been idle for the TTL so
+    a prompt re-open of the same content is free.
+    
+    Args:
+        handle: Handle returned by open_document
+        
+    Returns:
+        JSON string with handle and remaining reference count
+    """
+    entry = _documents.get(handle)
+    if entry is None:
+        return json.dumps({"handle": handle, "refs": 0, "closed": True})
+    entry.refs = max(0, entry.refs - 1)
+    entry.touch()
+    if entry.refs == 0:
+        entry.release_path()
+    _evict_documents()
+    return json.dumps({"handle": handle, "refs": entry.refs, "closed": handle not in _documents})
+
+
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
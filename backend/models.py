@@ -2,7 +2,7 @@
 Pydantic models for strict type safety across the HVAC inference pipeline.
 All API requests, responses, and MCP tool interactions use these models.
 """
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional, List, Dict, Any, Literal
 from enum import Enum
 
@@ -21,12 +21,56 @@ class PDFQuality(str, Enum):
     BALANCED = "balanced"  # 2.0x zoom - default
     DETAILED = "detailed"  # 3.0x zoom - for complex blueprints
     ULTRA = "ultra"  # 4.0x zoom - maximum quality
+    AUTO = "auto"  # per-page zoom chosen from text size and drawing density
+
+
+UPLOAD_ID_PATTERN = r"^up-[0-9a-f]{8}$"
+
+
+class ImageFormat(str, Enum):
+    """Encoding of rendered pages sent to the vision model."""
+    PNG = "png"
+    JPEG = "jpeg"
+    WEBP = "webp"
+
+
+class ImageColorMode(str, Enum):
+    """Color reduction applied to rendered pages before encoding."""
+    RGB = "rgb"
+    GRAY = "gray"
+    BILEVEL = "bilevel"  # 1-bit black and white
+    PALETTE = "palette"  # 16-color adaptive palette
+
+
+class PageClassification(str, Enum):
+    """Which pages the classification pre-pass selects for extraction."""
+    OFF = "off"  # the first max_pages pages, in order
+    PRIORITIZE = "prioritize"  # skip blank pages, mechanical and schedule sheets first
+    MECHANICAL_ONLY = "mechanical_only"  # only mechanical, schedule and unreadable sheets
+
+
+class ImageEncoding(BaseModel):
+    """Per-request override of the PDF_IMAGE_* settings; unset fields use the server defaults."""
+    format: Optional[ImageFormat] = None
+    color: Optional[ImageColorMode] = None
+    quality: Optional[int] = Field(None, ge=1, le=100, description="JPEG/WebP quality (WebP 100 is lossless)")
+    png_compression: Optional[int] = Field(None, ge=0, le=9, description="PNG zlib compression level")
 
 
 class AnalyzeRequest(BaseModel):
-    """Request payload for document analysis."""
-    file_base64: str = Field(..., description="Base64-encoded file data")
-    mime_type: str = Field(..., description="MIME type of the file")
+    """Request payload for document analysis.
+
+    Provide either ``file_base64`` (with ``mime_type``) or the ``upload_id`` of a
+    PDF previously stored by ``/api/upload``; the latter avoids re-sending the
+    document.
+    """
+    file_base64: Optional[str] = Field(None, description="Base64-encoded file data")
+    mime_type: Optional[str] = Field(None, description="MIME type of the file (required with file_base64)")
+    upload_id: Optional[str] = Field(
+        None,
+        pattern=UPLOAD_ID_PATTERN,
+        description="ID returned by /api/upload; analyzes the stored PDF instead of file_base64"
+    )
     max_pages: Optional[int] = Field(
         20, 
         ge=1, 
@@ -34,15 +78,44 @@ class AnalyzeRequest(BaseModel):
         description="Maximum pages to process (development default: 20)"
     )
     quality: Optional[PDFQuality] = Field(PDFQuality.BALANCED, description="PDF rendering quality")
+    image_encoding: Optional[ImageEncoding] = Field(
+        None,
+        description="How rendered pages are encoded for the vision model (defaults from settings)"
+    )
+    page_classification: Optional[PageClassification] = Field(
+        None,
+        description="Page selection by sheet classification (defaults to PAGE_CLASSIFICATION)"
+    )
+    previous_upload_id: Optional[str] = Field(
+        None,
+        pattern=UPLOAD_ID_PATTERN,
+        description="Analyzed upload this document revises; its unchanged pages reuse their earlier extractions"
+    )
     
     @field_validator('file_base64')
     @classmethod
-    def validate_base64(cls, v: str) -> str:
+    def validate_base64(cls, v: Optional[str]) -> Optional[str]:
         """Ensure base64 string is not empty."""
-        if not v or len(v) < 10:
+        if v is not None and len(v) < 10:
             raise ValueError("file_base64 must be a valid base64 string")
         return v
 
+    @model_validator(mode='after')
+    def validate_source(self) -> 'AnalyzeRequest':
+        """Require exactly one document source."""
+        if bool(self.file_base64) == bool(self.upload_id):
+            raise ValueError("Provide exactly one of file_base64 or upload_id")
+        if self.file_base64 and not self.mime_type:
+            raise ValueError("mime_type is required with file_base64")
+        if self.upload_id:
+            # Uploads are always stored PDFs
+            if self.mime_type and not self.mime_type.lower().startswith("application/pdf"):
+                raise ValueError("upload_id refers to a stored PDF; mime_type must be application/pdf")
+            self.mime_type = "application/pdf"
+        if self.previous_upload_id and self.previous_upload_id == self.upload_id:
+            raise ValueError("previous_upload_id must differ from upload_id")
+        return self
+
 
 class UploadRequest(BaseModel):
     """Request payload for PDF upload."""
@@ -207,20 +280,119 @@ class AnalysisReport(BaseModel):
     request_id: Optional[str] = Field(None, description="Tracing ID for observability")
 
 
+class TokenUsage(BaseModel):
+    """Tokens, calls and cost of a set of AI provider calls."""
+    prompt_tokens: int = Field(default=0, ge=0)
+    completion_tokens: int = Field(default=0, ge=0)
+    total_tokens: int = Field(default=0, ge=0)
+    calls: int = Field(default=0, ge=0)
+    estimated_calls: int = Field(
+        default=0, ge=0,
+        description="Calls whose counts were estimated because the provider reported none (streams stopped early)"
+    )
+    cost_usd: float = Field(default=0.0, ge=0.0, description="At the configured per-million-token prices")
+
+
+class TokenUsageReport(BaseModel):
+    """Token usage of one analysis request."""
+    total: TokenUsage = Field(default_factory=TokenUsage)
+    stages: Dict[str, TokenUsage] = Field(
+        default_factory=dict,
+        description="By pipeline stage: extraction, reasoning"
+    )
+    pages: Dict[int, TokenUsage] = Field(
+        default_factory=dict,
+        description="Extraction usage by page; a batched vision call is split evenly between its pages"
+    )
+
+
 class AnalyzeResponse(BaseModel):
     """Response from /api/analyze endpoint."""
     report: str = Field(..., description="JSON string of AnalysisReport")
     request_id: str = Field(..., description="Request tracking ID")
     pages_processed: int = Field(..., ge=0)
     processing_time_seconds: Optional[float] = Field(None, ge=0.0)
+    page_zoom_factors: Dict[int, float] = Field(
+        default_factory=dict,
+        description="Render zoom used for each analyzed PDF page"
+    )
+    page_sources: Dict[int, str] = Field(
+        default_factory=dict,
+        description="Where each page's text came from: text_layer, text_layer_verified, vision or duplicate"
+    )
+    page_image_stats: Dict[int, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="Vision payload of each rendered page: mime_type, byte_size and encode_ms"
+    )
+    deduplicated_pages: Dict[int, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="Pages whose extraction was reused from a near-identical page: source (page or cache), "
+                    "duplicate_of (page number, for source=page) and similarity"
+    )
+    page_classifications: Dict[int, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="Pre-pass class of every page: category, sheet_number, ink_coverage, char_count and reasons"
+    )
+    skipped_pages: Dict[int, str] = Field(
+        default_factory=dict,
+        description="Pages not extracted because of their classification, with the reason"
+    )
+    reused_pages: Dict[int, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="With previous_upload_id: unchanged pages whose earlier extraction was reused, with "
+                    "previous_page, method (content_hash or page_diff) and changed_fraction"
+    )
+    reextracted_pages: List[int] = Field(
+        default_factory=list,
+        description="With previous_upload_id: changed or new pages that went through extraction again"
+    )
+    token_usage: Optional[TokenUsageReport] = Field(
+        None,
+        description="Tokens and cost reported by the AI provider for this request, in total, by stage and by page"
+    )
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a queued analysis job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobSubmitResponse(BaseModel):
+    """Response from POST /api/jobs."""
+    job_id: str
+    status: JobStatus
+    request_id: str = Field(..., description="Request tracking ID used by the pipeline logs")
+
+
+class JobStatusResponse(BaseModel):
+    """Status (and result once finished) of an analysis job."""
+    job_id: str
+    status: JobStatus
+    request_id: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempts: int = Field(default=0, ge=0)
+    progress: Dict[str, Any] = Field(default_factory=dict, description="Latest pipeline progress")
+    result: Optional[AnalyzeResponse] = None
+    error: Optional[str] = None
+    error_status_code: Optional[int] = None
 
 
 class UploadResponse(BaseModel):
     """Response from /api/upload endpoint."""
     upload_id: str
     filename: str
-    pages: List[str] = Field(..., description="Base64 data URLs for page previews")
+    pages: List[str] = Field(
+        ...,
+        description="Preview URLs (GET /api/uploads/{id}/pages/{n}), versioned by content hash; rendered on first request"
+    )
     total_pages: int = Field(..., ge=0)
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="PDF document metadata")
+    content_hash: Optional[str] = Field(None, description="Content hash of the PDF used to version preview URLs")
     request_id: str
 
 
@@ -250,7 +422,8 @@ class PDFMetadata(BaseModel):
 
 class PageImageData(BaseModel):
     """Rendered page image from render_page_for_vision tool."""
-    image_data: str = Field(..., description="Base64-encoded PNG image")
+    image_data: str = Field(..., description="Base64-encoded page image")
+    mime_type: str = Field("image/png", description="MIME type of image_data")
     page_number: Optional[int] = Field(None, ge=1)
     width: Optional[int] = Field(None, ge=0)
     height: Optional[int] = Field(None, ge=0)
@@ -0,0 +1,311 @@
+"""
+Warm pool of long-lived PDF MCP workers for HVAC Analysis Backend.
+
+Spawning ``pdf_server.py`` per request costs a fresh interpreter, a PyMuPDF
+import and an MCP ``initialize`` handshake. The pool keeps a fixed number of
+``pdf-processor`` sessions alive for the lifetime of the app and hands them out
+with checkout/checkin semantics. Crashed workers are restarted on the next
+checkout or by the background health check, whichever comes first.
+"""
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from backend.config import get_settings
+from backend.utils import logger
+
+
+PDF_SERVER_SCRIPT = os.path.join(os.path.dirname(__file__), "mcp_servers", "pdf_server.py")
+
+
+class PDFPoolError(Exception):
+    """Raised when no healthy PDF worker can be provided."""
+    pass
+
+
+def read_rendered_page(img_data: Dict[str, Any]) -> Union[bytes, str]:
+    """Return the image from a ``render_page`` result.
+
+    Spooled renders (``image_path``) are read as raw image bytes (in the
+    result's ``mime_type``) and the file is removed; inline renders are
+    returned as a data URL.
+    """
+    path = img_data.get("image_path")
+    if path:
+        try:
+            with open(path, "rb") as fh:
+                return fh.read()
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+    return f"data:{img_data.get('mime_type', 'image/png')};base64,{img_data['image_data']}"
+
+
+class PDFWorker:
+    """A single long-lived ``pdf-processor`` MCP session.
+
+    The stdio transport and client session are entered and exited inside one
+    dedicated task, because anyio cancel scopes must be closed by the task
+    that opened them. Callers only ever talk to the session through
+    :meth:`call_tool` and :meth:`ping`.
+    """
+
+    def __init__(self, worker_id: int, params: StdioServerParameters):
+        self.worker_id = worker_id
+        self._params = params
+        self._session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._startup_error: Optional[BaseException] = None
+        self._lock = asyncio.Lock()
+        self.healthy = False
+        self.in_use = False
+        self.restarts = 0
+        self.calls = 0
+
+    async def start(self) -> None:
+        """Spawn the subprocess and complete the MCP handshake."""
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._startup_error = None
+        self._task = asyncio.create_task(self._run(), name=f"pdf-worker-{self.worker_id}")
+        await self._ready.wait()
+        if not self.healthy:
+            raise PDFPoolError(f"PDF worker {self.worker_id} failed to start: {self._startup_error}")
+
+    async def _run(self) -> None:
+        try:
+            async with stdio_client(self._params) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    self._session = session
+                    self.healthy = True
+                    self._ready.set()
+                    logger.info(f"PDF worker {self.worker_id} ready")
+                    await self._stop.wait()
+        except Exception as e:
+            self._startup_error = e
+            if self._stop.is_set():
+                # Late responses to cancelled calls can race transport teardown
+                logger.debug(f"PDF worker {self.worker_id} shutdown noise: {e!r}")
+            else:
+                logger.error(f"PDF worker {self.worker_id} exited with error: {e}")
+        finally:
+            self._session = None
+            self.healthy = False
+            self._ready.set()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Close the session and wait for the subprocess to exit."""
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+        except Exception as e:
+            logger.warning(f"PDF worker {self.worker_id} shutdown error: {e}")
+        self._task = None
+        self.healthy = False
+
+    async def restart(self) -> None:
+        """Replace the worker subprocess unless another caller already did."""
+        async with self._lock:
+            if self.healthy:
+                return
+            logger.warning(f"Restarting PDF worker {self.worker_id}")
+            await self.stop()
+            await self.start()
+            self.restarts += 1
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None):
+        """Call a tool on the worker; transport failures mark it unhealthy."""
+        if self._session is None:
+            self.healthy = False
+            raise PDFPoolError(f"PDF worker {self.worker_id} is not running")
+        self.calls += 1
+        try:
+            return await self._session.call_tool(name, arguments=arguments)
+        except Exception:
+            self.healthy = False
+            raise
+
+    @asynccontextmanager
+    async def document(self, source: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Open a document session on this worker for the duration of the block.
+
+        Yields the parsed ``open_document`` result (``handle``, ``total_pages``,
+        ``metadata``; or ``error``) and releases the handle on exit.
+        """
+        result = await self.call_tool("open_document", arguments=source)
+        info = json.loads(result.content[0].text)
+        try:
+            yield info
+        finally:
+            if "handle" in info and self.healthy:
+                try:
+                    await self.call_tool("close_document", arguments={"handle": info["handle"]})
+                except Exception as e:
+                    logger.warning(f"PDF worker {self.worker_id} failed to close {info['handle']}: {e}")
+
+    async def ping(self, timeout: float = 5.0) -> bool:
+        """Return True if the worker answers an MCP ping in time."""
+        if self._session is None:
+            self.healthy = False
+            return False
+        try:
+            await asyncio.wait_for(self._session.send_ping(), timeout=timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"PDF worker {self.worker_id} failed health check: {e}")
+            self.healthy = False
+            return False
+
+
+class PDFWorkerPool:
+    """Fixed-size pool of :class:`PDFWorker` sessions shared by all endpoints."""
+
+    def __init__(
+        self,
+        size: int = 2,
+        server_script: str = PDF_SERVER_SCRIPT,
+        health_check_interval: float = 30.0,
+        checkout_timeout: float = 120.0,
+        worker_env: Optional[Dict[str, str]] = None
+    ):
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        params = StdioServerParameters(command=sys.executable, args=[server_script], env=worker_env)
+        self._workers: List[PDFWorker] = [PDFWorker(i, params) for i in range(size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+    async def start(self) -> None:
+        """Start all workers concurrently and begin health checking."""
+        async with self._start_lock:
+            if self._started:
+                return
+            self._idle = asyncio.Queue()
+            results = await asyncio.gather(*(w.start() for w in self._workers), return_exceptions=True)
+            for worker, result in zip(self._workers, results):
+                if isinstance(result, Exception):
+                    # Unhealthy workers are still queued and restarted on checkout
+                    logger.error(f"PDF worker {worker.worker_id} not started: {result}")
+                self._idle.put_nowait(worker)
+            if self.health_check_interval > 0:
+                self._health_task = asyncio.create_task(self._health_loop(), name="pdf-pool-health")
+            self._started = True
+            healthy = sum(1 for w in self._workers if w.healthy)
+            logger.info(f"PDF worker pool started ({healthy}/{self.size} healthy)")
+
+    async def stop(self) -> None:
+        """Stop health checking and shut down every worker."""
+        async with self._start_lock:
+            if not self._started:
+                return
+            if self._health_task:
+                self._health_task.cancel()
+                try:
+                    await self._health_task
+                except asyncio.CancelledError:
+                    pass
+                self._health_task = None
+            await asyncio.gather(*(w.stop() for w in self._workers), return_exceptions=True)
+            self._started = False
+            logger.info("PDF worker pool stopped")
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[PDFWorker]:
+        """Check out a healthy worker for the duration of the block.
+
+        The worker exposes ``call_tool`` with the same signature as
+        ``mcp.ClientSession`` so callers can use it as a drop-in session.
+        """
+        if not self._started:
+            await self.start()
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), timeout=self.checkout_timeout)
+        except asyncio.TimeoutError:
+            raise PDFPoolError(f"No PDF worker available after {self.checkout_timeout:.0f}s")
+        worker.in_use = True
+        try:
+            if not worker.healthy:
+                await worker.restart()
+            yield worker
+        finally:
+            worker.in_use = False
+            self._idle.put_nowait(worker)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for worker in self._workers:
+                if worker.in_use:
+                    continue
+                if worker.healthy:
+                    await worker.ping()
+                if not worker.healthy and not worker.in_use:
+                    try:
+                        await worker.restart()
+                    except Exception as e:
+                        logger.error(f"PDF worker {worker.worker_id} restart failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of pool state for observability."""
+        return {
+            "size": self.size,
+            "started": self._started,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "workers": [
+                {
+                    "worker_id": w.worker_id,
+                    "healthy": w.healthy,
+                    "in_use": w.in_use,
+                    "restarts": w.restarts,
+                    "calls": w.calls
+                }
+                for w in self._workers
+            ]
+        }
+
+
+# Global pool instance
+_pdf_pool: Optional[PDFWorkerPool] = None
+
+
+def get_pdf_pool() -> PDFWorkerPool:
+    """Get or create the global PDF worker pool."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        settings = get_settings()
+        worker_env = {
+            "PDF_ZOOM_FACTOR": str(settings.pdf_zoom_factor),
+            "PDF_DOC_TTL_SECONDS": str(settings.pdf_doc_ttl_seconds),
+            "PDF_MAX_OPEN_DOCUMENTS": str(settings.pdf_max_open_documents),
+            "PDF_RENDER_CACHE_MB": str(settings.pdf_render_cache_mb),
+            "PDF_AUTO_ZOOM_TARGET_PX": str(settings.pdf_auto_zoom_target_px),
+            "PDF_AUTO_ZOOM_MAX_MEGAPIXELS": str(settings.pdf_auto_zoom_max_megapixels),
+            "PDF_RENDER_PROCESSES": str(settings.render_processes_per_worker())
+        }
+        if settings.pdf_spool_dir:
+            worker_env["PDF_SPOOL_DIR"] = settings.pdf_spool_dir
+        _pdf_pool = PDFWorkerPool(
+            size=settings.pdf_pool_size,
+            health_check_interval=settings.pdf_pool_health_check_interval,
+            checkout_timeout=settings.pdf_pool_checkout_timeout,
+            worker_env=worker_env
+        )
+    return _pdf_pool
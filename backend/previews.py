@@ -0,0 +1,183 @@
+"""
+On-disk cache of page preview images for stored uploads.
+
+Previews are rendered lazily by ``GET /api/uploads/{id}/pages/{n}`` at a few
+fixed widths and stored under the document's content hash (the pdf_server
+handle), so identical PDFs uploaded twice share previews and preview URLs can
+be cached by browsers forever. Total size is bounded by evicting the least
+recently served files; a running byte total means the directory is only
+scanned once at startup and again when eviction is due. The ``a*`` methods
+run the file I/O in a worker thread for async callers.
+"""
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from backend.config import get_settings
+from backend.utils import logger
+
+
+# Requested widths are rounded up to one of these so the cache holds few variants per page
+PREVIEW_WIDTHS = (160, 320, 640, 1280, 2048)
+
+
+def snap_preview_width(width: int) -> int:
+    """Return the smallest preview width bucket at least as wide as width."""
+    for bucket in PREVIEW_WIDTHS:
+        if width <= bucket:
+            return bucket
+    return PREVIEW_WIDTHS[-1]
+
+
+class PreviewCache:
+    """Directory of rendered page previews keyed by content hash, page and width."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._handles: Dict[str, str] = {}
+        os.makedirs(os.path.join(directory, "refs"), exist_ok=True)
+        files = self._files()
+        self._entries = len(files)
+        self._size_bytes = sum(size for _, size, _ in files)
+
+    def _ref_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, "refs", upload_id)
+
+    def path_for(self, handle: str, page_number: int, width: int) -> str:
+        return os.path.join(self.directory, handle[:2], f"{handle}-p{page_number}-w{width}.png")
+
+    def record_upload(self, upload_id: str, handle: str) -> None:
+        """Remember which document content an upload holds."""
+        self._handles[upload_id] = handle
+        with open(self._ref_path(upload_id), "w", encoding="utf-8") as fh:
+            fh.write(handle)
+
+    async def arecord_upload(self, upload_id: str, handle: str) -> None:
+        """record_upload() in a worker thread."""
+        await asyncio.to_thread(self.record_upload, upload_id, handle)
+
+    def handle_for(self, upload_id: str) -> Optional[str]:
+        """Return the content hash recorded for an upload, or None if unknown."""
+        handle = self._handles.get(upload_id)
+        if handle is None:
+            try:
+                with open(self._ref_path(upload_id), "r", encoding="utf-8") as fh:
+                    handle = fh.read().strip() or None
+            except FileNotFoundError:
+                return None
+            if handle:
+                self._handles[upload_id] = handle
+        return handle
+
+    async def ahandle_for(self, upload_id: str) -> Optional[str]:
+        """handle_for() in a worker thread (memory hits skip the thread)."""
+        handle = self._handles.get(upload_id)
+        return handle if handle is not None else await asyncio.to_thread(self.handle_for, upload_id)
+
+    def get(self, handle: str, page_number: int, width: int) -> Optional[str]:
+        """Return the path of a cached preview and refresh its recency, or None."""
+        path = self.path_for(handle, page_number, width)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    async def aget(self, handle: str, page_number: int, width: int) -> Optional[str]:
+        """get() in a worker thread."""
+        return await asyncio.to_thread(self.get, handle, page_number, width)
+
+    def put(self, handle: str, page_number: int, width: int, image: bytes) -> str:
+        """Store a rendered preview and evict least-recently-served files if over budget."""
+        path = self.path_for(handle, page_number, width)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(image)
+        with self._lock:
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = None
+            os.replace(tmp_path, path)
+            self._entries += replaced is None
+            self._size_bytes += len(image) - (replaced or 0)
+            if self._size_bytes > self.max_bytes:
+                self._evict_locked(keep=path)
+        return path
+
+    async def aput(self, handle: str, page_number: int, width: int, image: bytes) -> str:
+        """put() in a worker thread."""
+        return await asyncio.to_thread(self.put, handle, page_number, width, image)
+
+    def _files(self) -> list:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            if os.path.basename(root) == "refs":
+                continue
+            for name in names:
+                if not name.endswith(".png"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return files
+
+    def _evict_locked(self, keep: str) -> None:
+        # Over budget by the running total: rescan for recency (and to correct any drift)
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self._entries = len(files) - evicted
+        self._size_bytes = total
+        self.evictions += evicted
+        if evicted:
+            logger.info(f"Preview cache evicted {evicted} files")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current occupancy."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._entries,
+            "size_bytes": self._size_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Global cache instance
+_preview_cache: Optional[PreviewCache] = None
+
+
+def get_preview_cache() -> PreviewCache:
+    """Get or create the global preview cache."""
+    global _preview_cache
+    if _preview_cache is None:
+        settings = get_settings()
+        _preview_cache = PreviewCache(
+            directory=settings.preview_cache_dir,
+            max_bytes=settings.preview_cache_max_mb * 1024 * 1024
+        )
+    return _preview_cache
@@ -0,0 +1,245 @@
+"""
+Per-provider retry budgets and circuit breakers for AI calls.
+
+``retry_with_backoff`` consults a :class:`ProviderGuard` so that retries
+against one provider draw from a shared budget (a single bad document cannot
+multiply load while the model is struggling) and calls fail fast while the
+provider's circuit is open. Only outages (connection failures, timeouts,
+5xx) count toward the breaker; throttling is retried but not held against
+the provider's health.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+from openai import APIConnectionError
+
+from backend.ai_client import AIRateLimitError
+from backend.config import get_settings
+from backend.utils import logger
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} circuit open; retry in {retry_after:.0f}s")
+
+
+def is_provider_outage(error: BaseException) -> bool:
+    """Return True if a failed call says the provider is unhealthy.
+
+    Connection errors, timeouts and 5xx answers are outages. A 429 or other
+    4xx means the provider answered, so it is retried but not counted.
+    """
+    if isinstance(error, (httpx.RequestError, APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    if isinstance(status, int):
+        return status >= 500
+    return not isinstance(error, AIRateLimitError)
+
+
+class RetryBudget:
+    """Sliding-window budget: retries may not exceed a ratio of recent calls.
+
+    A floor of ``min_retries`` per window keeps low-traffic servers able to
+    ride out a single transient failure.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window_seconds: float = 60.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        for events in (self._calls, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_call(self) -> None:
+        self._calls.append(time.monotonic())
+
+    def try_acquire(self) -> bool:
+        """Reserve one retry if the budget allows it."""
+        now = time.monotonic()
+        self._trim(now)
+        allowed = max(self.min_retries, int(len(self._calls) * self.ratio))
+        if len(self._retries) >= allowed:
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "window_seconds": self.window_seconds,
+            "calls_in_window": len(self._calls),
+            "retries_in_window": len(self._retries),
+            "retries_allowed": max(self.min_retries, int(len(self._calls) * self.ratio))
+        }
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker counting consecutive failures."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed (admitting one probe when half-open)."""
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Let another probe through if the current one ended without a verdict."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this transition opened the circuit."""
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            return True
+        return False
+
+
+class ProviderGuard:
+    """Retry budget, circuit breaker and counters for one AI provider."""
+
+    def __init__(self, provider: str, budget: RetryBudget, breaker: CircuitBreaker):
+        self.provider = provider
+        self.budget = budget
+        self.breaker = breaker
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.short_circuited = 0
+        self.throttled = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the provider should not be called now."""
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError(self.provider, self.breaker.retry_after())
+        self.calls += 1
+        self.budget.record_call()
+
+    def record_success(self) -> None:
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            logger.info(f"{self.provider} circuit closed after successful probe")
+        self.breaker.record_success()
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        self.failures += 1
+        if error is not None and not is_provider_outage(error):
+            # Throttled or rejected: the provider is up, so no verdict for the breaker
+            self.throttled += 1
+            self.breaker.release_probe()
+            return
+        if self.breaker.record_failure():
+            logger.error(
+                f"{self.provider} circuit opened after {self.breaker.consecutive_failures} "
+                f"consecutive failures; failing fast for {self.breaker.reset_timeout:.0f}s"
+            )
+
+    def record_abandoned(self) -> None:
+        """A call ended without a health verdict (cancelled or unrelated error)."""
+        self.breaker.release_probe()
+
+    def acquire_retry(self) -> bool:
+        """Reserve a retry from the shared budget; False means give up now."""
+        if self.budget.try_acquire():
+            self.retries += 1
+            return True
+        self.retries_denied += 1
+        logger.warning(f"{self.provider} retry budget exhausted; not retrying")
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            "retry_after_seconds": round(self.breaker.retry_after(), 1),
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "short_circuited": self.short_circuited,
+            "throttled": self.throttled,
+            "retry_budget": self.budget.stats()
+        }
+
+
+# Global guards, one per provider
+_provider_guards: Dict[str, ProviderGuard] = {}
+
+
+def get_provider_guard(provider: str) -> ProviderGuard:
+    """Get or create the shared guard for a provider."""
+    guard = _provider_guards.get(provider)
+    if guard is None:
+        settings = get_settings()
+        guard = ProviderGuard(
+            provider,
+            RetryBudget(
+                ratio=settings.retry_budget_ratio,
+                min_retries=settings.retry_budget_min_retries,
+                window_seconds=settings.retry_budget_window_seconds
+            ),
+            CircuitBreaker(
+                failure_threshold=settings.circuit_breaker_failure_threshold,
+                reset_timeout=settings.circuit_breaker_reset_seconds
+            )
+        )
+        _provider_guards[provider] = guard
+    return guard
+
+
+def provider_guard_stats() -> Dict[str, Any]:
+    """Return stats for every provider that has been called."""
+    return {name: guard.stats() for name, guard in _provider_guards.items()}
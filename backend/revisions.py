@@ -0,0 +1,70 @@
+"""
+Stored per-page results of analyzed uploads, for incremental re-analysis.
+
+After a PDF stored by ``/api/upload`` is analyzed, the text of every page that
+was extracted is saved next to it as ``{upload_id}.pages.json``. A later
+analysis of a revised set can name that upload as ``previous_upload_id``; its
+pages that pdf_server's ``match_pages`` finds unchanged reuse the stored text
+instead of going back to the vision model.
+
+Only vision output from the current model is reused. Pages read from their
+text layer are cheap to read again and were accepted under the text-layer
+settings of their run, so they are re-read rather than trusted.
+"""
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from backend.config import get_settings
+from backend.utils import logger
+
+# Page sources whose text came from the vision model
+VISION_SOURCES = ("vision", "text_layer_verified", "duplicate")
+
+
+def page_results_path(upload_id: str) -> str:
+    """Return where the page results of an upload are stored."""
+    return os.path.abspath(os.path.join(get_settings().upload_dir, f"{upload_id}.pages.json"))
+
+
+def load_page_results(upload_id: str) -> Optional[Dict[int, Dict[str, Any]]]:
+    """Return page number -> {"text", "source", "model"} stored for an upload, or None if never analyzed."""
+    try:
+        with open(page_results_path(upload_id), "r", encoding="utf-8") as fh:
+            stored = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable page results of {upload_id}: {e}")
+        return None
+    # Records saved before per-page models were stored belong to the file's model
+    return {
+        int(page): {"model": stored.get("model"), **record}
+        for page, record in stored.get("pages", {}).items()
+    }
+
+
+def is_reusable_page_result(record: Dict[str, Any], model: str) -> bool:
+    """Return True if a stored page result may stand in for extracting the page with model."""
+    return record.get("model") == model and record.get("source") in VISION_SOURCES
+
+
+def save_page_results(upload_id: str, pages: Dict[int, Dict[str, Any]], model: str) -> None:
+    """Merge page results into those stored for an upload (later analyses win per page).
+
+    Records without a ``model`` are stamped with model.
+    """
+    merged = load_page_results(upload_id) or {}
+    merged.update({page: {**record, "model": record.get("model") or model} for page, record in pages.items()})
+    path = page_results_path(upload_id)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({
+            "upload_id": upload_id,
+            "model": model,
+            "updated_at": time.time(),
+            "pages": {str(page): merged[page] for page in sorted(merged)}
+        }, fh)
+    os.replace(tmp_path, path)
@@ -1,12 +1,11 @@
-import sys
 import json
-from fastapi import FastAPI, HTTPException
+import asyncio
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import AsyncExitStack
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from contextlib import AsyncExitStack, asynccontextmanager
 from openai import OpenAIError
-from backend.constants import MN_HVAC_SYSTEM_INSTRUCTION, BLUEPRINT_EXTRACTION_PROMPT, MN_HEATING_OVERSIZE_LIMIT, MN_COOLING_OVERSIZE_LIMIT
+from backend.constants import MN_HVAC_SYSTEM_INSTRUCTION, BLUEPRINT_EXTRACTION_PROMPT, BATCH_EXTRACTION_PROMPT, TEXT_LAYER_VERIFICATION_PROMPT, MN_HEATING_OVERSIZE_LIMIT, MN_COOLING_OVERSIZE_LIMIT
 from backend.config import get_settings
 from backend.ai_client import (
     get_ai_client,
@@ -16,19 +15,31 @@ from backend.ai_client import (
     AIAuthenticationError,
     AIInvalidRequestError
 )
+from backend.pdf_pool import PDFPoolError, get_pdf_pool, read_rendered_page
+from backend.resilience import CircuitOpenError, get_provider_guard, provider_guard_stats
+from backend.extraction_cache import (
+    get_extraction_cache, make_cache_key, make_dedup_context, make_fingerprint_key, hash_distance,
+    digest_image_payload, digest_image_bytes
+)
+from backend.jobs import create_job_queue, load_job_status
+from backend.previews import get_preview_cache, snap_preview_width
+from backend.revisions import is_reusable_page_result, load_page_results, save_page_results
+from backend.usage import UsageTracker, usage_scope, usage_stats
 from backend.models import (
     AnalyzeRequest, AnalyzeResponse, UploadRequest, UploadResponse,
     ModelStatus, ErrorResponse, PDFMetadata, PageImageData, AnalysisReport,
-    PDFQuality
+    PDFQuality, ImageEncoding, JobStatus, JobSubmitResponse, JobStatusResponse, UPLOAD_ID_PATTERN
 )
 from backend.utils import (
-    RequestTracer, retry_with_backoff, repair_json, validate_json_schema,
+    RequestTracer, retry_with_backoff, repair_json, validate_json_schema, JsonObjectStop, split_batched_extraction,
     validate_hvac_analysis_output, sanitize_filename, truncate_to_token_limit, 
-    prioritize_extracted_content, log_model_interaction, logger,
-    construct_report_from_extracted_text, normalize_analysis_keys
+    prioritize_extracted_content, log_model_interaction, logger, merge_tile_extractions, merge_region_extractions,
+    construct_report_from_extracted_text, normalize_analysis_keys, plan_page_order
 )
 import os
 import base64
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Literal, Optional, Tuple, Union
 from uuid import uuid4
 import httpx
 import time
@@ -36,10 +47,34 @@ import time
 # Load configuration
 settings = get_settings()
 
+# Shared warm pool of pdf_server.py MCP workers (started in lifespan)
+pdf_pool = get_pdf_pool()
+
+# Content-addressed cache of per-page extraction results (None when disabled)
+extraction_cache = get_extraction_cache()
+
+# Lazily rendered page previews for the UI, keyed by document content hash
+preview_cache = get_preview_cache()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start long-lived resources on startup and release them on shutdown."""
+    await pdf_pool.start()
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        await pdf_pool.stop()
+        await ai_client.aclose()
+
+
 app = FastAPI(
     title="HVAC Analysis API", 
     version="2.0.0",
-    description="Local-first HVAC engineering analysis with Ollama/Gemini + MCP"
+    description="Local-first HVAC engineering analysis with Ollama/Gemini + MCP",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -53,6 +88,9 @@ app.add_middleware(
 ai_client = get_ai_client()
 MODEL_NAME = ai_client.get_model_name()
 
+# Retry budget and circuit breaker shared by every call to this provider
+provider_guard = get_provider_guard(ai_client.get_provider())
+
 # Map quality enum to zoom factor for PDF rendering
 QUALITY_ZOOM_MAP = {
     PDFQuality.FAST: 1.5,
@@ -62,6 +100,47 @@ QUALITY_ZOOM_MAP = {
 }
 
 
+class RegionCrops(list):
+    """(kind, image) crops of a page rendered as regions of interest instead of whole."""
+
+
+def resolve_upload_path(upload_id: str) -> str:
+    """Return the absolute path of a stored upload or raise 404.
+
+    upload_id is validated against UPLOAD_ID_PATTERN by the request model,
+    so it cannot escape the upload directory.
+    """
+    path = os.path.abspath(os.path.join(settings.upload_dir, f"{upload_id}.pdf"))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+    return path
+
+
+def save_upload_pdf(file_base64: str) -> Tuple[str, str]:
+    """Decode a base64 (or data URL) PDF into the upload directory.
+
+    Returns:
+        Tuple of (upload_id, absolute save path)
+    """
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    upload_id = f"up-{uuid4().hex[:8]}"
+    _, b64 = file_base64.split(",", 1) if "," in file_base64 else (None, file_base64)
+    pdf_bytes = base64.b64decode(b64)
+    save_path = os.path.abspath(os.path.join(settings.upload_dir, f"{upload_id}.pdf"))
+    with open(save_path, "wb") as f:
+        f.write(pdf_bytes)
+    return upload_id, save_path
+
+
+def spool_pdf(file_base64: str) -> str:
+    """Decode a base64 (or data URL) PDF into a temporary file and return its path (caller deletes it)."""
+    _, b64 = file_base64.split(",", 1) if "," in file_base64 else (None, file_base64)
+    fd, path = tempfile.mkstemp(prefix="analyze-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(base64.b64decode(b64))
+    return path
+
+
 @app.get("/api/catalog")
 async def get_catalog():
     try:
@@ -73,43 +152,306 @@ async def get_catalog():
 @retry_with_backoff(
     max_retries=settings.max_retries, 
     initial_delay=settings.retry_initial_delay,
+    backoff_factor=settings.retry_backoff_factor,
     jitter=True,
     # Only retry on transient errors, NOT on quota/auth/invalid request errors
     exceptions=(OpenAIError, httpx.RequestError, httpx.TimeoutException, AIProviderError),
     # Exclude these errors from retry
-    exclude_exceptions=(AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError)
+    exclude_exceptions=(AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError),
+    # Shared per-provider retry budget and circuit breaker
+    guard=provider_guard
 )
-async def extract_page_text(image_data_url: str, page_num: int, request_id: str) -> str:
-    """Extract text from a single page with retry logic.
+async def call_vision_model(
+    image: Union[str, bytes],
+    page_num: int,
+    request_id: str,
+    prompt: str = BLUEPRINT_EXTRACTION_PROMPT,
+    max_tokens: Optional[int] = None,
+    image_mime_type: str = "image/png"
+) -> str:
+    """Run the vision extraction call with retry logic.
     
+    image is either a data URL or raw image bytes (of image_mime_type) from a
+    spooled page render.
     Only retries on transient errors (network, timeout, model failures).
     Does NOT retry on quota exceeded, authentication, or invalid request errors.
     Rate limit errors will be retried with exponential backoff.
+    Raises CircuitOpenError without calling the model while the provider is unhealthy.
     """
-    with RequestTracer(request_id, f"extract_page_{page_num}"):
-        try:
+    try:
+        if isinstance(image, bytes):
             return await ai_client.generate_with_image(
-                prompt=BLUEPRINT_EXTRACTION_PROMPT,
-                image_data_url=image_data_url,
-                max_tokens=settings.extraction_max_tokens,
+                prompt=prompt,
+                image_bytes=image,
+                image_mime_type=image_mime_type,
+                max_tokens=max_tokens or settings.extraction_max_tokens,
                 temperature=settings.extraction_temperature
             )
-        except (AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError) as e:
-            # These errors should not be retried - fail fast with clear message
-            logger.error(f"[{request_id}] Non-retryable AI error on page {page_num}: {e}")
-            raise
-        except AIRateLimitError as e:
-            # Rate limit errors are retryable with backoff
-            logger.warning(f"[{request_id}] Rate limit hit on page {page_num}, will retry: {e}")
-            raise
+        return await ai_client.generate_with_image(
+            prompt=prompt,
+            image_data_url=image,
+            max_tokens=max_tokens or settings.extraction_max_tokens,
+            temperature=settings.extraction_temperature
+        )
+    except (AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError) as e:
+        # These errors should not be retried - fail fast with clear message
+        logger.error(f"[{request_id}] Non-retryable AI error on page {page_num}: {e}")
+        raise
+    except AIRateLimitError as e:
+        # Rate limit errors are retryable with backoff
+        logger.warning(f"[{request_id}] Rate limit hit on page {page_num}, will retry: {e}")
+        raise
+    except Exception as e:
+        # Other errors are also retryable
+        logger.warning(f"[{request_id}] Error extracting page {page_num}, will retry: {e}")
+        raise
+
+
+@retry_with_backoff(
+    max_retries=settings.max_retries,
+    initial_delay=settings.retry_initial_delay,
+    backoff_factor=settings.retry_backoff_factor,
+    jitter=True,
+    exceptions=(OpenAIError, httpx.RequestError, httpx.TimeoutException, AIProviderError),
+    exclude_exceptions=(AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError),
+    guard=provider_guard
+)
+async def call_vision_model_batch(
+    images: list,
+    page_nums: list[int],
+    request_id: str,
+    image_mime_types: list[str]
+) -> str:
+    """Run one vision extraction call over several page images, with the same retry policy as call_vision_model."""
+    try:
+        return await ai_client.generate_with_images(
+            prompt=BATCH_EXTRACTION_PROMPT.format(count=len(page_nums), pages=", ".join(map(str, page_nums))),
+            images=images,
+            image_mime_types=image_mime_types,
+            max_tokens=settings.extraction_max_tokens * len(page_nums),
+            temperature=settings.extraction_temperature
+        )
+    except Exception as e:
+        logger.warning(f"[{request_id}] Batched extraction of pages {page_nums} failed: {e}")
+        raise
+
+
+@retry_with_backoff(
+    max_retries=settings.max_retries,
+    initial_delay=settings.retry_initial_delay,
+    backoff_factor=settings.retry_backoff_factor,
+    jitter=True,
+    exceptions=(OpenAIError, httpx.RequestError, httpx.TimeoutException, AIProviderError),
+    exclude_exceptions=(AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError),
+    guard=provider_guard
+)
+async def call_reasoning_model(
+    prompt: str,
+    request_id: str,
+    report_keys: list[str],
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    on_restart: Optional[Callable[[], Awaitable[None]]] = None
+) -> tuple[str, Optional[Dict[str, Any]]]:
+    """Run the report reasoning call with the same retry policy, budget and breaker as the vision calls.
+
+    Returns the generated text and, when generation stopped early, the report JSON it closed on.
+    With on_token the call streams each token to it; if an attempt fails after streaming some,
+    on_restart is awaited before the error so the caller can discard them ahead of the retry.
+    """
+    # The stop condition is stateful, so every attempt gets its own
+    stop = JsonObjectStop(report_keys) if settings.llm_structured_early_stop else None
+    try:
+        if on_token is None:
+            text = await ai_client.generate_text(
+                prompt=prompt,
+                max_tokens=settings.llm_structured_max_tokens,
+                temperature=settings.llm_structured_temperature,
+                system_instruction=MN_HVAC_SYSTEM_INSTRUCTION,
+                stop=stop
+            )
+        else:
+            chunks = []
+            try:
+                async for token in ai_client.generate_text_stream(
+                    prompt=prompt,
+                    max_tokens=settings.llm_structured_max_tokens,
+                    temperature=settings.llm_structured_temperature,
+                    system_instruction=MN_HVAC_SYSTEM_INSTRUCTION,
+                    stop=stop
+                ):
+                    chunks.append(token)
+                    await on_token(token)
+            except Exception:
+                if chunks and on_restart is not None:
+                    await on_restart()
+                raise
+            text = "".join(chunks)
+    except Exception as e:
+        logger.warning(f"[{request_id}] Reasoning call failed: {e}")
+        raise
+    return text, stop.result if stop is not None else None
+
+
+def extraction_cache_key(image: Union[str, bytes], prompt: str, zoom_factor: Optional[float]) -> Optional[str]:
+    """Return the extraction cache key of one page image, or None when the cache is disabled."""
+    if extraction_cache is None:
+        return None
+    return make_cache_key(
+        digest_image_bytes(image) if isinstance(image, bytes) else digest_image_payload(image),
+        prompt,
+        MODEL_NAME,
+        zoom_factor,
+        settings.extraction_temperature
+    )
+
+
+# A partly filled vision batch is sent this long after its first page arrived
+VISION_BATCH_LINGER_SECONDS = 0.5
+
+
+class PageBatcher:
+    """Coalesces single-image page extractions into vision calls of up to batch_size pages.
+
+    send(pages) gets [(page, image), ...] and returns page -> text, or the
+    exception that page failed with. A batch goes out once full, or
+    VISION_BATCH_LINGER_SECONDS after its first page, so pages that wait on
+    each other (duplicates) can't stall it.
+    """
+
+    def __init__(self, batch_size: int, send: Callable[[list], Awaitable[Dict[int, Any]]]):
+        self.batch_size = batch_size
+        self.send = send
+        self._pending: list = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    async def extract(self, page: int, image: Any) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((page, image, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(VISION_BATCH_LINGER_SECONDS, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list) -> None:
+        results: Dict[int, Any] = {}
+        try:
+            results = await self.send([(page, image) for page, image, _ in batch])
         except Exception as e:
-            # Other errors are also retryable
-            logger.warning(f"[{request_id}] Error extracting page {page_num}, will retry: {e}")
-            raise
+            results = {page: e for page, _, _ in batch}
+        finally:
+            # Pages without a result (cancelled send) are cancelled for their waiters too
+            for page, _, future in batch:
+                if future.done():
+                    continue
+                result = results.get(page)
+                if result is None:
+                    future.cancel()
+                elif isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def aclose(self) -> None:
+        """Cancel batches not yet sent or still in flight."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def extract_page_text(
+    image: Union[str, bytes],
+    page_num: int,
+    request_id: str,
+    zoom_factor: Optional[float] = None,
+    prompt: str = BLUEPRINT_EXTRACTION_PROMPT,
+    max_tokens: Optional[int] = None,
+    image_mime_type: str = "image/png"
+) -> str:
+    """Extract text from a single page, checking the extraction cache first.
+    
+    image is a data URL or the raw image bytes of a spooled page render.
+    Cache hits are served even while the provider's circuit is open; misses
+    go through call_vision_model and its retry policy.
+    """
+    with RequestTracer(request_id, f"extract_page_{page_num}"):
+        cache_key = extraction_cache_key(image, prompt, zoom_factor)
+        if cache_key is not None:
+            cached = await extraction_cache.aget(cache_key)
+            if cached is not None:
+                logger.info(f"[{request_id}] Extraction cache hit for page {page_num}")
+                return cached
+
+        extracted = await call_vision_model(image, page_num, request_id, prompt, max_tokens, image_mime_type)
+        if cache_key is not None and extracted:
+            await extraction_cache.aput(cache_key, extracted)
+        return extracted
+
+
+def pdf_pool_unavailable(error: PDFPoolError) -> HTTPException:
+    """Return the 503 for a request that could not get a PDF worker (all busy or failing to start)."""
+    logger.warning(f"PDF worker pool unavailable: {error}")
+    return HTTPException(
+        status_code=503,
+        detail=f"PDF processing is busy, please retry ({error})",
+        headers={"Retry-After": "5"}
+    )
+
+
+def resolve_image_encoding(encoding: Optional[ImageEncoding]) -> Dict[str, Any]:
+    """Merge a request's image_encoding over the PDF_IMAGE_* settings into render_page arguments."""
+    encoding = encoding or ImageEncoding()
+    return {
+        "image_format": encoding.format.value if encoding.format else settings.pdf_image_format,
+        "image_color": encoding.color.value if encoding.color else settings.pdf_image_color,
+        "image_quality": encoding.quality or settings.pdf_image_quality,
+        "png_compression": settings.pdf_png_compression if encoding.png_compression is None else encoding.png_compression
+    }
+
+
+def is_rich_text_layer(layer: Dict[str, Any]) -> bool:
+    """Return True if a page's embedded text layer can stand in for vision OCR.
+    
+    Drawing sheets often outline their labels as vector paths and keep only
+    title-block boilerplate as text, so dense linework or text covering little
+    of the page disqualifies the layer however many characters it has.
+    """
+    return (
+        "error" not in layer
+        and layer.get("char_count", 0) >= settings.text_layer_min_chars
+        and layer.get("garbled_ratio", 1.0) <= settings.text_layer_max_garbled_ratio
+        and layer.get("drawings", float("inf")) <= settings.text_layer_max_drawings
+        and layer.get("text_coverage", 0.0) >= settings.text_layer_min_coverage
+    )
+
+
+def format_text_layer(layer: Dict[str, Any]) -> str:
+    """Render a text layer (reading-order text plus Markdown tables) as page text."""
+    parts = [layer.get("text", "")]
+    for i, table in enumerate(layer.get("tables", []), start=1):
+        parts.append(f"TABLE {i}:\n{table}")
+    return "\n\n".join(part for part in parts if part)
 
 
 @app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze_document(request: AnalyzeRequest):
+async def analyze_document(request: AnalyzeRequest, http_request: Request):
     """Extract-then-Reason pipeline with robust error handling and retry logic.
 
     Phase 1 - Extraction: Fast per-page extraction of literal text/numbers from pages.
@@ -122,10 +464,58 @@ async def analyze_document(request: AnalyzeRequest):
     - Context window management
     """
     request_id = f"req-{uuid4().hex[:12]}"
+    return await cancel_on_disconnect(http_request, run_analysis(request, request_id), request_id)
+
+
+# How often a plain /api/analyze request checks whether its client went away
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+async def cancel_on_disconnect(http_request: Request, work: Awaitable[Any], request_id: str) -> Any:
+    """Await work, cancelling it (and the provider calls it has in flight) if the client disconnects."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.warning(f"[{request_id}] Client disconnected; cancelling analysis")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def run_analysis(
+    request: AnalyzeRequest,
+    request_id: str,
+    emit: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> AnalyzeResponse:
+    """Run the extract-then-reason pipeline for one request.
+
+    When ``emit`` is given it is awaited with a progress event dict
+    (``event``, ``request_id`` plus event fields) as each stage advances,
+    including every reasoning token when the LLM-structured path streams.
+    """
     start_time = time.time()
+    # Token usage of every AI call below, by stage and page
+    usage = UsageTracker()
+
+    async def notify(event: str, **data: Any) -> None:
+        if emit is not None:
+            await emit({"event": event, "request_id": request_id, **data})
     
-    with RequestTracer(request_id, "analyze_document"):
+    with RequestTracer(request_id, "analyze_document"), usage_scope(usage):
         logger.info(f"[{request_id}] Starting pipeline with {MODEL_NAME}")
+        await notify("started", model=MODEL_NAME, provider=ai_client.get_provider())
+
+        if request.upload_id:
+            # Analyze-by-reference: pdf_server maps the stored file directly
+            pdf_source = {"pdf_path": resolve_upload_path(request.upload_id)}
+        else:
+            pdf_source = {"pdf_base64": request.file_base64}
 
         is_pdf = request.mime_type and request.mime_type.lower().startswith("application/pdf")
         # Fallback sniff for PDF
@@ -138,28 +528,34 @@ async def analyze_document(request: AnalyzeRequest):
             except Exception as e:
                 logger.warning(f"[{request_id}] PDF detection failed: {e}")
 
-        base_dir = os.path.dirname(__file__)
         extracted_data = []
         pages_processed = 0
         failed_pages = []
+        page_zoom_factors: dict[int, float] = {}
+        page_sources: dict[int, str] = {}
+        page_image_stats: dict[int, Dict[str, Any]] = {}
+        deduplicated_pages: dict[int, Dict[str, Any]] = {}
+        page_classifications: dict[int, Dict[str, Any]] = {}
+        skipped_pages: dict[int, str] = {}
+        reused_pages: dict[int, Dict[str, Any]] = {}
+        reextracted_pages: list[int] = []
 
         async with AsyncExitStack() as stack:
             if is_pdf:
-                # Start PDF MCP server
+                # Workers are checked out per phase (open/classify/match here, then each render
+                # batch) and never held across vision calls, so uploads and previews aren't starved
                 try:
-                    pdf_params = StdioServerParameters(
-                        command=sys.executable, 
-                        args=[os.path.join(base_dir, "mcp_servers", "pdf_server.py")]
-                    )
-                    pdf_read_write = await stack.enter_async_context(stdio_client(pdf_params))
-                    pdf_read_stream, pdf_write_stream = pdf_read_write
-                    pdf_session = await stack.enter_async_context(ClientSession(pdf_read_stream, pdf_write_stream))
-                    await pdf_session.initialize()
-
-                    # Get metadata
-                    meta_result = await pdf_session.call_tool("split_pdf_metadata", arguments={"pdf_base64": request.file_base64})
-                    doc_info_raw = meta_result.content[0].text
-                    doc_info = json.loads(doc_info_raw)
+                    if "pdf_base64" in pdf_source:
+                        # Every checkout reopens the document; by path that is a cheap mmap on any worker
+                        spool_path = await asyncio.to_thread(spool_pdf, request.file_base64)
+                        stack.callback(os.unlink, spool_path)
+                        pdf_source = {"pdf_path": spool_path}
+
+                    pdf_stack = await stack.enter_async_context(AsyncExitStack())
+                    pdf_session = await pdf_stack.enter_async_context(pdf_pool.session())
+
+                    # Open the document once; pages are rendered by handle
+                    doc_info = await pdf_stack.enter_async_context(pdf_session.document(pdf_source))
                     
                     if "error" in doc_info:
                         raise HTTPException(status_code=400, detail=f"PDF metadata error: {doc_info['error']}")
@@ -167,64 +563,500 @@ async def analyze_document(request: AnalyzeRequest):
                     total_pages = doc_info.get('total_pages', 1)
                     max_pages = min(total_pages, request.max_pages or settings.max_pages_default)
                     
-                    # Get zoom factor from quality setting
-                    zoom_factor = QUALITY_ZOOM_MAP.get(request.quality, 2.0)
-                    logger.info(f"[{request_id}] Processing {max_pages}/{total_pages} pages (quality={request.quality.value}, zoom={zoom_factor}x)")
+                    # Get zoom factor from quality setting ("auto" lets pdf_server pick per page)
+                    auto_zoom = request.quality == PDFQuality.AUTO
+                    zoom_factor = None if auto_zoom else QUALITY_ZOOM_MAP.get(request.quality, 2.0)
+                    image_encoding = resolve_image_encoding(request.image_encoding)
+                    logger.info(
+                        f"[{request_id}] Processing {max_pages}/{total_pages} pages (quality={request.quality.value}, "
+                        f"zoom={'auto' if auto_zoom else f'{zoom_factor}x'}, "
+                        f"encoding={image_encoding['image_format']}/{image_encoding['image_color']})"
+                    )
+                    await notify("document", total_pages=total_pages, max_pages=max_pages, zoom_factor=zoom_factor)
 
-                    # Process each page with graceful failure handling
-                    for p in range(1, max_pages + 1):
+                    # Cheap classification pre-pass decides which pages get extracted, and in what order
+                    page_order = list(range(1, max_pages + 1))
+                    classification_mode = (
+                        request.page_classification.value if request.page_classification else settings.page_classification
+                    )
+                    if classification_mode != "off":
                         try:
-                            logger.info(f"[{request_id}] Scanning Page {p}/{max_pages}...")
-                            img_result = await pdf_session.call_tool(
-                                "render_page_for_vision", 
-                                arguments={
-                                    "pdf_base64": request.file_base64, 
-                                    "page_number": p,
-                                    "zoom_factor": zoom_factor
-                                }
+                            result = await pdf_session.call_tool(
+                                "classify_pages",
+                                arguments={"handle": doc_info["handle"], "page_numbers": list(range(1, total_pages + 1))}
                             )
-                            img_data = json.loads(img_result.content[0].text)
-                            
-                            if "error" in img_data:
-                                logger.error(f"[{request_id}] Page {p} render error: {img_data['error']}")
-                                failed_pages.append(p)
-                                continue
-                            
-                            image_data_url = f"data:image/png;base64,{img_data.get('image_data')}"
-
-                            # Extract text with retry logic
-                            extracted = await extract_page_text(image_data_url, p, request_id)
-                            extracted_data.append(f"--- PAGE {p} ---\n{extracted}")
-                            pages_processed += 1
-                            
-                        except AIQuotaExceededError as e:
-                            # Quota exceeded - fail immediately with clear message
-                            logger.error(f"[{request_id}] Gemini quota exceeded on page {p}: {e}")
-                            raise HTTPException(
-                                status_code=429,
-                                detail=f"Gemini API quota exceeded. Processed {p-1}/{max_pages} pages successfully. "
-                                       f"Please wait before retrying or check your quota at https://aistudio.google.com/app/apikey"
+                            classified = json.loads(result.content[0].text)
+                            if "error" in classified:
+                                raise RuntimeError(classified["error"])
+                            for page in classified["pages"]:
+                                page_classifications[page.pop("page_number")] = page
+                            page_order, skipped_pages = plan_page_order(page_classifications, classification_mode, max_pages)
+                            if not page_order and classification_mode == "mechanical_only":
+                                # A set without a single HVAC sheet is less likely than one the pre-pass misread
+                                logger.warning(f"[{request_id}] No page classified as mechanical; analyzing all pages")
+                                page_order, skipped_pages = plan_page_order(page_classifications, "prioritize", max_pages)
+                            max_pages = len(page_order)
+                            logger.info(
+                                f"[{request_id}] Classified {total_pages} pages: extracting {page_order}, "
+                                f"skipping {len(skipped_pages)} ({classification_mode})"
+                            )
+                            await notify(
+                                "pages_classified", classifications=page_classifications,
+                                page_order=page_order, skipped_pages=skipped_pages
                             )
-                        except AIAuthenticationError as e:
-                            # Authentication error - fail immediately
-                            logger.error(f"[{request_id}] Gemini authentication failed on page {p}: {e}")
+                        except Exception as e:
+                            # Classification only saves work; fall back to document order
+                            logger.warning(f"[{request_id}] Page classification failed, extracting in order: {e}")
+                            page_classifications.clear()
+                        if not page_order:
                             raise HTTPException(
-                                status_code=401,
-                                detail=f"Gemini API authentication failed. Please check your API key."
+                                status_code=422,
+                                detail=f"Nothing to analyze: all {total_pages} pages are blank"
                             )
-                        except AIInvalidRequestError as e:
-                            # Invalid request - fail immediately
-                            logger.error(f"[{request_id}] Invalid request on page {p}: {e}")
+
+                    # Revised set: unchanged pages take the previous upload's extraction
+                    page_results: dict[int, str] = {}
+                    reused_records: dict[int, Dict[str, Any]] = {}
+                    if request.previous_upload_id:
+                        previous_results = load_page_results(request.previous_upload_id)
+                        if previous_results is None:
                             raise HTTPException(
-                                status_code=400,
-                                detail=f"Invalid request to AI provider: {str(e)}"
+                                status_code=404,
+                                detail=f"Upload {request.previous_upload_id} has no stored analysis to compare against"
+                            )
+                        previous_info = await pdf_stack.enter_async_context(
+                            pdf_session.document({"pdf_path": resolve_upload_path(request.previous_upload_id)})
+                        )
+                        if "error" in previous_info:
+                            raise HTTPException(status_code=400, detail=f"Previous upload error: {previous_info['error']}")
+                        result = await pdf_session.call_tool(
+                            "match_pages",
+                            arguments={
+                                "handle": doc_info["handle"],
+                                "previous_handle": previous_info["handle"],
+                                "page_numbers": page_order,
+                                "max_changed_fraction": settings.revision_max_changed_fraction
+                            }
+                        )
+                        matches = json.loads(result.content[0].text)
+                        if "error" in matches:
+                            raise HTTPException(status_code=500, detail=f"Revision matching failed: {matches['error']}")
+                        for match in matches["pages"]:
+                            p, q = match["page_number"], match.get("previous_page")
+                            # Another model's output or a text-layer read is extracted again
+                            if q is not None and q in previous_results and is_reusable_page_result(previous_results[q], MODEL_NAME):
+                                reused_records[p] = previous_results[q]
+                                page_results[p] = previous_results[q]["text"]
+                                page_sources[p] = "reused"
+                                reused_pages[p] = {
+                                    "previous_page": q, "method": match["method"], "changed_fraction": match["changed_fraction"]
+                                }
+                                await notify("page_extracted", page=p, text=page_results[p], source="reused", reuse=reused_pages[p])
+                        reextracted_pages = [p for p in page_order if p not in reused_pages]
+                        page_order = reextracted_pages
+                        logger.info(
+                            f"[{request_id}] Revision of {request.previous_upload_id}: reusing {len(reused_pages)} pages, "
+                            f"re-extracting {reextracted_pages}"
+                        )
+
+                    # The page pipeline checks out a worker per render batch
+                    await pdf_stack.aclose()
+
+                    # Bounded render -> extract pipeline: the pdf worker renders ahead (up to
+                    # the prefetch depth) while per-provider consumers run the vision calls
+                    concurrency = settings.page_concurrency(ai_client.get_provider())
+                    batch_size = settings.vision_batch_size(ai_client.get_provider())
+                    # A batched call needs batch_size pages in hand for each vision slot
+                    consumers = concurrency * batch_size
+                    batch_max_pixels = settings.vision_batch_max_megapixels * 1_000_000
+                    page_pixels: dict[int, float] = {}
+                    prefetch_depth = settings.pdf_prefetch_depth
+                    rendered: asyncio.Queue = asyncio.Queue(maxsize=prefetch_depth)
+                    page_fingerprints: dict[int, tuple] = {}
+                    text_layer_mode = settings.text_layer_mode
+
+                    async def read_text_layer(session: Any, p: int) -> Optional[Dict[str, Any]]:
+                        try:
+                            result = await session.call_tool(
+                                "extract_text_layer",
+                                arguments={"handle": doc_info["handle"], "page_number": p}
                             )
+                            layer = json.loads(result.content[0].text)
                         except Exception as e:
-                            logger.error(f"[{request_id}] Page {p} extraction failed: {e}")
-                            failed_pages.append(p)
-                            # Continue processing remaining pages (graceful degradation)
-                            continue
+                            logger.warning(f"[{request_id}] Page {p} text layer unavailable: {e}")
+                            return None
+                        return layer if is_rich_text_layer(layer) else None
+
+                    async def render_batch(pages: list) -> tuple:
+                        """Read the text layers of pages and render those that need vision, on one checked-out worker."""
+                        text_layers: dict[int, Optional[Dict[str, Any]]] = {}
+                        # By handle: a worker that already has the document open skips re-reading and hashing it
+                        async with pdf_pool.session() as session, \
+                                session.document({**pdf_source, "handle": doc_info["handle"]}) as batch_doc:
+                            if "error" in batch_doc:
+                                raise RuntimeError(batch_doc["error"])
+                            if batch_doc["handle"] != doc_info["handle"]:
+                                raise RuntimeError("Document changed during analysis")
+                            for p in pages:
+                                text_layer = await read_text_layer(session, p) if text_layer_mode != "off" else None
+                                if text_layer is not None and text_layer_mode == "skip":
+                                    # Real text in the PDF: no rasterizing, no vision call
+                                    page_results[p] = format_text_layer(text_layer)
+                                    page_sources[p] = "text_layer"
+                                    logger.info(f"[{request_id}] Page {p} read from text layer ({text_layer['char_count']} chars)")
+                                    await notify("page_extracted", page=p, text=page_results[p], source="text_layer")
+                                    continue
+                                text_layers[p] = text_layer
+                            if not text_layers:
+                                return text_layers, []
+
+                            # One call per batch: pdf_server spreads the pages across its render processes.
+                            # Verify-mode pages get a separate call: their short check is one vision call on
+                            # the whole page, downscaled to the tile budget rather than tiled or cropped
+                            tile_max_pixels = int(settings.pdf_tile_max_megapixels * 1_000_000)
+                            rendered_pages: dict[int, Dict[str, Any]] = {}
+                            for verify in (False, True):
+                                batch = [p for p, text_layer in text_layers.items() if (text_layer is not None) == verify]
+                                if not batch:
+                                    continue
+                                logger.info(f"[{request_id}] Rendering Pages {', '.join(map(str, batch))} of {total_pages}...")
+                                img_result = await session.call_tool(
+                                    "render_pages",
+                                    arguments={
+                                        "handle": batch_doc["handle"],
+                                        "page_numbers": batch,
+                                        "zoom_factor": zoom_factor or 0,
+                                        "transport": settings.pdf_page_transport,
+                                        "auto_zoom": auto_zoom,
+                                        "tile_max_pixels": 0 if verify else tile_max_pixels,
+                                        "max_pixels": tile_max_pixels if verify else 0,
+                                        "tile_overlap_px": settings.pdf_tile_overlap_px,
+                                        "fingerprint": settings.page_dedup_enabled and not verify,
+                                        "region_zoom": settings.pdf_region_zoom if settings.pdf_region_crop and not verify else 0,
+                                        "region_max_fraction": settings.pdf_region_max_page_fraction,
+                                        **image_encoding
+                                    }
+                                )
+                                batch_data = json.loads(img_result.content[0].text)
+                                batch_results = batch_data.get("pages") or [{"error": batch_data.get("error", "No render result")}] * len(batch)
+                                rendered_pages.update(zip(batch, batch_results))
+                        return text_layers, [rendered_pages[p] for p in text_layers]
+
+                    async def render_pages() -> None:
+                        batch_size = settings.pdf_render_batch_size
+                        for batch_start in range(0, len(page_order), batch_size):
+                            pages = page_order[batch_start:batch_start + batch_size]
+                            try:
+                                text_layers, batch_results = await render_batch(pages)
+                            except Exception as e:
+                                # Pages already read from their text layer are kept
+                                text_layers = {p: None for p in pages if p not in page_results}
+                                batch_results = [{"error": str(e)}] * len(text_layers)
+                            batch = list(text_layers)
+
+                            for p, img_data in zip(batch, batch_results):
+                                if "error" not in img_data:
+                                    try:
+                                        # Raw image bytes for spooled renders, data URL for inline ones
+                                        if "regions" in img_data:
+                                            image = RegionCrops(
+                                                (r["kind"], read_rendered_page(r)) for r in img_data["regions"]
+                                            )
+                                        elif "tiles" in img_data:
+                                            image = [(t["row"], t["col"], read_rendered_page(t)) for t in img_data["tiles"]]
+                                        else:
+                                            image = read_rendered_page(img_data)
+                                    except Exception as e:
+                                        img_data = {"error": str(e)}
 
+                                if "error" in img_data:
+                                    logger.error(f"[{request_id}] Page {p} render error: {img_data['error']}")
+                                    failed_pages.append(p)
+                                    await notify("page_failed", page=p, stage="render", error=img_data["error"])
+                                    continue
+
+                                page_zoom_factors[p] = img_data.get("zoom_factor", zoom_factor)
+                                page_image_stats[p] = {
+                                    "mime_type": img_data.get("mime_type", "image/png"),
+                                    "byte_size": img_data.get("byte_size"),
+                                    "encode_ms": img_data.get("encode_ms")
+                                }
+                                if "regions" in img_data:
+                                    page_image_stats[p]["regions"] = [
+                                        {"kind": r["kind"], "rect": r["rect"], "width": r["width"], "height": r["height"]}
+                                        for r in img_data["regions"]
+                                    ]
+                                if img_data.get("width") and img_data.get("height"):
+                                    page_pixels[p] = img_data["width"] * img_data["height"]
+                                if img_data.get("phash"):
+                                    page_fingerprints[p] = (img_data["phash"], img_data.get("text_digest"))
+                                await notify(
+                                    "page_rendered", page=p, width=img_data.get("width"), height=img_data.get("height"),
+                                    zoom_factor=page_zoom_factors[p], tiles=len(img_data.get("tiles", [])) or 1,
+                                    **page_image_stats[p]
+                                )
+                                # Blocks once prefetch_depth pages are waiting for extraction
+                                await rendered.put((p, image, text_layers[p]))
+
+                        for _ in range(consumers):
+                            await rendered.put(None)
+
+                    # Caps in-flight vision calls, including the tiles of one oversized page
+                    vision_slots = asyncio.Semaphore(concurrency)
+
+                    async def extract_batch(pages: list) -> Dict[int, Any]:
+                        page_nums = [p for p, _ in pages]
+                        if len(pages) > 1:
+                            try:
+                                async with vision_slots:
+                                    # The batched call's tokens are split between its pages
+                                    with usage_scope(stage="extraction", pages=page_nums):
+                                        raw = await call_vision_model_batch(
+                                            [image for _, image in pages], page_nums, request_id,
+                                            [page_image_stats[p]["mime_type"] for p in page_nums]
+                                        )
+                                texts = split_batched_extraction(raw, page_nums)
+                                if texts is not None:
+                                    logger.info(f"[{request_id}] Pages {page_nums} extracted in one batched call")
+                                    for p, image in pages:
+                                        cache_key = extraction_cache_key(image, BLUEPRINT_EXTRACTION_PROMPT, page_zoom_factors[p])
+                                        if cache_key is not None:
+                                            await extraction_cache.aput(cache_key, texts[p])
+                                    return texts
+                                logger.warning(
+                                    f"[{request_id}] Batched output for pages {page_nums} has no usable page delimiters; "
+                                    f"extracting them one by one"
+                                )
+                            except (AIQuotaExceededError, AIAuthenticationError, CircuitOpenError):
+                                raise
+                            except Exception as e:
+                                logger.warning(f"[{request_id}] Batched call for pages {page_nums} failed ({e}); extracting them one by one")
+
+                        async def extract_single(p: int, image: Any) -> str:
+                            async with vision_slots:
+                                with usage_scope(stage="extraction", pages=[p]):
+                                    return await extract_page_text(
+                                        image, p, request_id, page_zoom_factors[p], image_mime_type=page_image_stats[p]["mime_type"]
+                                    )
+
+                        results = await asyncio.gather(*(extract_single(p, image) for p, image in pages), return_exceptions=True)
+                        return dict(zip(page_nums, results))
+
+                    # Whole pages small enough are coalesced into multi-image calls
+                    page_batcher = PageBatcher(batch_size, extract_batch) if batch_size > 1 else None
+
+                    async def extract_image(image: Any, p: int, **kwargs: Any) -> str:
+                        kwargs["image_mime_type"] = page_image_stats[p]["mime_type"]
+                        if not isinstance(image, list):
+                            if page_batcher is not None and "prompt" not in kwargs and page_pixels.get(p, float("inf")) <= batch_max_pixels:
+                                cache_key = extraction_cache_key(image, BLUEPRINT_EXTRACTION_PROMPT, page_zoom_factors[p])
+                                cached = await extraction_cache.aget(cache_key) if cache_key is not None else None
+                                if cached is not None:
+                                    logger.info(f"[{request_id}] Extraction cache hit for page {p}")
+                                    return cached
+                                return await page_batcher.extract(p, image)
+                            async with vision_slots:
+                                return await extract_page_text(image, p, request_id, page_zoom_factors[p], **kwargs)
+
+                        # Tiled or cropped page: extract the parts in parallel, then merge
+                        async def extract_part(*part: Any) -> tuple:
+                            *key, part_image = part
+                            async with vision_slots:
+                                return (*key, await extract_page_text(part_image, p, request_id, page_zoom_factors[p], **kwargs))
+
+                        part_tasks = [asyncio.create_task(extract_part(*part)) for part in image]
+                        try:
+                            part_results = await asyncio.gather(*part_tasks)
+                        except BaseException:
+                            for task in part_tasks:
+                                task.cancel()
+                            await asyncio.gather(*part_tasks, return_exceptions=True)
+                            raise
+                        if isinstance(image, RegionCrops):
+                            logger.info(f"[{request_id}] Page {p}: merged {len(part_results)} regions")
+                            return merge_region_extractions(part_results)
+                        # Tiles overlap: merge with overlap dedup
+                        logger.info(f"[{request_id}] Page {p}: merged {len(part_results)} tiles")
+                        return merge_tile_extractions(part_results)
+
+                    # Pages already extracted (or in flight) this request, for near-duplicate reuse
+                    fingerprinted_pages: list[tuple] = []
+                    dedup_max_distance = settings.page_dedup_max_distance()
+
+                    def is_duplicate(a: tuple, b: tuple) -> Optional[int]:
+                        distance = hash_distance(a[0], b[0])
+                        max_distance = dedup_max_distance
+                        if settings.page_dedup_match_text:
+                            if a[1] != b[1]:
+                                return None
+                            if a[1] is None:
+                                # No text to tell apart near-identical scans: only exact hashes match
+                                max_distance = 0
+                        return distance if distance <= max_distance else None
+
+                    def similarity(distance: int) -> float:
+                        return round(1 - distance / 256, 3)
+
+                    async def extract_or_reuse(image: Any, p: int) -> str:
+                        fingerprint = page_fingerprints.get(p)
+                        if fingerprint is None:
+                            return await extract_image(image, p)
+
+                        for q, q_fingerprint, q_text in list(fingerprinted_pages):
+                            distance = is_duplicate(fingerprint, q_fingerprint)
+                            if distance is None:
+                                continue
+                            # Wait for the earlier page rather than extracting the same sheet twice
+                            text = await asyncio.shield(q_text)
+                            if text:
+                                deduplicated_pages[p] = {"source": "page", "duplicate_of": q, "similarity": similarity(distance)}
+                                logger.info(f"[{request_id}] Page {p} duplicates page {q}, reusing its extraction")
+                                return text
+
+                        own_text = asyncio.get_running_loop().create_future()
+                        fingerprinted_pages.append((p, fingerprint, own_text))
+                        try:
+                            context = make_dedup_context(
+                                BLUEPRINT_EXTRACTION_PROMPT, MODEL_NAME, page_zoom_factors[p], settings.extraction_temperature
+                            )
+                            if extraction_cache is not None:
+                                # Fuzzy matches stay within this document; other documents only hit exact keys
+                                similar = await extraction_cache.afind_similar(
+                                    context, doc_info["handle"], *fingerprint, dedup_max_distance, settings.page_dedup_match_text
+                                )
+                                if similar is not None:
+                                    text, distance = similar
+                                    deduplicated_pages[p] = {"source": "cache", "similarity": similarity(distance)}
+                                    logger.info(f"[{request_id}] Page {p} matches an earlier analysis of this document, reusing its extraction")
+                                    own_text.set_result(text)
+                                    return text
+
+                            text = await extract_image(image, p)
+                            if extraction_cache is not None and text:
+                                await extraction_cache.aput(
+                                    make_fingerprint_key(context, *fingerprint), text, context, *fingerprint, document=doc_info["handle"]
+                                )
+                            own_text.set_result(text)
+                            return text
+                        finally:
+                            if not own_text.done():
+                                # Failed or cancelled: duplicates waiting on this page extract on their own
+                                own_text.set_result(None)
+
+                    async def extract_pages() -> None:
+                        while True:
+                            item = await rendered.get()
+                            if item is None:
+                                return
+                            p, image, text_layer = item
+                            try:
+                                # Batch flushes started from here inherit the scope; extract_batch narrows its pages
+                                with usage_scope(stage="extraction", pages=[p]):
+                                    if text_layer is not None:
+                                        # Verify mode: short vision pass for anything the text layer lacks
+                                        logger.info(f"[{request_id}] Verifying Page {p}/{total_pages} text layer...")
+                                        layer_text = format_text_layer(text_layer)
+                                        additions = await extract_image(
+                                            image, p,
+                                            prompt=TEXT_LAYER_VERIFICATION_PROMPT.format(
+                                                text_layer=truncate_to_token_limit(layer_text, max_tokens=settings.extraction_max_tokens)
+                                            ),
+                                            max_tokens=settings.text_layer_verify_max_tokens
+                                        )
+                                        if additions.strip() and additions.strip().upper() != "NONE":
+                                            layer_text = f"{layer_text}\n\n[VISION VERIFICATION]\n{additions.strip()}"
+                                        page_results[p] = layer_text
+                                        page_sources[p] = "text_layer_verified"
+                                    else:
+                                        logger.info(f"[{request_id}] Scanning Page {p}/{total_pages}...")
+                                        # Extract text with retry logic
+                                        page_results[p] = await extract_or_reuse(image, p)
+                                        page_sources[p] = "duplicate" if p in deduplicated_pages else "vision"
+                                await notify(
+                                    "page_extracted", page=p, text=page_results[p], source=page_sources[p],
+                                    **({"dedup": deduplicated_pages[p]} if p in deduplicated_pages else {})
+                                )
+                                
+                            except AIQuotaExceededError as e:
+                                # Quota exceeded - fail immediately with clear message
+                                logger.error(f"[{request_id}] Gemini quota exceeded on page {p}: {e}")
+                                raise HTTPException(
+                                    status_code=429,
+                                    detail=f"Gemini API quota exceeded. Processed {len(page_results)}/{max_pages} pages successfully. "
+                                           f"Please wait before retrying or check your quota at https://aistudio.google.com/app/apikey"
+                                )
+                            except AIAuthenticationError as e:
+                                # Authentication error - fail immediately
+                                logger.error(f"[{request_id}] Gemini authentication failed on page {p}: {e}")
+                                raise HTTPException(
+                                    status_code=401,
+                                    detail=f"Gemini API authentication failed. Please check your API key."
+                                )
+                            except AIInvalidRequestError as e:
+                                # Invalid request - fail immediately
+                                logger.error(f"[{request_id}] Invalid request on page {p}: {e}")
+                                raise HTTPException(
+                                    status_code=400,
+                                    detail=f"Invalid request to AI provider: {str(e)}"
+                                )
+                            except CircuitOpenError as e:
+                                # Provider unhealthy - stop instead of failing every remaining page
+                                logger.error(f"[{request_id}] Skipping page {p}: {e}")
+                                raise HTTPException(
+                                    status_code=503,
+                                    detail=f"AI provider unavailable ({e}). Processed {len(page_results)}/{max_pages} pages successfully.",
+                                    headers={"Retry-After": str(max(1, round(e.retry_after)))}
+                                )
+                            except Exception as e:
+                                logger.error(f"[{request_id}] Page {p} extraction failed: {e}")
+                                # Continue processing remaining pages (graceful degradation)
+                                failed_pages.append(p)
+                                await notify("page_failed", page=p, stage="extract", error=str(e))
+
+                    logger.info(
+                        f"[{request_id}] Page pipeline: render batch {settings.pdf_render_batch_size}, "
+                        f"prefetch depth {prefetch_depth}, extract concurrency {concurrency}, "
+                        f"vision batch {batch_size}"
+                    )
+                    page_tasks = [asyncio.create_task(render_pages())]
+                    page_tasks += [asyncio.create_task(extract_pages()) for _ in range(consumers)]
+                    try:
+                        await asyncio.gather(*page_tasks)
+                    except BaseException:
+                        # Fatal provider error (or client disconnect): cancel remaining pages now
+                        for task in page_tasks:
+                            task.cancel()
+                        await asyncio.gather(*page_tasks, return_exceptions=True)
+                        raise
+                    finally:
+                        if page_batcher is not None:
+                            await page_batcher.aclose()
+
+                    if request.upload_id:
+                        # Baseline for a later re-analysis of a revised set
+                        try:
+                            # Reused pages keep the source and model that produced their text
+                            save_page_results(
+                                request.upload_id,
+                                {
+                                    p: reused_records.get(p) or {"text": page_results[p], "source": page_sources.get(p)}
+                                    for p in page_results
+                                },
+                                MODEL_NAME
+                            )
+                        except OSError as e:
+                            logger.warning(f"[{request_id}] Could not store page results of {request.upload_id}: {e}")
+
+                    # Preserve page order regardless of completion order
+                    for p in sorted(page_results):
+                        extracted_data.append(f"--- PAGE {p} ---\n{page_results[p]}")
+                    pages_processed = len(page_results)
+                    failed_pages.sort()
+
+                except HTTPException:
+                    raise
+                except PDFPoolError as e:
+                    raise pdf_pool_unavailable(e)
                 except Exception as e:
                     logger.error(f"[{request_id}] PDF processing error: {e}")
                     raise HTTPException(status_code=500, detail=f"PDF processing failed: {str(e)}")
@@ -237,9 +1069,12 @@ async def analyze_document(request: AnalyzeRequest):
                     else:
                         image_data_url = f"data:{request.mime_type};base64,{request.file_base64}"
 
-                    extracted = await extract_page_text(image_data_url, 1, request_id)
+                    with usage_scope(stage="extraction", pages=[1]):
+                        extracted = await extract_page_text(image_data_url, 1, request_id)
                     extracted_data.append(f"--- IMAGE ---\n{extracted}")
                     pages_processed = 1
+                    page_sources[1] = "vision"
+                    await notify("page_extracted", page=1, text=extracted, source="vision")
                     
                 except AIQuotaExceededError as e:
                     logger.error(f"[{request_id}] Gemini quota exceeded: {e}")
@@ -259,6 +1094,13 @@ async def analyze_document(request: AnalyzeRequest):
                         status_code=400,
                         detail=f"Invalid request to AI provider: {str(e)}"
                     )
+                except CircuitOpenError as e:
+                    logger.error(f"[{request_id}] Image extraction skipped: {e}")
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"AI provider unavailable ({e})",
+                        headers={"Retry-After": str(max(1, round(e.retry_after)))}
+                    )
                 except Exception as e:
                     logger.error(f"[{request_id}] Image extraction failed: {e}")
                     raise HTTPException(status_code=500, detail=f"Image processing failed: {str(e)}")
@@ -267,7 +1109,13 @@ async def analyze_document(request: AnalyzeRequest):
             raise HTTPException(status_code=500, detail="No data extracted from document")
 
         # Phase 2: Reasoning with intelligent context management
+        extraction_usage = usage.stages.get("extraction")
+        if extraction_usage is not None:
+            log_model_interaction(
+                request_id, MODEL_NAME, extraction_usage.prompt_tokens, extraction_usage.completion_tokens, "extraction"
+            )
         logger.info(f"[{request_id}] Running engineering inference...")
+        await notify("reasoning_started", pages_processed=pages_processed, failed_pages=failed_pages)
         
         # Use intelligent prioritization for multi-page documents
         if len(extracted_data) > 1:
@@ -332,24 +1180,44 @@ REQUIRED JSON STRUCTURE EXAMPLE (fill with inferred or calculated numbers where
 Remember: Narrative first, JSON second. If any value is uncertain, mark it clearly in the narrative and populate JSON with best-estimate and include assumptions in the JSON or narrative.
 """
 
-                    raw_output = await ai_client.generate_text(
-                        prompt=reasoning_prompt,
-                        max_tokens=settings.llm_structured_max_tokens,
-                        temperature=settings.llm_structured_temperature,
-                        system_instruction=MN_HVAC_SYSTEM_INSTRUCTION
-                    )
+                    report_keys = ["project_info", "load_calculations", "equipment_analysis", "compliance_status"]
 
-                    # Try to repair and parse JSON emitted by model
-                    parsed = repair_json(raw_output)
+                    async def forward_token(token: str) -> None:
+                        await notify("reasoning_token", text=token)
+
+                    async def restart_reasoning() -> None:
+                        await notify("reasoning_restarted")
+
+                    with usage_scope(stage="reasoning"):
+                        # The JSON comes last, but models often keep writing after it: decoding stops once it closes.
+                        # Reasoning tokens are forwarded to a streaming caller as they arrive
+                        raw_output, early_result = await call_reasoning_model(
+                            reasoning_prompt, request_id, report_keys,
+                            on_token=forward_token if emit is not None else None,
+                            on_restart=restart_reasoning
+                        )
+
+                    if early_result is not None:
+                        logger.info(f"[{request_id}] Report JSON closed after {len(raw_output)} chars; generation stopped early")
+                        parsed = early_result
+                    else:
+                        # Try to repair and parse JSON emitted by model
+                        parsed = repair_json(raw_output)
 
                     # Basic schema validation - require canonical top-level keys
-                    if parsed and validate_json_schema(parsed, ["project_info", "load_calculations", "equipment_analysis", "compliance_status"]):
+                    if parsed and validate_json_schema(parsed, report_keys):
                         logger.info(f"[{request_id}] LLM structured JSON validated successfully")
                         parsed = normalize_analysis_keys(parsed)
                         parsed = validate_hvac_analysis_output(parsed)
 
                         processing_time = time.time() - start_time
-                        log_model_interaction(request_id, MODEL_NAME, None, None, "llm_structured_json")
+                        reasoning_usage = usage.stages.get("reasoning")
+                        log_model_interaction(
+                            request_id, MODEL_NAME,
+                            reasoning_usage.prompt_tokens if reasoning_usage else None,
+                            reasoning_usage.completion_tokens if reasoning_usage else None,
+                            "llm_structured_json"
+                        )
 
                         if failed_pages:
                             logger.warning(f"[{request_id}] Failed pages: {failed_pages}")
@@ -358,7 +1226,16 @@ Remember: Narrative first, JSON second. If any value is uncertain, mark it clear
                             report=json.dumps(parsed) if isinstance(parsed, dict) else json.dumps({"error": "unexpected_report_format"}),
                             request_id=request_id,
                             pages_processed=pages_processed,
-                            processing_time_seconds=round(processing_time, 2)
+                            processing_time_seconds=round(processing_time, 2),
+                            page_zoom_factors=page_zoom_factors,
+                            page_sources=page_sources,
+                            page_image_stats=page_image_stats,
+                            deduplicated_pages=deduplicated_pages,
+                            page_classifications=page_classifications,
+                            skipped_pages=skipped_pages,
+                            reused_pages=reused_pages,
+                            reextracted_pages=reextracted_pages,
+                            token_usage=usage.report()
                         )
                     else:
                         logger.warning(f"[{request_id}] LLM structured JSON invalid or missing required keys - falling back to deterministic path")
@@ -412,7 +1289,16 @@ Remember: Narrative first, JSON second. If any value is uncertain, mark it clear
                 report=json.dumps(parsed) if isinstance(parsed, dict) else json.dumps({"error": "unexpected_report_format"}),
                 request_id=request_id,
                 pages_processed=pages_processed,
-                processing_time_seconds=round(processing_time, 2)
+                processing_time_seconds=round(processing_time, 2),
+                page_zoom_factors=page_zoom_factors,
+                page_sources=page_sources,
+                page_image_stats=page_image_stats,
+                deduplicated_pages=deduplicated_pages,
+                page_classifications=page_classifications,
+                skipped_pages=skipped_pages,
+                reused_pages=reused_pages,
+                reextracted_pages=reextracted_pages,
+                token_usage=usage.report()
             )
         except (AIQuotaExceededError, AIAuthenticationError, AIInvalidRequestError):
             # These have already been handled above and converted to HTTPException
@@ -423,148 +1309,313 @@ Remember: Narrative first, JSON second. If any value is uncertain, mark it clear
             raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
 
 
+# Persistent background job queue running run_analysis (started in lifespan)
+job_queue = create_job_queue(run_analysis)
+
+
+STREAM_HEARTBEAT_SECONDS = 15.0
+
+
+def format_stream_event(event: Dict[str, Any], stream_format: str) -> str:
+    """Serialize a pipeline event as an SSE frame or an NDJSON line."""
+    payload = json.dumps(event)
+    if stream_format == "ndjson":
+        return payload + "\n"
+    return f"event: {event['event']}\ndata: {payload}\n\n"
+
+
+@app.post("/api/analyze/stream")
+async def analyze_document_stream(request: AnalyzeRequest, format: Literal["sse", "ndjson"] = "sse"):
+    """Streaming variant of /api/analyze.
+
+    Emits pipeline events as Server-Sent Events (default) or NDJSON
+    (``?format=ndjson``): ``started``, ``document``, ``page_rendered``,
+    ``page_extracted``/``page_failed`` per page, ``reasoning_started``,
+    ``reasoning_token`` while the LLM-structured path generates
+    (``reasoning_restarted`` if a failed attempt is retried), and finally
+    ``complete`` with the AnalyzeResponse payload or ``error`` with
+    ``status_code`` and ``detail``. Heartbeats keep idle proxies from timing
+    out; a client disconnect cancels the remaining work.
+    """
+    request_id = f"req-{uuid4().hex[:12]}"
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def runner() -> None:
+        try:
+            result = await run_analysis(request, request_id, emit=queue.put)
+            await queue.put({"event": "complete", "request_id": request_id, "result": result.model_dump()})
+        except HTTPException as e:
+            await queue.put({"event": "error", "request_id": request_id, "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"[{request_id}] Streaming analysis failed: {e}")
+            await queue.put({"event": "error", "request_id": request_id, "status_code": 500, "detail": str(e)})
+        finally:
+            await queue.put(None)
+
+    async def event_stream() -> AsyncIterator[str]:
+        task = asyncio.create_task(runner())
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n" if format == "sse" else json.dumps({"event": "heartbeat", "request_id": request_id}) + "\n"
+                    continue
+                if event is None:
+                    break
+                yield format_stream_event(event, format)
+        finally:
+            if not task.done():
+                logger.warning(f"[{request_id}] Client disconnected; cancelling analysis")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        event_stream(),
+        media_type=media_type,
+        headers={"X-Request-ID": request_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: AnalyzeRequest):
+    """Queue an analysis and return immediately; poll GET /api/jobs/{job_id}.
+
+    Inline PDFs are saved as uploads first so the persisted job only
+    references the file by upload_id.
+    """
+    if request.upload_id:
+        resolve_upload_path(request.upload_id)
+    elif request.mime_type.lower().startswith("application/pdf"):
+        try:
+            upload_id, _ = await asyncio.to_thread(save_upload_pdf, request.file_base64)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF payload: {str(e)}")
+        request = request.model_copy(update={"file_base64": None, "upload_id": upload_id})
+
+    job = await job_queue.submit(request)
+    return JobSubmitResponse(job_id=job["job_id"], status=JobStatus.QUEUED, request_id=job["request_id"])
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Return a job's state, progress counters and, once finished, its result or error."""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatusResponse(**load_job_status(job))
+
+
+def preview_url(upload_id: str, page_number: int, content_hash: str, width: Optional[int] = None) -> str:
+    """Return the versioned preview URL of an uploaded page."""
+    width = snap_preview_width(width or settings.preview_default_width)
+    return f"/api/uploads/{upload_id}/pages/{page_number}?width={width}&v={content_hash[:16]}"
+
+
 @app.post("/api/upload", response_model=UploadResponse)
 async def upload_pdf(request: UploadRequest):
-    """Accept a base64 PDF, save it securely and return rendered page previews.
+    """Accept a base64 PDF, save it securely and return its page count and metadata.
 
-    Response includes page thumbnails for UI preview with proper error handling.
+    No pages are rendered here; ``pages`` holds preview URLs that are rendered
+    and cached on first request by ``GET /api/uploads/{id}/pages/{n}``.
     """
     request_id = f"req-{uuid4().hex[:12]}"
     
     with RequestTracer(request_id, "upload_pdf"):
-        os.makedirs(settings.upload_dir, exist_ok=True)
-        upload_id = f"up-{uuid4().hex[:8]}"
-        
-        # Sanitize filename to prevent path traversal
-        safe_filename = sanitize_filename(request.filename) if request.filename else f"{upload_id}.pdf"
-        
         # Save the PDF file
         try:
-            header, b64 = request.file_base64.split(",", 1) if "," in request.file_base64 else (None, request.file_base64)
-            pdf_bytes = base64.b64decode(b64)
-            save_path = os.path.join(settings.upload_dir, f"{upload_id}.pdf")
-            with open(save_path, "wb") as f:
-                f.write(pdf_bytes)
+            upload_id, save_path = await asyncio.to_thread(save_upload_pdf, request.file_base64)
+            pdf_source = {"pdf_path": save_path}
             logger.info(f"[{request_id}] Saved PDF: {save_path}")
         except Exception as e:
             logger.error(f"[{request_id}] Failed to save PDF: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to save upload: {str(e)}")
 
-        # Render pages using PDF MCP server
-        base_dir = os.path.dirname(__file__)
-        pages: list[str] = []
-        total_pages = 0
+        # Sanitize filename to prevent path traversal
+        safe_filename = sanitize_filename(request.filename) if request.filename else f"{upload_id}.pdf"
 
         try:
-            async with AsyncExitStack() as stack:
-                pdf_params = StdioServerParameters(
-                    command=sys.executable, 
-                    args=[os.path.join(base_dir, "mcp_servers", "pdf_server.py")]
-                )
-                pdf_read_write = await stack.enter_async_context(stdio_client(pdf_params))
-                pdf_read_stream, pdf_write_stream = pdf_read_write
-                pdf_session = await stack.enter_async_context(ClientSession(pdf_read_stream, pdf_write_stream))
-                await pdf_session.initialize()
-
-                # 1. Get metadata
-                meta_result = await pdf_session.call_tool("split_pdf_metadata", arguments={"pdf_base64": request.file_base64})
-                doc_info = json.loads(meta_result.content[0].text)
-                
+            # Opening parses the PDF in a pooled worker; it stays warm for the preview requests
+            async with pdf_pool.session() as pdf_session, pdf_session.document(pdf_source) as doc_info:
                 if "error" in doc_info:
                     raise HTTPException(status_code=400, detail=f"PDF metadata error: {doc_info['error']}")
-                
-                total_pages = doc_info.get("total_pages", 0)
 
-                # Limit to preview pages
-                max_pages = min(total_pages, settings.max_pages_default)
+            content_hash = doc_info["handle"]
+            await preview_cache.arecord_upload(upload_id, content_hash)
+            total_pages = doc_info.get("total_pages", 0)
 
-                for p in range(1, max_pages + 1):
-                    try:
-                        img_result = await pdf_session.call_tool(
-                            "render_page_for_vision", 
-                            arguments={"pdf_base64": request.file_base64, "page_number": p}
-                        )
-                        img_data = json.loads(img_result.content[0].text)
-                        
-                        if "error" in img_data:
-                            logger.error(f"[{request_id}] Page {p} render error: {img_data['error']}")
-                            continue
-                        
-                        data_url = f"data:image/png;base64,{img_data['image_data']}"
-                        pages.append(data_url)
-                    except Exception as e:
-                        logger.error(f"[{request_id}] Failed to render page {p}: {e}")
-                        # Continue with remaining pages
+            # Limit to preview pages
+            max_pages = min(total_pages, settings.max_pages_default)
 
             return UploadResponse(
                 upload_id=upload_id,
                 filename=safe_filename,
-                pages=pages,
+                pages=[preview_url(upload_id, p, content_hash) for p in range(1, max_pages + 1)],
                 total_pages=total_pages,
+                metadata=doc_info.get("metadata", {}),
+                content_hash=content_hash,
                 request_id=request_id
             )
             
+        except HTTPException:
+            raise
+        except PDFPoolError as e:
+            raise pdf_pool_unavailable(e)
         except Exception as e:
             logger.error(f"[{request_id}] Upload processing failed: {e}")
             raise HTTPException(status_code=500, detail=f"Upload processing failed: {str(e)}")
 
 
+@app.get("/api/uploads/{upload_id}/pages/{page_number}")
+async def get_page_preview(
+    upload_id: str = Path(..., pattern=UPLOAD_ID_PATTERN),
+    page_number: int = Path(..., ge=1),
+    width: Optional[int] = Query(None, ge=32, le=4096, description="Preview width in pixels (snapped up to a cached size)"),
+    v: Optional[str] = Query(None, description="Content hash from the upload response"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Serve a PNG preview of one uploaded page, rendering and caching it on first request.
+
+    URLs carrying the upload's content hash (``v``) are immutable and cached
+    by browsers indefinitely; without it the response is revalidated by ETag.
+    """
+    width = snap_preview_width(width or settings.preview_default_width)
+    pdf_path = resolve_upload_path(upload_id)
+    content_hash = await preview_cache.ahandle_for(upload_id)
+
+    def cache_headers() -> Dict[str, str]:
+        return {
+            "ETag": f'"{content_hash[:16]}-p{page_number}-w{width}"',
+            "Cache-Control": "public, max-age=31536000, immutable" if v == content_hash[:16] else "no-cache"
+        }
+
+    if content_hash and if_none_match == cache_headers()["ETag"]:
+        return Response(status_code=304, headers=cache_headers())
+    cached = await preview_cache.aget(content_hash, page_number, width) if content_hash else None
+
+    if cached is None:
+        try:
+            async with pdf_pool.session() as pdf_session, pdf_session.document({"pdf_path": pdf_path}) as doc_info:
+                if "error" in doc_info:
+                    raise HTTPException(status_code=400, detail=f"PDF metadata error: {doc_info['error']}")
+                if content_hash != doc_info["handle"]:
+                    # Uploads stored before previews were cached by content hash
+                    content_hash = doc_info["handle"]
+                    await preview_cache.arecord_upload(upload_id, content_hash)
+                    cached = await preview_cache.aget(content_hash, page_number, width)
+                if cached is None:
+                    if page_number > doc_info.get("total_pages", 0):
+                        raise HTTPException(status_code=404, detail=f"Page {page_number} not found")
+                    result = await pdf_session.call_tool(
+                        "render_preview",
+                        arguments={
+                            "handle": content_hash,
+                            "page_number": page_number,
+                            "width": width,
+                            "transport": settings.pdf_page_transport
+                        }
+                    )
+                    img_data = json.loads(result.content[0].text)
+                    if "error" in img_data:
+                        raise HTTPException(status_code=500, detail=f"Preview rendering failed: {img_data['error']}")
+                    image = read_rendered_page(img_data)
+                    if isinstance(image, str):
+                        image = base64.b64decode(image.split(",", 1)[1])
+                    cached = await preview_cache.aput(content_hash, page_number, width, image)
+        except HTTPException:
+            raise
+        except PDFPoolError as e:
+            raise pdf_pool_unavailable(e)
+        except Exception as e:
+            logger.error(f"Preview of {upload_id} page {page_number} failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Preview rendering failed: {str(e)}")
+
+    return FileResponse(cached, media_type="image/png", headers=cache_headers())
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Return extraction cache hit/miss counters and occupancy."""
+    if extraction_cache is None:
+        return {"enabled": False}
+    return await asyncio.to_thread(extraction_cache.stats)
+
+
+@app.get("/api/previews/stats")
+async def get_preview_stats():
+    """Return preview cache hit/miss counters and occupancy."""
+    return preview_cache.stats()
+
+
+@app.get("/api/resilience/stats")
+async def get_resilience_stats():
+    """Return circuit breaker state, retry counts and retry budget per provider."""
+    return provider_guard_stats()
+
+
+@app.get("/api/usage/stats")
+async def get_usage_stats():
+    """Return cumulative AI token usage and cost since startup, by stage and model."""
+    return usage_stats()
+
+
 @app.get("/api/model", response_model=ModelStatus)
 async def get_model_status():
     """Return which MODEL_NAME is configured and whether Ollama reports it as loaded."""
-    ollama_url = "http://localhost:11434/v1/models"
+    ollama_url = f"{ai_client.ollama_url}/v1/models"
     try:
-        async with httpx.AsyncClient() as client_http:
-            resp = await client_http.get(ollama_url, timeout=5.0)
-            if resp.status_code != 200:
-                return ModelStatus(
-                    model=MODEL_NAME, 
-                    loaded=False, 
-                    error=f"Ollama returned {resp.status_code}"
-                )
-            body = resp.json()
-            # Ollama may return an object with 'models' or 'data' keys or a list
-            candidates = None
-            if isinstance(body, dict):
-                candidates = body.get('models') or body.get('data') or []
-            elif isinstance(body, list):
-                candidates = body
-            else:
-                candidates = []
+        # Reuse the AI client's keep-alive pool instead of a new connection per poll
+        resp = await ai_client.http_client.get(ollama_url, timeout=5.0)
+        if resp.status_code != 200:
+            return ModelStatus(
+                model=MODEL_NAME, 
+                loaded=False, 
+                error=f"Ollama returned {resp.status_code}"
+            )
+        body = resp.json()
+        # Ollama may return an object with 'models' or 'data' keys or a list
+        candidates = None
+        if isinstance(body, dict):
+            candidates = body.get('models') or body.get('data') or []
+        elif isinstance(body, list):
+            candidates = body
+        else:
+            candidates = []
 
-            loaded = False
-            matched_model = None
-            available = []
-            for m in candidates:
-                if not isinstance(m, dict):
-                    continue
-                mid = (m.get('id') or m.get('name') or '')
-                available.append(mid)
-                # exact or substring match
-                if mid and (MODEL_NAME == mid or MODEL_NAME in mid or mid in MODEL_NAME):
+        loaded = False
+        matched_model = None
+        available = []
+        for m in candidates:
+            if not isinstance(m, dict):
+                continue
+            mid = (m.get('id') or m.get('name') or '')
+            available.append(mid)
+            # exact or substring match
+            if mid and (MODEL_NAME == mid or MODEL_NAME in mid or mid in MODEL_NAME):
+                matched_model = mid
+                loaded = True
+                break
+
+        # Fallback heuristic: look for 'qwen' or 'llama' mentions
+        if not loaded:
+            for mid in available:
+                nm = mid.lower()
+                if 'qwen' in nm and 'qwen' in MODEL_NAME:
+                    matched_model = mid
+                    loaded = True
+                    break
+                if 'llama' in nm and 'llama' in MODEL_NAME:
                     matched_model = mid
                     loaded = True
                     break
 
-            # Fallback heuristic: look for 'qwen' or 'llama' mentions
-            if not loaded:
-                for mid in available:
-                    nm = mid.lower()
-                    if 'qwen' in nm and 'qwen' in MODEL_NAME:
-                        matched_model = mid
-                        loaded = True
-                        break
-                    if 'llama' in nm and 'llama' in MODEL_NAME:
-                        matched_model = mid
-                        loaded = True
-                        break
-
-            return ModelStatus(
-                model=MODEL_NAME, 
-                loaded=loaded, 
-                matched_model=matched_model, 
-                available=available
-            )
+        return ModelStatus(
+            model=MODEL_NAME, 
+            loaded=loaded, 
+            matched_model=matched_model, 
+            available=available
+        )
     except Exception as e:
         return ModelStatus(model=MODEL_NAME, loaded=False, error=str(e))
 
@@ -0,0 +1,165 @@
+"""
+Token and cost accounting for AI provider calls.
+
+``AIClient`` reports the usage metadata of every provider response through
+:func:`record_usage`. Calls are added to process-wide counters (served by
+``/api/usage/stats``) and, when made inside :func:`usage_scope`, to the
+calling request's :class:`UsageTracker` by stage (extraction, reasoning)
+and page. The scope lives in a context variable, so it follows the call into
+tasks and async generators without being passed through every function.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from backend.config import get_settings
+
+
+class TokenCounts:
+    """Running token, call and cost totals."""
+
+    __slots__ = ("prompt_tokens", "completion_tokens", "calls", "estimated_calls", "cost_usd")
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self.estimated_calls = 0
+        self.cost_usd = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost_usd: float, estimated: bool, calls: int = 1) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.calls += calls
+        self.estimated_calls += calls if estimated else 0
+        self.cost_usd += cost_usd
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "calls": self.calls,
+            "estimated_calls": self.estimated_calls,
+            "cost_usd": round(self.cost_usd, 6)
+        }
+
+
+class UsageTracker:
+    """Token usage of one analysis request, in total, by stage and by page.
+
+    A call covering several pages (a batched vision call) is split evenly
+    between them, so page totals add up to the extraction stage.
+    """
+
+    def __init__(self):
+        self.total = TokenCounts()
+        self.stages: Dict[str, TokenCounts] = {}
+        self.pages: Dict[int, TokenCounts] = {}
+        _cumulative["requests"] += 1
+
+    def add(
+        self,
+        stage: str,
+        pages: List[int],
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost_usd: float,
+        estimated: bool
+    ) -> None:
+        self.total.add(prompt_tokens, completion_tokens, cost_usd, estimated)
+        self.stages.setdefault(stage, TokenCounts()).add(prompt_tokens, completion_tokens, cost_usd, estimated)
+        for i, page in enumerate(pages):
+            # Integer split; the first pages absorb the remainder
+            self.pages.setdefault(page, TokenCounts()).add(
+                prompt_tokens // len(pages) + (i < prompt_tokens % len(pages)),
+                completion_tokens // len(pages) + (i < completion_tokens % len(pages)),
+                cost_usd / len(pages),
+                estimated,
+                calls=1 if i == 0 else 0
+            )
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.as_dict(),
+            "stages": {stage: counts.as_dict() for stage, counts in self.stages.items()},
+            "pages": {page: counts.as_dict() for page, counts in sorted(self.pages.items())}
+        }
+
+
+class UsageScope(NamedTuple):
+    tracker: Optional[UsageTracker]
+    stage: Optional[str]
+    pages: List[int]
+
+
+_scope: contextvars.ContextVar[UsageScope] = contextvars.ContextVar(
+    "usage_scope", default=UsageScope(None, None, [])
+)
+
+_cumulative: Dict[str, Any] = {
+    "since": time.time(),
+    "requests": 0,
+    "total": TokenCounts(),
+    "stages": {},
+    "models": {}
+}
+
+
+@contextmanager
+def usage_scope(
+    tracker: Optional[UsageTracker] = None,
+    stage: Optional[str] = None,
+    pages: Optional[List[int]] = None
+) -> Iterator[UsageScope]:
+    """Attribute AI calls made inside the block to a request, stage and pages (unset fields are inherited)."""
+    parent = _scope.get()
+    scope = UsageScope(
+        tracker or parent.tracker,
+        stage or parent.stage,
+        list(pages) if pages is not None else parent.pages
+    )
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def call_cost(provider: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Return the price in USD of a call at the provider's configured per-million-token rates."""
+    input_price, output_price = get_settings().token_prices(provider)
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def record_usage(
+    provider: str,
+    model: str,
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    estimated: bool = False
+) -> None:
+    """Count one provider response's tokens globally and for the current usage scope."""
+    prompt_tokens = int(prompt_tokens or 0)
+    completion_tokens = int(completion_tokens or 0)
+    cost = call_cost(provider, prompt_tokens, completion_tokens)
+    scope = _scope.get()
+    stage = scope.stage or "other"
+
+    _cumulative["total"].add(prompt_tokens, completion_tokens, cost, estimated)
+    _cumulative["stages"].setdefault(stage, TokenCounts()).add(prompt_tokens, completion_tokens, cost, estimated)
+    _cumulative["models"].setdefault(f"{provider}/{model}", TokenCounts()).add(prompt_tokens, completion_tokens, cost, estimated)
+    if scope.tracker is not None:
+        scope.tracker.add(stage, scope.pages, prompt_tokens, completion_tokens, cost, estimated)
+
+
+def usage_stats() -> Dict[str, Any]:
+    """Return cumulative token usage since the process started."""
+    return {
+        "since": _cumulative["since"],
+        "requests": _cumulative["requests"],
+        "total": _cumulative["total"].as_dict(),
+        "stages": {stage: counts.as_dict() for stage, counts in _cumulative["stages"].items()},
+        "models": {model: counts.as_dict() for model, counts in _cumulative["models"].items()}
+    }
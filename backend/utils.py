@@ -1,6 +1,7 @@
 """
 Utilities for error handling, retry logic, structured logging, and JSON repair.
 """
+import asyncio
 import json
 import logging
 import time
@@ -31,6 +32,12 @@ SQFT_PER_PERSON = 600  # Typical square feet per person
 TYPICAL_CFM_PER_TON = 400  # Typical airflow per ton for residential cooling
 TYPICAL_SENSIBLE_LATENT_SPLIT = 0.75  # 75% sensible, 25% latent for cooling
 
+# Extraction order of classified sheets (lower first); categories missing here are skipped
+PAGE_CATEGORY_PRIORITY = {
+    "prioritize": {"schedule": 0, "mechanical": 0, "unknown": 1, "general": 2, "cover": 2, "non_mechanical": 3},
+    "mechanical_only": {"schedule": 0, "mechanical": 0, "unknown": 1}
+}
+
 # Configure structured logging
 logging.basicConfig(
     level=logging.INFO,
@@ -100,7 +107,8 @@ def retry_with_backoff(
     backoff_factor: float = 2.0,
     jitter: bool = True,
     exceptions: tuple = (Exception,),
-    exclude_exceptions: tuple = ()
+    exclude_exceptions: tuple = (),
+    guard: Optional[Any] = None
 ):
     """
     Decorator for retry logic with exponential backoff and optional jitter.
@@ -112,6 +120,9 @@ def retry_with_backoff(
         jitter: Add random jitter to prevent thundering herd (default: True)
         exceptions: Tuple of exception types to catch and retry
         exclude_exceptions: Tuple of exception types to NOT retry (fail immediately)
+        guard: Optional ProviderGuard (backend.resilience) whose circuit breaker
+            gates each attempt and whose shared budget must grant each retry;
+            only outages (connection errors, timeouts, 5xx) count as breaker failures
     """
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
         @wraps(func)
@@ -120,29 +131,48 @@ def retry_with_backoff(
             last_exception = None
             
             for attempt in range(max_retries + 1):
+                if guard is not None:
+                    # Raises CircuitOpenError while the provider is unhealthy
+                    guard.before_call()
                 try:
-                    return await func(*args, **kwargs)
+                    result = await func(*args, **kwargs)
                 except exclude_exceptions as e:
                     # These exceptions should not be retried - fail fast
+                    if guard is not None:
+                        # The provider answered, so it counts as healthy
+                        guard.record_success()
                     logger.error(
                         f"Non-retryable error in {func.__name__}: {e}. Failing immediately."
                     )
                     raise
                 except exceptions as e:
                     last_exception = e
+                    if guard is not None:
+                        guard.record_failure(e)
                     if attempt < max_retries:
+                        if guard is not None and not guard.acquire_retry():
+                            break
                         # Add jitter: random value between 0 and delay
                         actual_delay = delay * (1 + random.random()) if jitter else delay
                         logger.warning(
                             f"Attempt {attempt + 1}/{max_retries + 1} failed for {func.__name__}: {e}. "
                             f"Retrying in {actual_delay:.1f}s..."
                         )
-                        time.sleep(actual_delay)
+                        # Non-blocking: other requests keep running during backoff
+                        await asyncio.sleep(actual_delay)
                         delay *= backoff_factor
                     else:
                         logger.error(
                             f"All {max_retries + 1} attempts exhausted for {func.__name__}: {e}"
                         )
+                except BaseException:
+                    if guard is not None:
+                        guard.record_abandoned()
+                    raise
+                else:
+                    if guard is not None:
+                        guard.record_success()
+                    return result
             
             raise last_exception
         
@@ -179,7 +209,6 @@ def retry_with_backoff(
             raise last_exception
         
         # Return appropriate wrapper based on function type
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         else:
@@ -255,6 +284,61 @@ def repair_json(raw_json: str) -> Optional[Dict[str, Any]]:
     return None
 
 
+class JsonObjectStop:
+    """
+    Stop condition for streamed generation: true once a balanced top-level JSON object has closed.
+
+    Fed one chunk at a time, it tracks brace depth (ignoring braces inside JSON strings) from the
+    first '{'. When the depth returns to zero the candidate is parsed; narrative text that merely
+    contains braces, or an object without required_keys, does not stop generation.
+    The parsed object is kept in ``result``.
+    """
+
+    def __init__(self, required_keys: Optional[List[str]] = None):
+        self.required_keys = required_keys or []
+        self.result: Optional[Dict[str, Any]] = None
+        self._candidate: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def __call__(self, chunk: str) -> bool:
+        if self.result is not None:
+            return True
+        for ch in chunk:
+            if self._depth == 0:
+                if ch != "{":
+                    continue
+                self._candidate = []
+            self._candidate.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._accept("".join(self._candidate)):
+                    return True
+        return False
+
+    def _accept(self, candidate: str) -> bool:
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(parsed, dict) or any(k not in parsed for k in self.required_keys):
+            return False
+        self.result = parsed
+        return True
+
+
 def validate_json_schema(data: Dict[str, Any], required_keys: list[str]) -> bool:
     """
     Validate that JSON contains required keys.
@@ -1312,6 +1396,155 @@ def truncate_to_token_limit(text: str, max_tokens: int = 32000) -> str:
     return truncated
 
 
+def merge_tile_extractions(tiles: List[tuple]) -> str:
+    """
+    Merge per-tile extractions of one page, dropping text duplicated by tile overlap.
+    
+    Neighbouring tiles share an overlap band, so a label near an edge is read
+    twice, once whole and sometimes once cut off. A line is dropped when an
+    adjacent tile (including diagonals) has the same line earlier in reading
+    order, or a longer line containing it. Identical lines in tiles that do not
+    touch are kept, since drawings legitimately repeat labels.
+    
+    Args:
+        tiles: (row, col, text) for each tile
+        
+    Returns:
+        Merged page text with one section per tile region
+    """
+    def normalize(line: str) -> str:
+        return " ".join(line.lower().split())
+    
+    ordered = sorted(tiles, key=lambda t: (t[0], t[1]))
+    tile_lines = [
+        [(line.rstrip(), normalize(line)) for line in (text or "").splitlines() if normalize(line)]
+        for _, _, text in ordered
+    ]
+    
+    sections = []
+    dropped = 0
+    for i, (row, col, _) in enumerate(ordered):
+        neighbours = [
+            (j, {norm for _, norm in tile_lines[j]})
+            for j, (other_row, other_col, _) in enumerate(ordered)
+            if j != i and abs(other_row - row) <= 1 and abs(other_col - col) <= 1
+        ]
+        kept = []
+        for line, norm in tile_lines[i]:
+            duplicate = False
+            for j, norms in neighbours:
+                if (norm in norms and j < i) or any(norm != other and len(norm) >= 4 and norm in other for other in norms):
+                    duplicate = True
+                    break
+            if duplicate:
+                dropped += 1
+            else:
+                kept.append(line)
+        if kept:
+            sections.append(f"[REGION row {row + 1}, col {col + 1}]\n" + "\n".join(kept))
+    
+    if dropped:
+        logger.info(f"Tile merge dropped {dropped} overlapping lines from {len(ordered)} tiles")
+    return "\n\n".join(sections)
+
+
+def merge_region_extractions(regions: List[tuple]) -> str:
+    """
+    Join per-region extractions of one cropped page under a heading per region.
+    
+    Args:
+        regions: (kind, text) for each region crop, in reading order
+        
+    Returns:
+        Page text with a [SCHEDULE 1] / [NOTES] / [TITLE BLOCK] style section per region
+    """
+    totals: Dict[str, int] = {}
+    for kind, _ in regions:
+        totals[kind] = totals.get(kind, 0) + 1
+    
+    seen: Dict[str, int] = {}
+    sections = []
+    for kind, text in regions:
+        seen[kind] = seen.get(kind, 0) + 1
+        label = kind.replace("_", " ").upper()
+        if totals[kind] > 1:
+            label = f"{label} {seen[kind]}"
+        if text and text.strip():
+            sections.append(f"[{label}]\n{text.strip()}")
+    return "\n\n".join(sections)
+
+
+BATCH_PAGE_DELIMITER = re.compile(r"^[\s#*]*=+\s*PAGE\s+(\d+)\s*=+[\s*]*$", re.IGNORECASE | re.MULTILINE)
+
+
+def split_batched_extraction(text: str, page_numbers: List[int]) -> Optional[Dict[int, str]]:
+    """
+    Split a multi-page extraction on its "=== PAGE n ===" delimiter lines.
+    
+    The split is all or nothing: every requested page must appear exactly once,
+    in order, with non-empty text, or None is returned so the caller can fall
+    back to one call per page.
+    
+    Args:
+        text: Raw output of a batched vision call
+        page_numbers: Pages in the order their images were sent
+        
+    Returns:
+        Page number -> extracted text, or None if the output can't be attributed to pages
+    """
+    matches = list(BATCH_PAGE_DELIMITER.finditer(text or ""))
+    if [int(m.group(1)) for m in matches] != list(page_numbers):
+        return None
+    pages = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        page_text = text[match.end():end].strip()
+        if not page_text:
+            return None
+        pages[int(match.group(1))] = page_text
+    return pages
+
+
+def plan_page_order(
+    classifications: Dict[int, Dict[str, Any]],
+    mode: str,
+    max_pages: int
+) -> tuple:
+    """
+    Choose which classified pages to extract, and in what order.
+    
+    Pages are ordered by their category's priority under mode (see
+    PAGE_CATEGORY_PRIORITY), then by page number, and the first max_pages are
+    kept. Pages that failed classification are treated as unknown.
+    
+    Args:
+        classifications: page number -> classify_pages result
+        mode: "prioritize" or "mechanical_only"
+        max_pages: Maximum pages to extract
+        
+    Returns:
+        (page numbers to extract in order, {skipped page number: reason})
+    """
+    priorities = PAGE_CATEGORY_PRIORITY[mode]
+    candidates = []
+    skipped = {}
+    for page_number, classification in sorted(classifications.items()):
+        category = classification.get("category", "unknown")
+        if category in priorities:
+            candidates.append((priorities[category], page_number))
+        elif category == "blank":
+            skipped[page_number] = "blank page"
+        else:
+            sheet = classification.get("sheet_number")
+            skipped[page_number] = f"{category} sheet" + (f" {sheet}" if sheet else "")
+    
+    candidates.sort()
+    for _, page_number in candidates[max_pages:]:
+        skipped[page_number] = "over max_pages (lower priority)"
+    order = [page_number for _, page_number in candidates[:max_pages]]
+    return order, dict(sorted(skipped.items()))
+
+
 def log_model_interaction(
     request_id: str,
     model: str,
@@ -13,6 +13,19 @@ import { ToastContainer, ToastMsg, ToastType } from "./components/Toasts";
 import { GlobalSettingsModal } from "./components/GlobalSettingsModal";
 import { ConfirmationModal } from "./components/ConfirmationModal";
 
+// Fetch a backend page preview URL at analysis resolution as a data URL
+const fetchPageAsDataUrl = async (url: string): Promise<string> => {
+  const resp = await fetch(url.replace(/([?&])width=\d+/, '$1width=1280'));
+  if (!resp.ok) throw new Error(`Page preview request failed (${resp.status})`);
+  const blob = await resp.blob();
+  return new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => resolve(reader.result as string);
+    reader.onerror = () => reject(reader.error);
+    reader.readAsDataURL(blob);
+  });
+};
+
 const NavItem = ({ active, onClick, icon, tooltip }: { active: boolean, onClick: () => void, icon: React.ReactNode, tooltip: string }) => (
     <button 
         onClick={onClick}
@@ -275,7 +288,7 @@ export const App = () => {
       addToast("Project Updated", "Changes saved successfully.", 'success');
   };
 
-  const processImageUpload = (pages: string[], fileName: string, targetProjectId: string) => {
+  const processImageUpload = (pages: string[], fileName: string, targetProjectId: string, uploadId?: string) => {
       if (pages.length === 0) return;
 
       const newBlueprint: Blueprint = {
@@ -286,7 +299,8 @@ export const App = () => {
           uploadedBy: 'Lead Engineer',
           uploadedAt: 'Just now',
           imageData: pages[0], // Preview is the first page
-          pages: pages // Store all pages
+          pages: pages, // Store all pages
+          uploadId
       };
 
       projectDatabase.saveBlueprint(targetProjectId, newBlueprint);
@@ -337,9 +351,10 @@ export const App = () => {
                         return;
                     }
 
-                    const pages: string[] = data.pages || [];
-                    processImageUpload(pages.length ? pages : [base64], file.name, targetProjectId);
-                    addToast('Upload Complete', `Rendered ${pages.length} page(s).`, 'success');
+                    // Preview URLs are rendered lazily by the backend and cached by the browser
+                    const pages: string[] = (data.pages || []).map((url: string) => `http://localhost:8000${url}`);
+                    processImageUpload(pages.length ? pages : [base64], file.name, targetProjectId, data.upload_id);
+                    addToast('Upload Complete', `${data.total_pages} page(s) ready.`, 'success');
                 } catch (err) {
                     console.error(err);
                     addToast('Upload Failed', 'Could not process PDF upload.', 'error');
@@ -419,9 +434,11 @@ export const App = () => {
             setIsProcessing(true);
             addToast("Detection Analysis", `Extracting topology using ${activeModelId === AI_MODELS.FLASH.id ? 'Flash (Speed)' : 'Pro (Reasoning)'}...`, 'info');
             
-            const matches = uploadedImage.match(/^data:(.+);base64,(.+)$/);
+            // PDF pages are preview URLs; the vision stages need the image inline
+            const pageImage = uploadedImage.startsWith('data:') ? uploadedImage : await fetchPageAsDataUrl(uploadedImage);
+            const matches = pageImage.match(/^data:(.+);base64,(.+)$/);
             const mimeType = matches ? matches[1] : 'image/png';
-            const base64Data = matches ? matches[2] : uploadedImage.split(',')[1];
+            const base64Data = matches ? matches[2] : pageImage.split(',')[1];
 
             if (controller.signal.aborted) throw new Error("Cancelled");
             const extractionResult = await stage1Extraction(base64Data, mimeType, activeModelId);
@@ -462,7 +479,8 @@ export const App = () => {
             addToast("Report Generation", "Generating forensic engineering report...", 'info');
             
             if (controller.signal.aborted) throw new Error("Cancelled");
-            const analysisResult = await stage2Analysis(base64Data, mimeType, extractedComponents, activeModelId);
+            // A single-page PDF is analyzed from the stored upload rather than its preview image
+            const analysisResult = await stage2Analysis(base64Data, mimeType, extractedComponents, activeModelId, currentBlueprint.uploadId);
             if (controller.signal.aborted) throw new Error("Cancelled");
 
             setAiAnalysis(analysisResult.analysisReport);
@@ -482,7 +500,7 @@ export const App = () => {
             for (let i = 0; i < documentPages.length; i++) {
                 if (controller.signal.aborted) throw new Error("Cancelled");
                 
-                const pageImage = documentPages[i];
+                const pageImage = documentPages[i].startsWith('data:') ? documentPages[i] : await fetchPageAsDataUrl(documentPages[i]);
                 const matches = pageImage.match(/^data:(.+);base64,(.+)$/);
                 const mimeType = matches ? matches[1] : 'image/png';
                 const base64Data = matches ? matches[2] : pageImage.split(',')[1];
@@ -76,7 +76,8 @@ export const analyzeDocument = async (
   fileBase64: string,
   mimeType: string,
   onLog: (msg: string) => void,
-  quality: PDFQuality = 'balanced'
+  quality: PDFQuality = 'balanced',
+  uploadId?: string
 ): Promise<AnalysisReport> => {
   onLog?.(`🚀 Sending to local backend for vision+reasoning (quality: ${quality})...`);
 
@@ -84,12 +85,10 @@ export const analyzeDocument = async (
   const timeoutId = setTimeout(() => controller.abort(), REQUEST_TIMEOUT);
 
   try {
-    const requestBody: AnalyzeRequest = {
-      file_base64: fileBase64,
-      mime_type: mimeType,
-      max_pages: 20,
-      quality
-    };
+    // Reference an already-uploaded PDF instead of re-sending it when possible
+    const requestBody: AnalyzeRequest = uploadId
+      ? { upload_id: uploadId, max_pages: 20, quality }
+      : { file_base64: fileBase64, mime_type: mimeType, max_pages: 20, quality };
 
     const resp = await fetch(BACKEND_URL, {
       method: 'POST',
@@ -228,7 +227,8 @@ export const stage2Analysis = async (
   base64Image: string,
   mimeType: string,
   detectedComponents: DetectedComponent[],
-  modelId: string = AI_MODELS.FLASH.id
+  modelId: string = AI_MODELS.FLASH.id,
+  uploadId?: string
 ): Promise<AnalysisReportResult> => {
   const localIds = ['llama3.1', 'qwen2.5-vl', 'qwen2-vl', 'ollama-llama3.1', AI_MODELS.LOCAL_OLLAMA.id];
 
@@ -237,7 +237,7 @@ export const stage2Analysis = async (
   // models such as Gemini, delegate to the same backend analyze endpoint so the server
   // (which is configured with AI_PROVIDER) can route to Gemini.
   try {
-    const report = await analyzeDocument(base64Image, mimeType, (m) => console.debug('[backend]', m));
+    const report = await analyzeDocument(base64Image, mimeType, (m) => console.debug('[backend]', m), 'balanced', uploadId);
     return { analysisReport: report.content };
   } catch (err) {
     console.error('stage2Analysis: failed to analyze via backend', err);
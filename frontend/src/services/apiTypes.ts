@@ -5,13 +5,25 @@
 
 export type ComplianceStatus = 'COMPLIANT' | 'NON_COMPLIANT' | 'REVIEW_REQUIRED';
 
-export type PDFQuality = 'fast' | 'balanced' | 'detailed' | 'ultra';
+export type PDFQuality = 'fast' | 'balanced' | 'detailed' | 'ultra' | 'auto';
+
+export interface ImageEncoding {
+  format?: 'png' | 'jpeg' | 'webp';
+  color?: 'rgb' | 'gray' | 'bilevel' | 'palette';
+  quality?: number; // JPEG/WebP 1-100
+  png_compression?: number; // 0-9
+}
 
 export interface AnalyzeRequest {
-  file_base64: string;
-  mime_type: string;
+  // Provide either file_base64 (+ mime_type) or upload_id from /api/upload
+  file_base64?: string;
+  mime_type?: string;
+  upload_id?: string;
   max_pages?: number;
   quality?: PDFQuality;
+  image_encoding?: ImageEncoding;
+  page_classification?: 'off' | 'prioritize' | 'mechanical_only';
+  previous_upload_id?: string; // earlier upload of the same set; unchanged pages reuse its results
 }
 
 export interface UploadRequest {
@@ -88,13 +100,49 @@ export interface AnalyzeResponse {
   request_id: string;
   pages_processed: number;
   processing_time_seconds?: number;
+  page_zoom_factors?: Record<string, number>; // page number -> render zoom
+  page_sources?: Record<string, 'text_layer' | 'text_layer_verified' | 'vision' | 'duplicate' | 'reused'>;
+  page_image_stats?: Record<string, {
+    mime_type: string;
+    byte_size: number;
+    encode_ms: number;
+    // Region-of-interest crops sent instead of the whole page (rect in PDF points)
+    regions?: { kind: 'schedule' | 'notes' | 'legend' | 'title_block'; rect: number[]; width: number; height: number }[];
+  }>;
+  deduplicated_pages?: Record<string, { source: 'page' | 'cache'; duplicate_of?: number; similarity: number }>;
+  page_classifications?: Record<string, {
+    category: 'blank' | 'cover' | 'general' | 'mechanical' | 'schedule' | 'non_mechanical' | 'unknown';
+    sheet_number: string | null;
+    ink_coverage: number;
+    char_count: number;
+    reasons: string[];
+  }>;
+  skipped_pages?: Record<string, string>;
+  reused_pages?: Record<string, { previous_page: number; method: 'content_hash' | 'page_diff'; changed_fraction: number }>;
+  reextracted_pages?: number[];
+  token_usage?: {
+    total: TokenUsage;
+    stages: Record<string, TokenUsage>; // extraction, reasoning
+    pages: Record<string, TokenUsage>;
+  };
+}
+
+export interface TokenUsage {
+  prompt_tokens: number;
+  completion_tokens: number;
+  total_tokens: number;
+  calls: number;
+  estimated_calls: number; // counts estimated because a stopped stream never received them
+  cost_usd: number;
 }
 
 export interface UploadResponse {
   upload_id: string;
   filename: string;
-  pages: string[];
+  pages: string[]; // preview URLs, GET /api/uploads/{id}/pages/{n}?width=&v=
   total_pages: number;
+  metadata?: Record<string, unknown>;
+  content_hash?: string;
   request_id: string;
 }
 
@@ -8,6 +8,7 @@ export type Blueprint = {
   uploadedAt?: string;
   imageData?: string; // Base64 data for the cover/first page preview
   pages?: string[];   // Array of Base64 strings for multi-page PDFs
+  uploadId?: string;  // /api/upload id of a PDF; analyses reference it instead of re-sending the file
   detectedComponents?: DetectedComponent[];
   analysisText?: string;
 };
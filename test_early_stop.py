@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed generation that stops once the report JSON object closes.
+"""
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from backend.config import get_settings
+from backend.utils import JsonObjectStop
+
+REPORT_KEYS = ["project_info", "load_calculations"]
+NARRATIVE = 'SECTION 1: Supply {main trunk} serves "zone {A}" rooms.\n'
+REPORT = '{"project_info": {"project_name": "Shop {North}"}, "load_calculations": {"total_heating_load": 42000}}'
+
+
+def chunks_of(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_json_object_stop():
+    """Test detection of a closed top-level object across arbitrary chunk boundaries."""
+    print("\n=== Testing JSON Object Stop Condition ===")
+
+    report_end = len(NARRATIVE + '{"partial": 1}\n' + REPORT)
+    text = NARRATIVE + '{"partial": 1}\n' + REPORT + "\n\nAdditional notes the model kept writing..."
+    for size in (1, 3, 7, 64):
+        stop = JsonObjectStop(REPORT_KEYS)
+        consumed = ""
+        for chunk in chunks_of(text, size):
+            consumed += chunk
+            if stop(chunk):
+                break
+        else:
+            raise AssertionError(f"never stopped with chunk size {size}")
+        assert stop.result["load_calculations"]["total_heating_load"] == 42000
+        assert report_end <= len(consumed) < report_end + size, (size, consumed)
+    print("✓ Stops right after the report closes; narrative braces and objects without the keys are ignored")
+
+    stop = JsonObjectStop(REPORT_KEYS)
+    assert not any(stop(c) for c in chunks_of(NARRATIVE + REPORT[:-1], 5)) and stop.result is None
+    print("✓ An unfinished object never stops generation")
+
+
+def test_stream_is_closed_early():
+    """Test that AIClient stops reading the provider stream once the stop condition holds."""
+    print("\n=== Testing Early Stop in AIClient ===")
+
+    pieces = chunks_of(NARRATIVE + REPORT, 16) + ["\n\nTrailing commentary"] * 200
+    pulled = []
+
+    async def body():
+        for piece in pieces:
+            pulled.append(piece)
+            yield (json.dumps({"message": {"content": piece}, "done": False}) + "\n").encode()
+        yield (json.dumps({"message": {"content": ""}, "done": True}) + "\n").encode()
+
+    def handler(request):
+        return httpx.Response(200, content=body())
+
+    settings = get_settings()
+    saved = settings.ai_provider, settings.ollama_api_mode
+    settings.ai_provider, settings.ollama_api_mode = "ollama", "native"
+    try:
+        from backend.ai_client import AIClient
+        client = AIClient()
+    finally:
+        settings.ai_provider, settings.ollama_api_mode = saved
+    client.http_client._transport = httpx.MockTransport(handler)
+
+    async def scenario():
+        stop = JsonObjectStop(REPORT_KEYS)
+        text = await client.generate_text("report", stop=stop)
+        await client.aclose()
+        return text, stop
+
+    text, stop = asyncio.run(scenario())
+    assert stop.result is not None and "Trailing" not in text, text
+    assert len(pulled) < len(pieces) // 10, f"read {len(pulled)} of {len(pieces)} chunks"
+    print(f"✓ Read {len(pulled)} of {len(pieces)} streamed chunks before closing the stream")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("EARLY STOP TEST SUITE")
+    print("="*60)
+
+    try:
+        test_json_object_stop()
+        test_stream_is_closed_early()
+
+        print("\n✅ ALL EARLY STOP TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
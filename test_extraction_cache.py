@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed per-page extraction cache.
+Verifies key derivation, hit/miss accounting and LRU eviction.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.extraction_cache import ExtractionCache, make_cache_key, digest_image_payload
+
+
+def test_cache_key_components():
+    """Test that every key component changes the content address."""
+    print("\n=== Testing Cache Key Derivation ===")
+
+    digest = digest_image_payload("data:image/png;base64,AAAA")
+    assert digest == digest_image_payload("AAAA"), "Data URL header must not affect the digest"
+    base = make_cache_key(digest, "prompt", "qwen2.5vl", 2.0, 0.0)
+
+    assert base == make_cache_key(digest, "prompt", "qwen2.5vl", 2.0, 0.0)
+    assert base != make_cache_key(digest_image_payload("BBBB"), "prompt", "qwen2.5vl", 2.0, 0.0)
+    assert base != make_cache_key(digest, "other prompt", "qwen2.5vl", 2.0, 0.0)
+    assert base != make_cache_key(digest, "prompt", "gemini-2.0-flash-exp", 2.0, 0.0)
+    assert base != make_cache_key(digest, "prompt", "qwen2.5vl", 3.0, 0.0)
+    assert base != make_cache_key(digest, "prompt", "qwen2.5vl", 2.0, 0.1)
+    assert base != make_cache_key(digest, "prompt", "qwen2.5vl", None, 0.0)
+    print("✓ Image, prompt, model, zoom and temperature all feed the key")
+
+
+def test_cache_hits_and_misses():
+    """Test get/put round trip and counters."""
+    print("\n=== Testing Cache Hits and Misses ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(os.path.join(tmp, "cache.sqlite3"), max_bytes=1024 * 1024, max_entries=100)
+        assert cache.get("missing") is None
+        cache.put("k1", "FURNACE 80,000 BTU/H")
+        assert cache.get("k1") == "FURNACE 80,000 BTU/H"
+        cache.put("empty", "")
+        assert cache.get("empty") is None, "Empty extractions must not be cached"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["entries"] == 1
+        print(f"✓ Counters: {stats['hits']} hit(s), {stats['misses']} miss(es)")
+
+        # Entries survive a reopen of the same file
+        reopened = ExtractionCache(os.path.join(tmp, "cache.sqlite3"), max_bytes=1024 * 1024, max_entries=100)
+        assert reopened.get("k1") == "FURNACE 80,000 BTU/H"
+        print("✓ Entries persist across cache instances")
+
+
+def test_cache_lru_eviction():
+    """Test least-recently-used eviction by entry count and by size."""
+    print("\n=== Testing LRU Eviction ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(os.path.join(tmp, "cache.sqlite3"), max_bytes=1024 * 1024, max_entries=2)
+        cache.put("a", "page a")
+        time.sleep(0.01)
+        cache.put("b", "page b")
+        time.sleep(0.01)
+        cache.get("a")  # refresh a so b becomes least recently used
+        time.sleep(0.01)
+        cache.put("c", "page c")
+        assert cache.get("a") == "page a"
+        assert cache.get("b") is None
+        assert cache.get("c") == "page c"
+        print("✓ Entry-count eviction drops the least recently used page")
+
+        sized = ExtractionCache(os.path.join(tmp, "sized.sqlite3"), max_bytes=25, max_entries=100)
+        sized.put("x", "x" * 10)
+        time.sleep(0.01)
+        sized.put("y", "y" * 10)
+        time.sleep(0.01)
+        sized.put("z", "z" * 10)
+        assert sized.stats()["size_bytes"] <= 25
+        assert sized.get("x") is None
+        assert sized.stats()["evictions"] == 1
+        print("✓ Size-based eviction keeps the cache within its byte budget")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("EXTRACTION CACHE TEST SUITE")
+    print("="*60)
+
+    try:
+        test_cache_key_components()
+        test_cache_hits_and_misses()
+        test_cache_lru_eviction()
+
+        print("\n✅ ALL EXTRACTION CACHE TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
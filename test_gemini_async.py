@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for native async Gemini calls, the bounded executor fallback and cancellation.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from backend.config import get_settings
+
+
+def make_gemini_client(sdk_client, workers=4):
+    """A Gemini AIClient talking to a fake SDK client."""
+    settings = get_settings()
+    saved = settings.ai_provider, settings.gemini_api_key, settings.gemini_executor_workers
+    settings.ai_provider, settings.gemini_api_key, settings.gemini_executor_workers = "gemini", "test-key", workers
+    try:
+        from backend.ai_client import AIClient
+        client = AIClient()
+    finally:
+        settings.ai_provider, settings.gemini_api_key, settings.gemini_executor_workers = saved
+    client.client = sdk_client
+    return client
+
+
+class AsyncModels:
+    """Fake `client.aio.models` that records calls and can hang until cancelled."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return SimpleNamespace(text=f"async:{model}")
+
+
+class SyncModels:
+    """Fake sync `client.models` that records which threads served it."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.threads = []
+
+    def generate_content(self, model, contents, config):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(self.delay)
+        return SimpleNamespace(text="sync")
+
+
+def test_native_async_calls():
+    """Test that Gemini calls use the SDK's async client without any thread pool."""
+    print("\n=== Testing Native Async Gemini ===")
+
+    models = AsyncModels()
+    client = make_gemini_client(SimpleNamespace(aio=SimpleNamespace(models=models)))
+
+    async def scenario():
+        text = await client.generate_text("x")
+        image = await client.generate_with_image("x", image_bytes=b"png")
+        await client.aclose()
+        return text, image
+
+    assert asyncio.run(scenario()) == ("async:" + client.model_name,) * 2
+    assert models.calls == 2 and client.gemini_executor is None
+    print("✓ Text and image calls went through client.aio")
+
+
+def test_executor_fallback_is_bounded():
+    """Test the dedicated executor: bounded size, and queued calls dropped on cancel."""
+    print("\n=== Testing Gemini Executor Fallback ===")
+
+    models = SyncModels(delay=0.2)
+    client = make_gemini_client(SimpleNamespace(models=models), workers=2)
+
+    async def scenario():
+        tasks = [asyncio.create_task(client.generate_text(f"p{i}")) for i in range(6)]
+        await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.3)
+        done = await client.generate_text("after")
+        await client.aclose()
+        return done
+
+    assert asyncio.run(scenario()) == "sync"
+    assert len(models.threads) == 3, models.threads
+    assert all(name.startswith("gemini") for name in models.threads), models.threads
+    print(f"✓ 2 workers ran {len(models.threads) - 1} of 6 cancelled calls; queued ones were dropped")
+
+
+def test_disconnect_cancels_calls():
+    """Test that a client disconnect cancels Gemini calls still in flight."""
+    print("\n=== Testing Cancellation on Disconnect ===")
+
+    from fastapi import HTTPException
+    from backend import server
+
+    models = AsyncModels(delay=30.0)
+    client = make_gemini_client(SimpleNamespace(aio=SimpleNamespace(models=models)))
+
+    class Disconnecting:
+        async def is_disconnected(self):
+            return models.calls == 3
+
+    async def work():
+        return await asyncio.gather(*(client.generate_text(f"page {i}") for i in range(3)))
+
+    async def scenario():
+        server.DISCONNECT_POLL_SECONDS, poll = 0.05, server.DISCONNECT_POLL_SECONDS
+        try:
+            await server.cancel_on_disconnect(Disconnecting(), work(), "req-test")
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            server.DISCONNECT_POLL_SECONDS = poll
+            await client.aclose()
+
+    started = time.monotonic()
+    assert asyncio.run(scenario()) == 499
+    assert models.cancelled == 3 and time.monotonic() - started < 5
+    print("✓ All 3 in-flight Gemini calls were cancelled")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("GEMINI ASYNC TEST SUITE")
+    print("="*60)
+
+    try:
+        test_native_async_calls()
+        test_executor_fallback_is_bounded()
+        test_disconnect_cancels_calls()
+
+        print("\n✅ ALL GEMINI ASYNC TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for vision payload encodings of rendered pages.
+"""
+import os
+import sys
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+from pdf_server import IMAGE_COLOR_MODES, IMAGE_FORMATS, _pixmap_colorspace, encode_pixmap
+
+MAGIC = {"png": b"\x89PNG", "jpeg": b"\xff\xd8\xff", "webp": b"RIFF"}
+
+
+def make_drawing_page():
+    """A black-on-white line drawing page like most blueprint sheets."""
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(40):
+        page.draw_line((36, 40 + i * 18), (560, 40 + i * 18))
+        page.insert_text((40, 36 + i * 18), f"SUPPLY DUCT {i} 12x8 400 CFM", fontsize=6)
+    return doc, page
+
+
+def have_pillow() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def test_native_encodings():
+    """Test that MuPDF-encoded PNG/JPEG variants decode and gray shrinks the payload."""
+    print("\n=== Testing Native Encodings ===")
+
+    doc, page = make_drawing_page()
+    sizes = {}
+    for image_format in ("png", "jpeg"):
+        for color in ("rgb", "gray"):
+            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), colorspace=_pixmap_colorspace(color))
+            data = encode_pixmap(pix, image_format, color, quality=80)
+            assert data.startswith(MAGIC[image_format]), f"{image_format}/{color} has wrong signature"
+            decoded = fitz.Pixmap(data)
+            assert (decoded.width, decoded.height) == (pix.width, pix.height)
+            assert decoded.n == (1 if color == "gray" else 3)
+            sizes[(image_format, color)] = len(data)
+    assert sizes[("png", "gray")] < sizes[("png", "rgb")]
+    print(f"✓ PNG rgb {sizes[('png', 'rgb')]} bytes -> gray {sizes[('png', 'gray')]} bytes")
+    doc.close()
+
+
+def test_pillow_encodings():
+    """Test bilevel, palette, WebP and explicit PNG compression."""
+    print("\n=== Testing Pillow Encodings ===")
+
+    if not have_pillow():
+        print("⚠ Pillow not installed, skipping")
+        return
+
+    doc, page = make_drawing_page()
+    baseline = len(encode_pixmap(page.get_pixmap(matrix=fitz.Matrix(2, 2))))
+    for image_format in IMAGE_FORMATS:
+        for color in IMAGE_COLOR_MODES:
+            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), colorspace=_pixmap_colorspace(color))
+            data = encode_pixmap(pix, image_format, color, quality=80, png_compression=9)
+            assert data.startswith(MAGIC[image_format]), f"{image_format}/{color} has wrong signature"
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), colorspace=_pixmap_colorspace("bilevel"))
+    bilevel = encode_pixmap(pix, "png", "bilevel")
+    assert len(bilevel) * 4 < baseline, "1-bit PNG should be far smaller than RGB"
+    print(f"✓ All formats encode; bilevel PNG {len(bilevel)} bytes vs RGB {baseline} bytes")
+    doc.close()
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("IMAGE ENCODING TEST SUITE")
+    print("="*60)
+
+    try:
+        test_native_encodings()
+        test_pillow_encodings()
+
+        print("\n✅ ALL IMAGE ENCODING TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
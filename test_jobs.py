@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent analysis job queue.
+Verifies job lifecycle, progress recording and recovery after a restart.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.jobs import JobQueue, JobStore, load_job_status
+from backend.models import AnalyzeRequest, AnalyzeResponse, JobStatus
+
+
+def make_request() -> AnalyzeRequest:
+    return AnalyzeRequest(upload_id="up-0123abcd")
+
+
+async def wait_for_status(store: JobStore, job_id: str, timeout: float = 5.0) -> dict:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = store.get(job_id)
+        if job["status"] in (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def test_job_lifecycle():
+    """Test that queued jobs run, record progress and store results or errors."""
+    print("\n=== Testing Job Lifecycle ===")
+
+    async def runner(request, request_id, emit=None):
+        await emit({"event": "document", "total_pages": 2, "max_pages": 2})
+        await emit({"event": "page_extracted", "page": 1})
+        await emit({"event": "page_failed", "page": 2})
+        if request.quality.value == "ultra":
+            error = Exception("quota")
+            error.status_code = 429
+            error.detail = "AI quota exceeded"
+            raise error
+        return AnalyzeResponse(report="{}", request_id=request_id, pages_processed=1)
+
+    async def scenario(path: str):
+        store = JobStore(path)
+        queue = JobQueue(store, runner, workers=2)
+        await queue.start()
+        ok = await queue.submit(make_request())
+        bad = await queue.submit(AnalyzeRequest(upload_id="up-0123abcd", quality="ultra"))
+
+        job = load_job_status(await wait_for_status(store, ok["job_id"]))
+        assert job["status"] == JobStatus.SUCCEEDED.value
+        assert job["request_id"] == ok["request_id"]
+        assert job["attempts"] == 1
+        assert job["result"]["pages_processed"] == 1
+        assert job["progress"] == {
+            "stage": "complete", "pages_extracted": 1, "pages_failed": 1, "max_pages": 2, "total_pages": 2
+        }
+        print("✓ Successful job stores its result and progress")
+
+        failed = load_job_status(await wait_for_status(store, bad["job_id"]))
+        assert failed["status"] == JobStatus.FAILED.value
+        assert failed["error"] == "AI quota exceeded"
+        assert failed["error_status_code"] == 429
+        assert failed["result"] is None
+        assert failed["progress"]["pages_failed"] == 1
+        print("✓ Failed job keeps the pipeline's error and status code")
+        await queue.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, "jobs.sqlite3")))
+
+
+def test_progress_writes_are_throttled():
+    """Test that per-page progress is written at most once per interval, plus the final counters."""
+    print("\n=== Testing Progress Throttling ===")
+
+    async def runner(request, request_id, emit=None):
+        await emit({"event": "document", "total_pages": 50, "max_pages": 50})
+        await asyncio.gather(*(emit({"event": "page_extracted", "page": p}) for p in range(1, 51)))
+        return AnalyzeResponse(report="{}", request_id=request_id, pages_processed=50)
+
+    async def scenario(path: str):
+        store = JobStore(path)
+        writes = []
+        update_progress = store.update_progress
+        store.update_progress = lambda job_id, progress: writes.append(progress) or update_progress(job_id, progress)
+        queue = JobQueue(store, runner, workers=1, progress_interval=60.0)
+        await queue.start()
+        job = await queue.submit(make_request())
+        finished = load_job_status(await wait_for_status(store, job["job_id"]))
+        await queue.stop()
+        return finished, writes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        job, writes = asyncio.run(scenario(os.path.join(tmp, "jobs.sqlite3")))
+    assert len(writes) == 1, writes
+    assert job["progress"]["pages_extracted"] == 50 and job["progress"]["stage"] == "complete"
+    print(f"✓ 51 events made {len(writes)} progress write; final counters stored with the result")
+
+
+def test_job_recovery_after_restart():
+    """Test that running and queued jobs resume in a new queue over the same store."""
+    print("\n=== Testing Job Recovery ===")
+
+    async def slow_runner(request, request_id, emit=None):
+        await asyncio.sleep(60)
+
+    async def fast_runner(request, request_id, emit=None):
+        return AnalyzeResponse(report="{}", request_id=request_id, pages_processed=3)
+
+    async def first_process(path: str):
+        queue = JobQueue(JobStore(path), slow_runner, workers=1)
+        await queue.start()
+        running = await queue.submit(make_request())
+        waiting = await queue.submit(make_request())
+        await asyncio.sleep(0.05)
+        assert queue.store.get(running["job_id"])["status"] == JobStatus.RUNNING.value
+        await queue.stop()
+        return running["job_id"], waiting["job_id"]
+
+    async def second_process(path: str, job_ids):
+        store = JobStore(path)
+        assert all(store.get(j)["status"] == JobStatus.QUEUED.value for j in job_ids)
+        queue = JobQueue(store, fast_runner, workers=1)
+        await queue.start()
+        results = [await wait_for_status(store, j) for j in job_ids]
+        await queue.stop()
+        return results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.sqlite3")
+        job_ids = asyncio.run(first_process(path))
+        print("✓ Shutdown returns the running job to the queue")
+        results = asyncio.run(second_process(path, job_ids))
+        assert [r["status"] for r in results] == [JobStatus.SUCCEEDED.value] * 2
+        assert results[0]["attempts"] == 2
+        print("✓ Both jobs complete after restart")
+
+        # A job that keeps getting interrupted is eventually failed instead of retried
+        store = JobStore(path)
+        store.create("job-stuck", "req-stuck", make_request().model_dump_json())
+        store.mark_running("job-stuck")
+        assert store.recover_interrupted(max_attempts=1) == 0
+        assert store.get("job-stuck")["status"] == JobStatus.FAILED.value
+        print("✓ Jobs past max attempts are failed on recovery")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("JOB QUEUE TEST SUITE")
+    print("="*60)
+
+    try:
+        test_job_lifecycle()
+        test_progress_writes_are_throttled()
+        test_job_recovery_after_restart()
+
+        print("\n✅ ALL JOB QUEUE TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
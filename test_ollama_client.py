@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared Ollama connection pool and native /api/chat mode.
+"""
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from backend.config import get_settings
+
+
+def make_client(handler, mode):
+    """An Ollama AIClient whose shared pool answers through handler."""
+    settings = get_settings()
+    provider, api_mode = settings.ai_provider, settings.ollama_api_mode
+    settings.ai_provider, settings.ollama_api_mode = "ollama", mode
+    try:
+        from backend.ai_client import AIClient
+        client = AIClient()
+    finally:
+        settings.ai_provider, settings.ollama_api_mode = provider, api_mode
+    # Every Ollama request, OpenAI-compatible or native, goes through this one pool
+    client.http_client._transport = httpx.MockTransport(handler)
+    return client
+
+
+def test_native_chat_options():
+    """Test that native mode sends num_ctx, num_predict and keep_alive."""
+    print("\n=== Testing Native Ollama Chat ===")
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        body = json.loads(request.content)
+        if body["stream"]:
+            lines = [{"message": {"content": part}, "done": False} for part in ("Hel", "lo")]
+            lines.append({"message": {"content": ""}, "done": True})
+            return httpx.Response(200, content="\n".join(json.dumps(l) for l in lines).encode())
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "ok"}, "done": True})
+
+    async def scenario():
+        client = make_client(handler, "native")
+        text = await client.generate_with_image("read", image_bytes=b"\x89PNG", max_tokens=123)
+        streamed = [c async for c in client.generate_text_stream("go", max_tokens=50, system_instruction="sys")]
+        await client.aclose()
+        return text, streamed
+
+    text, streamed = asyncio.run(scenario())
+    assert text == "ok" and streamed == ["Hel", "lo"], (text, streamed)
+    first = json.loads(requests[0].content)
+    settings = get_settings()
+    assert requests[0].url.path == "/api/chat"
+    assert first["options"]["num_ctx"] == settings.ollama_context_length()
+    assert first["options"]["num_predict"] == 123
+    assert first["keep_alive"] == settings.ollama_keep_alive
+    assert first["messages"][0]["images"] == ["iVBORw=="]
+    assert [m["role"] for m in json.loads(requests[1].content)["messages"]] == ["system", "user"]
+    print(f"✓ /api/chat carries num_ctx={first['options']['num_ctx']}, num_predict and keep_alive; stream parsed")
+
+
+def test_native_chat_errors():
+    """Test that Ollama status errors map to AI provider exceptions."""
+    print("\n=== Testing Native Ollama Errors ===")
+
+    from backend.ai_client import AIInvalidRequestError, AIProviderError
+
+    def handler(request):
+        if json.loads(request.content)["stream"]:
+            return httpx.Response(500, json={"error": "out of memory"})
+        return httpx.Response(404, json={"error": "model not found"})
+
+    async def scenario():
+        client = make_client(handler, "native")
+        errors = []
+        try:
+            await client.generate_text("x")
+        except AIInvalidRequestError as e:
+            errors.append(e)
+        try:
+            async for _ in client.generate_text_stream("x"):
+                pass
+        except AIProviderError as e:
+            errors.append(e)
+        await client.aclose()
+        return errors
+
+    errors = asyncio.run(scenario())
+    assert len(errors) == 2 and "model not found" in str(errors[0]) and "out of memory" in str(errors[1]), errors
+    print("✓ 404 is an invalid request, 500 a retryable provider error")
+
+
+def test_openai_mode_shares_pool():
+    """Test that the OpenAI-compatible path reuses the shared pool."""
+    print("\n=== Testing OpenAI-compatible Mode ===")
+
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return httpx.Response(200, json={
+            "id": "c", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}]
+        })
+
+    async def scenario():
+        client = make_client(handler, "openai")
+        text = await client.generate_text("x")
+        await client.aclose()
+        return text
+
+    assert asyncio.run(scenario()) == "ok"
+    assert paths == ["/v1/chat/completions"], paths
+    print("✓ /v1/chat/completions went through the shared pool")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("OLLAMA CLIENT TEST SUITE")
+    print("="*60)
+
+    try:
+        test_native_chat_options()
+        test_native_chat_errors()
+        test_openai_mode_shares_pool()
+
+        print("\n✅ ALL OLLAMA CLIENT TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the sheet classification pre-pass and page selection.
+"""
+import os
+import sys
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+from backend.utils import plan_page_order
+from pdf_server import classify_page
+
+
+def make_drawing_set():
+    """Cover, blank, architectural elevation, mechanical schedule and a scanned-looking sheet."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((200, 300), "PROJECT X", fontsize=30)
+    page.insert_text((200, 400), "SHEET INDEX", fontsize=12)
+    page.insert_text((500, 800), "G-001", fontsize=14)
+
+    doc.new_page()
+
+    page = doc.new_page()
+    page.draw_rect((50, 50, 500, 700))
+    page.insert_text((40, 40), "NORTH ELEVATION", fontsize=12)
+    page.insert_text((520, 820), "A-201", fontsize=14)
+
+    page = doc.new_page()
+    page.insert_text((40, 50), "EQUIPMENT SCHEDULE", fontsize=12)
+    for i in range(20):
+        page.draw_line((36, 60 + i * 20), (560, 60 + i * 20))
+        page.insert_text((40, 75 + i * 20), f"RTU-{i} 2000 CFM 5 TONS", fontsize=8)
+    page.insert_text((520, 820), "M-601", fontsize=14)
+
+    page = doc.new_page()
+    for i in range(50):
+        page.draw_line((40, 40 + i * 10), (500, 40 + i * 12))
+
+    # Outlined labels: dense linework, only title-block boilerplate as text
+    page = doc.new_page()
+    for i in range(2100):
+        page.draw_line((40 + i % 50 * 10, 40 + i // 50 * 15), (45 + i % 50 * 10, 50 + i // 50 * 15))
+    for i in range(5):
+        page.insert_text((300, 760 + i * 10), "COPYRIGHT ACME ENGINEERING. ALL RIGHTS RESERVED.", fontsize=6)
+    return doc
+
+
+def test_classify_page():
+    """Test categories from ink coverage, sheet numbers and HVAC vocabulary."""
+    print("\n=== Testing Sheet Classification ===")
+
+    doc = make_drawing_set()
+    results = [classify_page(page) for page in doc]
+    categories = [r["category"] for r in results]
+    assert categories == ["cover", "blank", "non_mechanical", "schedule", "unknown", "unknown"], categories
+    assert results[3]["sheet_number"] == "M-601"
+    assert results[2]["sheet_number"] == "A-201"
+    assert any("HVAC terms" in reason for reason in results[3]["reasons"])
+    assert "no text layer" in results[4]["reasons"]
+    assert any("labels likely outlined" in reason for reason in results[5]["reasons"])
+    doc.close()
+    print(f"✓ Classified set as {categories}")
+
+
+def test_plan_page_order():
+    """Test mechanical-first ordering, skipping and the max_pages budget."""
+    print("\n=== Testing Page Selection ===")
+
+    classes = {
+        1: {"category": "cover", "sheet_number": "G-001"},
+        2: {"category": "blank"},
+        3: {"category": "non_mechanical", "sheet_number": "A-201"},
+        4: {"category": "mechanical", "sheet_number": "M-101"},
+        5: {"category": "unknown"},
+        6: {"error": "unreadable"},
+        7: {"category": "schedule", "sheet_number": "M-601"}
+    }
+    order, skipped = plan_page_order(classes, "prioritize", max_pages=10)
+    assert order == [4, 7, 5, 6, 1, 3]
+    assert skipped == {2: "blank page"}
+
+    order, skipped = plan_page_order(classes, "mechanical_only", max_pages=10)
+    assert order == [4, 7, 5, 6]
+    assert skipped[1] == "cover sheet G-001" and skipped[3] == "non_mechanical sheet A-201"
+
+    order, skipped = plan_page_order(classes, "prioritize", max_pages=2)
+    assert order == [4, 7]
+    assert skipped[5] == "over max_pages (lower priority)"
+    print("✓ Mechanical and schedule sheets first; skipped pages carry a reason")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("SHEET CLASSIFICATION TEST SUITE")
+    print("="*60)
+
+    try:
+        test_classify_page()
+        test_plan_page_order()
+
+        print("\n✅ ALL SHEET CLASSIFICATION TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for duplicate sheet detection: page fingerprints and cache lookups.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+from backend.extraction_cache import ExtractionCache, hash_distance, make_dedup_context
+from pdf_server import page_fingerprint
+
+
+def draw_schedule(page, values, cloud=False):
+    """An equipment schedule grid; values change only the small text."""
+    for i, value in enumerate(values):
+        page.draw_line((36, 60 + i * 20), (560, 60 + i * 20))
+        page.insert_text((40, 75 + i * 20), f"AHU-{i} {value} CFM", fontsize=8)
+    for x in (36, 200, 380, 560):
+        page.draw_line((x, 60), (x, 60 + len(values) * 20))
+    if cloud:
+        page.draw_circle((300, 300), 40)
+
+
+def draw_plan(page):
+    """A floor plan: rooms as rectangles."""
+    for i in range(12):
+        page.draw_rect((40 + (i % 4) * 130, 80 + (i // 4) * 200, 150 + (i % 4) * 130, 250 + (i // 4) * 200))
+
+
+def test_page_fingerprints():
+    """Test that near-identical sheets hash close and different sheets far apart."""
+    print("\n=== Testing Page Fingerprints ===")
+
+    doc = fitz.open()
+    values = list(range(1000, 1030))
+    draw_schedule(doc.new_page(), values)
+    draw_schedule(doc.new_page(), values, cloud=True)
+    draw_schedule(doc.new_page(), [v + 7 for v in values])
+    draw_plan(doc.new_page())
+    base, clouded, renumbered, plan = (page_fingerprint(page) for page in doc)
+
+    assert len(base["phash"]) == 64
+    assert hash_distance(base["phash"], clouded["phash"]) <= 8, "Revision cloud should barely change the hash"
+    assert hash_distance(base["phash"], plan["phash"]) > 40, "Different sheets should hash far apart"
+    assert base["text_digest"] == clouded["text_digest"]
+    # Same layout, different numbers: the hash cannot tell, the text digest can
+    assert hash_distance(base["phash"], renumbered["phash"]) <= 8
+    assert base["text_digest"] != renumbered["text_digest"]
+    assert plan["text_digest"] is None
+    doc.close()
+    print("✓ Revision clouds stay within a few bits; text digests separate renumbered sheets")
+
+
+def test_find_similar():
+    """Test near-duplicate lookups in the extraction cache."""
+    print("\n=== Testing Near-Duplicate Cache Lookups ===")
+
+    phash = "f" * 64
+    near = "f" * 63 + "e"  # 1 bit apart
+    context = make_dedup_context("prompt", "model", 2.0, 0.1)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(os.path.join(tmp, "cache.sqlite3"), max_bytes=1024 * 1024, max_entries=100)
+        cache.put("k1", "SHEET M-101 TEXT", context, phash, "digest-a", document="doc-1")
+
+        assert cache.find_similar(context, "doc-1", near, "digest-a", max_distance=2) == ("SHEET M-101 TEXT", 1)
+        assert cache.find_similar(context, "doc-1", near, "digest-a", max_distance=0) is None
+        assert cache.find_similar(context, "doc-1", near, "digest-b", max_distance=2) is None
+        assert cache.find_similar(context, "doc-1", near, "digest-b", max_distance=2, match_text=False) is not None
+        other = make_dedup_context("prompt", "other-model", 2.0, 0.1)
+        assert cache.find_similar(other, "doc-1", phash, "digest-a", max_distance=2) is None
+        # Another project's sheet with the same layout and boilerplate is never reused
+        assert cache.find_similar(context, "doc-2", phash, "digest-a", max_distance=2) is None
+        # A page without text (scanned or outlined) only matches an identical hash
+        cache.put("k2", "SHEET M-201 SCAN", context, "0" * 64, None, document="doc-1")
+        assert cache.find_similar(context, "doc-1", "0" * 63 + "1", None, max_distance=2) is None
+        assert cache.find_similar(context, "doc-1", "0" * 64, None, max_distance=2) == ("SHEET M-201 SCAN", 0)
+        assert cache.stats()["similar_hits"] == 3
+        print("✓ Matches respect distance, text digest, model/prompt context and document; textless pages match exactly")
+
+
+def test_fingerprint_band_index():
+    """Test that lookups only read rows sharing a band, and still find every match within 7 bits."""
+    print("\n=== Testing Fingerprint Band Index ===")
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(os.path.join(tmp, "cache.sqlite3"), max_bytes=10 * 1024 * 1024, max_entries=10000)
+        for i in range(500):
+            cache.put(f"k{i}", f"page {i}", "ctx", f"{rng.getrandbits(256):064x}", None, document="doc")
+        target = int("ab" * 32, 16)
+        # 7 flipped bits in 7 of the 8 bands: only one band still matches exactly
+        flipped = target ^ sum(1 << (band * 32 + 3) for band in range(7))
+        cache.put("target", "TARGET", "ctx", f"{target:064x}", "digest", document="doc")
+        assert cache.find_similar("ctx", "doc", f"{flipped:064x}", "digest", max_distance=7) == ("TARGET", 7)
+        assert cache.find_similar("ctx", "doc", f"{flipped:064x}", "digest", max_distance=6) is None
+
+        bands = cache._conn.execute("SELECT COUNT(*) FROM fingerprint_bands").fetchone()[0]
+        assert bands == 501 * 8, bands
+        cache.clear()
+        assert cache._conn.execute("SELECT COUNT(*) FROM fingerprint_bands").fetchone()[0] == 0
+        print("✓ Band index finds a 7-bit match among 500 fingerprints and is cleared with the cache")
+
+
+def test_cache_migration():
+    """Test that a cache file from before fingerprints gains the new columns."""
+    print("\n=== Testing Cache Migration ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE extractions (key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO extractions VALUES ('old', 'OLD TEXT', 8, 0, 0)")
+        conn.commit()
+        conn.close()
+
+        cache = ExtractionCache(path, max_bytes=1024 * 1024, max_entries=100)
+        assert cache.get("old") == "OLD TEXT"
+        cache.put("new", "NEW TEXT", "ctx", "0" * 64, None, document="doc")
+        assert cache.find_similar("ctx", "doc", "0" * 64, None, max_distance=0) == ("NEW TEXT", 0)
+        print("✓ Existing entries survive; fingerprinted entries can be added")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("DUPLICATE SHEET DETECTION TEST SUITE")
+    print("="*60)
+
+    try:
+        test_page_fingerprints()
+        test_find_similar()
+        test_fingerprint_band_index()
+        test_cache_migration()
+
+        print("\n✅ ALL DUPLICATE SHEET TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk page preview cache.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.previews import PreviewCache, snap_preview_width
+
+HANDLE_A = "a" * 32
+HANDLE_B = "b" * 32
+
+
+def test_width_buckets():
+    """Test that requested widths round up to a cached size."""
+    print("\n=== Testing Preview Width Buckets ===")
+
+    assert snap_preview_width(32) == 160
+    assert snap_preview_width(320) == 320
+    assert snap_preview_width(321) == 640
+    assert snap_preview_width(4096) == 2048
+    print("✓ Widths snap up to 160/320/640/1280/2048")
+
+
+def test_cache_roundtrip_and_refs():
+    """Test preview storage and upload -> content hash references across restarts."""
+    print("\n=== Testing Preview Cache ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PreviewCache(tmp, max_bytes=1024 * 1024)
+        assert cache.get(HANDLE_A, 1, 640) is None
+        path = cache.put(HANDLE_A, 1, 640, b"\x89PNG preview")
+        assert cache.get(HANDLE_A, 1, 640) == path
+        with open(path, "rb") as fh:
+            assert fh.read() == b"\x89PNG preview"
+        assert cache.get(HANDLE_A, 1, 320) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+        print("✓ Previews are keyed by content hash, page and width")
+
+        cache.record_upload("up-0123abcd", HANDLE_A)
+        restarted = PreviewCache(tmp, max_bytes=1024 * 1024)
+        assert restarted.handle_for("up-0123abcd") == HANDLE_A
+        assert restarted.handle_for("up-ffffffff") is None
+        assert restarted.stats()["entries"] == 1 and restarted.stats()["size_bytes"] == len(b"\x89PNG preview")
+        print("✓ Upload references and occupancy survive a restart")
+
+
+def test_eviction_keeps_recent_previews():
+    """Test that the size budget evicts the least recently served previews."""
+    print("\n=== Testing Preview Eviction ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PreviewCache(tmp, max_bytes=250)
+        cache.put(HANDLE_A, 1, 160, b"x" * 100)
+        old = time.time() - 60
+        os.utime(cache.path_for(HANDLE_A, 1, 160), (old, old))
+        cache.put(HANDLE_B, 1, 160, b"y" * 100)
+        os.utime(cache.path_for(HANDLE_B, 1, 160), (old + 1, old + 1))
+        cache.get(HANDLE_A, 1, 160)  # served again: now most recent
+        cache.put(HANDLE_A, 2, 160, b"z" * 100)
+
+        assert cache.get(HANDLE_B, 1, 160) is None, "Least recently served preview should be evicted"
+        assert cache.get(HANDLE_A, 1, 160) is not None
+        assert cache.get(HANDLE_A, 2, 160) is not None
+        assert cache.evictions == 1
+        assert cache.stats()["size_bytes"] == 200
+        print("✓ Over-budget cache evicts by last access")
+
+
+def test_puts_under_budget_do_not_scan():
+    """Test that storing previews keeps a running total instead of walking the directory."""
+    print("\n=== Testing Preview Occupancy Tracking ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PreviewCache(tmp, max_bytes=1024 * 1024)
+        scans = []
+        files = cache._files
+        cache._files = lambda: scans.append(1) or files()
+        for page in range(1, 21):
+            cache.put(HANDLE_A, page, 160, b"x" * 100)
+        cache.put(HANDLE_A, 1, 160, b"x" * 50)  # re-rendered preview replaces the old file
+        assert scans == [], "Puts under budget must not scan the cache directory"
+        assert cache.stats()["entries"] == 20 and cache.stats()["size_bytes"] == 19 * 100 + 50
+        print("✓ 21 puts, no directory scans, occupancy tracked exactly")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("PREVIEW CACHE TEST SUITE")
+    print("="*60)
+
+    try:
+        test_width_buckets()
+        test_cache_roundtrip_and_refs()
+        test_eviction_keeps_recent_previews()
+        test_puts_under_budget_do_not_scan()
+
+        print("\n✅ ALL PREVIEW CACHE TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for region-of-interest cropping of mechanical sheets.
+"""
+import base64
+import json
+import os
+import sys
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+import pdf_server
+from backend.utils import merge_region_extractions
+
+
+def make_mechanical_sheet():
+    """A 36x24in sheet: plan linework, an equipment schedule, general notes and a title block."""
+    doc = fitz.open()
+    page = doc.new_page(width=2592, height=1728)
+    for i in range(300):
+        page.draw_line((50 + (i * 37) % 1700, 50 + (i * 53) % 1300), (50 + (i * 71) % 1700, 50 + (i * 29) % 1300))
+    for i in range(40):
+        page.insert_text((80 + (i * 97) % 1600, 80 + (i * 61) % 1200), f"SD-{i} 200", fontsize=5)
+
+    x0, y0 = 1800, 80
+    for r in range(9):
+        page.draw_line((x0, y0 + r * 18), (x0 + 600, y0 + r * 18))
+    for c in range(5):
+        page.draw_line((x0 + c * 150, y0), (x0 + c * 150, y0 + 8 * 18))
+    for r in range(8):
+        for c in range(4):
+            page.insert_text((x0 + 5 + c * 150, y0 + 13 + r * 18), f"RTU-{r}" if c == 0 else f"{1000 + r * c} CFM", fontsize=7)
+
+    page.insert_text((1800, 400), "GENERAL NOTES", fontsize=9)
+    for i in range(8):
+        page.insert_text((1800, 415 + i * 11), f"{i + 1}. ALL DUCTWORK SHALL BE SEALED PER SMACNA CLASS C", fontsize=7)
+
+    page.insert_text((2300, 1600), "ACME MECHANICAL", fontsize=10)
+    page.insert_text((2450, 1690), "M-101", fontsize=20)
+    return doc
+
+
+def test_find_regions():
+    """Test that schedules, notes and the title block are found and plan labels are not."""
+    print("\n=== Testing Region Detection ===")
+
+    doc = make_mechanical_sheet()
+    regions = pdf_server.find_regions(doc[0])
+    kinds = [r["kind"] for r in regions]
+    assert kinds == ["schedule", "notes", "title_block"], kinds
+    schedule = fitz.Rect(regions[0]["rect"])
+    assert schedule.contains(fitz.Rect(1800, 80, 2400, 224)), "Schedule crop should cover the whole table"
+    title_block = fitz.Rect(regions[2]["rect"])
+    assert title_block.contains(fitz.Point(2460, 1680)), "Title block should include the sheet number"
+    doc.close()
+    print(f"✓ Found {kinds}")
+
+
+def test_region_render():
+    """Test that crops replace the whole page and are far smaller."""
+    print("\n=== Testing Region Crops ===")
+
+    doc = make_mechanical_sheet()
+    handle = json.loads(pdf_server.open_document(pdf_base64=base64.b64encode(doc.tobytes()).decode()))["handle"]
+    doc.close()
+
+    whole = json.loads(pdf_server.render_page(handle, 1, zoom_factor=2.0, tile_max_pixels=4_000_000))
+    cropped = json.loads(pdf_server.render_page(handle, 1, zoom_factor=2.0, tile_max_pixels=4_000_000, region_zoom=3.0))
+    assert "tiles" in whole and "regions" in cropped
+    assert all(r["zoom_factor"] == 3.0 and "image_data" in r for r in cropped["regions"])
+    assert cropped["byte_size"] * 10 < whole["byte_size"], "Crops should be a fraction of the whole sheet"
+
+    strict = json.loads(pdf_server.render_page(
+        handle, 1, zoom_factor=2.0, tile_max_pixels=4_000_000, region_zoom=3.0, region_max_fraction=0.01
+    ))
+    assert "regions" not in strict and "tiles" in strict, "Regions over the page fraction fall back to the whole page"
+    pdf_server.close_document(handle)
+    print(f"✓ {len(cropped['regions'])} crops, {cropped['byte_size']} bytes vs {whole['byte_size']} bytes whole")
+
+
+def test_merge_region_extractions():
+    """Test section headings for merged region text."""
+    print("\n=== Testing Region Merge ===")
+
+    merged = merge_region_extractions([
+        ("schedule", "RTU-1 2000 CFM"),
+        ("schedule", "EF-1 300 CFM"),
+        ("notes", "  "),
+        ("title_block", "M-101")
+    ])
+    assert merged == "[SCHEDULE 1]\nRTU-1 2000 CFM\n\n[SCHEDULE 2]\nEF-1 300 CFM\n\n[TITLE BLOCK]\nM-101"
+    print("✓ Regions merged under numbered headings; empty regions dropped")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("REGION CROP TEST SUITE")
+    print("="*60)
+
+    try:
+        test_find_regions()
+        test_region_render()
+        test_merge_region_extractions()
+
+        print("\n✅ ALL REGION CROP TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
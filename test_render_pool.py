@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for batched page rendering in the PDF MCP server.
+"""
+import base64
+import json
+import os
+import sys
+import tempfile
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+import pdf_server
+
+
+def open_sample(page_count=4):
+    """Open a small multi-page drawing through the tool interface."""
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        for j in range(30):
+            page.draw_line((36, 40 + j * 20), (560, 40 + j * 20))
+        page.insert_text((40, 30), f"SHEET M-{i + 1}", fontsize=10)
+    pdf = base64.b64encode(doc.tobytes()).decode()
+    doc.close()
+    return json.loads(pdf_server.open_document(pdf_base64=pdf))["handle"]
+
+
+def render(handle, pages, processes):
+    pdf_server.PDF_RENDER_PROCESSES = processes
+    pdf_server._render_cache.clear()
+    pdf_server._render_cache_bytes = 0
+    return json.loads(pdf_server.render_pages(handle, pages, zoom_factor=1.0))["pages"]
+
+
+def test_batch_results_in_order():
+    """Test that a batch returns one result per requested page with per-page errors."""
+    print("\n=== Testing Batch Rendering ===")
+
+    handle = open_sample()
+    results = render(handle, [3, 1, 9], processes=1)
+    assert [r["page_number"] for r in results[:2]] == [3, 1]
+    assert all("image_data" in r for r in results[:2])
+    assert "out of range" in results[2]["error"]
+    single = json.loads(pdf_server.render_page(handle, 3, zoom_factor=1.0))
+    assert single["image_data"] == results[0]["image_data"]
+    pdf_server.close_document(handle)
+    print("✓ Pages come back in request order; a bad page does not fail the batch")
+
+
+def test_reopen_by_handle_skips_reading():
+    """Test that reopening by handle reuses the open document without touching the file."""
+    print("\n=== Testing Reopen By Handle ===")
+
+    handle = open_sample(page_count=2)
+    reopened = json.loads(pdf_server.open_document(pdf_path="/nonexistent.pdf", handle=handle))
+    assert (reopened["handle"], reopened["cached"], reopened["total_pages"]) == (handle, True, 2)
+    pdf_server.close_document(handle)
+    pdf_server.close_document(handle)
+
+    # Unknown on this worker: the path is opened (and hashed) as usual
+    doc = fitz.open()
+    doc.new_page()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as fh:
+        fh.write(doc.tobytes())
+    doc.close()
+    try:
+        fallback = json.loads(pdf_server.open_document(pdf_path=fh.name, handle="0" * 32))
+        assert fallback["cached"] is False and fallback["handle"] != "0" * 32
+        pdf_server.close_document(fallback["handle"])
+    finally:
+        os.unlink(fh.name)
+    print("✓ Cached handles skip the file; unknown handles fall back to the path")
+
+
+def test_closed_handle_drops_caller_path():
+    """Test that a cached handle stops using the caller's file once it is closed."""
+    print("\n=== Testing Caller Path Release ===")
+
+    doc = fitz.open()
+    for _ in range(2):
+        doc.new_page()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as fh:
+        fh.write(doc.tobytes())
+    doc.close()
+    try:
+        handle = json.loads(pdf_server.open_document(pdf_path=fh.name))["handle"]
+        entry = pdf_server._documents[handle]
+        assert entry.file_path() == os.path.abspath(fh.name)
+        pdf_server.close_document(handle)
+    finally:
+        os.unlink(fh.name)
+
+    # Still cached, but child renders now read a spooled copy
+    assert handle in pdf_server._documents
+    spooled = entry.file_path()
+    assert spooled != os.path.abspath(fh.name) and os.path.exists(spooled)
+    with fitz.open(spooled) as copy:
+        assert copy.page_count == 2
+    print("✓ Closed handles spool their own copy once the caller's file is gone")
+
+
+def test_process_pool_matches_in_process():
+    """Test that rendering across worker processes gives identical images."""
+    print("\n=== Testing Render Process Pool ===")
+
+    handle = open_sample()
+    serial = render(handle, [1, 2, 3, 4], processes=1)
+    try:
+        pooled = render(handle, [1, 2, 3, 4], processes=2)
+        assert pdf_server._render_pool is not None, "Render pool should have started"
+    finally:
+        if pdf_server._render_pool is not None:
+            pdf_server._render_pool.shutdown()
+            pdf_server._render_pool = None
+        pdf_server.PDF_RENDER_PROCESSES = 1
+    assert [r["image_data"] for r in pooled] == [r["image_data"] for r in serial]
+    pdf_server.close_document(handle)
+    print("✓ Pool-rendered pages are byte-identical to in-process renders")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("RENDER POOL TEST SUITE")
+    print("="*60)
+
+    try:
+        test_batch_results_in_order()
+        test_reopen_by_handle_skips_reading()
+        test_closed_handle_drops_caller_path()
+        test_process_pool_matches_in_process()
+
+        print("\n✅ ALL RENDER POOL TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
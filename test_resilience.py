@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Tests for the async retry engine, per-provider retry budget and circuit breaker.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.ai_client import AIRateLimitError
+from backend.resilience import CircuitBreaker, CircuitOpenError, ProviderGuard, RetryBudget, is_provider_outage
+from backend.utils import retry_with_backoff
+
+
+class TransientError(Exception):
+    pass
+
+
+class FatalError(Exception):
+    pass
+
+
+def make_guard(threshold: int = 3, reset: float = 60.0, min_retries: int = 10) -> ProviderGuard:
+    return ProviderGuard(
+        "test",
+        RetryBudget(ratio=0.0, min_retries=min_retries, window_seconds=60.0),
+        CircuitBreaker(failure_threshold=threshold, reset_timeout=reset)
+    )
+
+
+def test_backoff_does_not_block_event_loop():
+    """Test that backoff sleeps yield to other coroutines."""
+    print("\n=== Testing Non-Blocking Backoff ===")
+
+    attempts = []
+
+    @retry_with_backoff(max_retries=2, initial_delay=0.2, jitter=False, exceptions=(TransientError,))
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise TransientError("try again")
+        return "ok"
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await flaky()
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result == "ok"
+    assert len(attempts) == 3
+    assert ticks >= 30, f"Event loop stalled during backoff ({ticks} ticks)"
+    print(f"✓ Other tasks ran {ticks} times during 0.6s of backoff")
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test closed -> open -> half-open -> closed transitions."""
+    print("\n=== Testing Circuit Breaker ===")
+
+    guard = make_guard(threshold=3, reset=0.2)
+    healthy = {"value": False}
+
+    @retry_with_backoff(max_retries=0, initial_delay=0.01, exceptions=(TransientError,), guard=guard)
+    async def call():
+        if not healthy["value"]:
+            raise TransientError("connection refused")
+        return "ok"
+
+    async def scenario():
+        for _ in range(3):
+            try:
+                await call()
+            except TransientError:
+                pass
+        assert guard.breaker.state == CircuitBreaker.OPEN
+        try:
+            await call()
+            raise AssertionError("Open circuit must fail fast")
+        except CircuitOpenError as e:
+            assert e.provider == "test"
+        assert guard.short_circuited == 1
+        assert guard.calls == 3
+        print("✓ Circuit opens after 3 consecutive failures and fails fast")
+
+        await asyncio.sleep(0.25)
+        healthy["value"] = True
+        assert await call() == "ok"
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+        print("✓ Successful half-open probe closes the circuit")
+
+    asyncio.run(scenario())
+
+
+def test_excluded_errors_do_not_trip_breaker():
+    """Test that non-retryable provider answers do not count as outages."""
+    print("\n=== Testing Excluded Errors ===")
+
+    guard = make_guard(threshold=1)
+
+    @retry_with_backoff(
+        max_retries=2, initial_delay=0.01, exceptions=(Exception,), exclude_exceptions=(FatalError,), guard=guard
+    )
+    async def call():
+        raise FatalError("invalid api key")
+
+    try:
+        asyncio.run(call())
+    except FatalError:
+        pass
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert guard.calls == 1 and guard.retries == 0
+    print("✓ Non-retryable errors fail once without opening the circuit")
+
+
+def test_throttling_does_not_trip_breaker():
+    """Test that 429s are retried but only outages count toward the breaker."""
+    print("\n=== Testing Throttled Calls ===")
+
+    request = httpx.Request("POST", "http://model/v1/chat/completions")
+    throttled = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+    overloaded = httpx.HTTPStatusError("503", request=request, response=httpx.Response(503, request=request))
+    assert not is_provider_outage(throttled) and not is_provider_outage(AIRateLimitError("slow down"))
+    assert is_provider_outage(overloaded) and is_provider_outage(httpx.ConnectError("refused"))
+
+    guard = make_guard(threshold=1)
+    errors = [AIRateLimitError("slow down"), throttled]
+
+    @retry_with_backoff(max_retries=2, initial_delay=0.01, jitter=False, exceptions=(Exception,), guard=guard)
+    async def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert asyncio.run(call()) == "ok"
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert guard.retries == 2 and guard.throttled == 2
+    print("✓ Two rate-limited attempts retried without opening a threshold-1 circuit")
+
+
+def test_reasoning_call_is_guarded():
+    """Test that a reasoning stream failing mid-way is retried under the provider guard."""
+    print("\n=== Testing Guarded Reasoning Call ===")
+
+    from backend import server
+
+    attempts = []
+    events = []
+
+    async def generate_text_stream(prompt, max_tokens, temperature, system_instruction, stop):
+        attempts.append(prompt)
+        for chunk in ('{"project_info": {}, ', '"compliance_status": {}}', " trailing"):
+            yield chunk
+            if len(attempts) == 1:
+                raise httpx.ReadError("connection reset")
+            if stop is not None and stop(chunk):
+                return
+
+    async def scenario():
+        saved = server.ai_client.generate_text_stream
+        server.ai_client.generate_text_stream = generate_text_stream
+        calls = server.provider_guard.calls
+        try:
+            result = await server.call_reasoning_model(
+                "reason", "req-test", ["project_info", "compliance_status"],
+                on_token=lambda token: _record(events, token),
+                on_restart=lambda: _record(events, None)
+            )
+        finally:
+            server.ai_client.generate_text_stream = saved
+        return result, server.provider_guard.calls - calls
+
+    (text, report), guarded_calls = asyncio.run(scenario())
+    assert len(attempts) == 2 and guarded_calls == 2
+    assert events[1] is None, events
+    assert report is not None and set(report) >= {"project_info", "compliance_status"}, report
+    assert text.startswith('{"project_info"') and "trailing" not in text, text
+    print("✓ Reasoning retried through the provider guard after a mid-stream reset")
+
+
+async def _record(events: list, token) -> None:
+    events.append(token)
+
+
+def test_retry_budget_is_shared():
+    """Test that an exhausted budget stops retries across callers."""
+    print("\n=== Testing Retry Budget ===")
+
+    guard = make_guard(threshold=100, min_retries=2)
+
+    @retry_with_backoff(max_retries=3, initial_delay=0.01, jitter=False, exceptions=(TransientError,), guard=guard)
+    async def call():
+        raise TransientError("timeout")
+
+    async def scenario():
+        for _ in range(2):
+            try:
+                await call()
+            except TransientError:
+                pass
+
+    asyncio.run(scenario())
+    # First call: 1 attempt + 2 budgeted retries; second call: 1 attempt, retry denied
+    assert guard.retries == 2
+    assert guard.retries_denied == 2
+    assert guard.calls == 4
+    stats = guard.stats()
+    assert stats["retry_budget"]["retries_in_window"] == 2
+    print(f"✓ Budget granted {stats['retries']} retries and denied {stats['retries_denied']}")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("RESILIENCE TEST SUITE")
+    print("="*60)
+
+    try:
+        test_backoff_does_not_block_event_loop()
+        test_circuit_breaker_opens_and_recovers()
+        test_excluded_errors_do_not_trip_breaker()
+        test_throttling_does_not_trip_breaker()
+        test_reasoning_call_is_guarded()
+        test_retry_budget_is_shared()
+
+        print("\n✅ ALL RESILIENCE TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental re-analysis of revised drawing sets.
+"""
+import base64
+import json
+import os
+import sys
+import tempfile
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+import pdf_server
+
+
+def add_sheet(doc, number, cfm=2000, plot_date="2026-01-01"):
+    """A mechanical sheet whose linework depends on its number."""
+    page = doc.new_page()
+    for i in range(60):
+        page.draw_line((40 + (i * 37 + number * 11) % 500, 40 + (i * 53) % 700), (40 + (i * 71) % 500, 40 + (i * 29 + number * 7) % 700))
+    page.insert_text((40, 780), f"RTU-{number} {cfm} CFM", fontsize=8)
+    page.insert_text((400, 800), plot_date, fontsize=6)
+    page.insert_text((500, 820), f"M-10{number}", fontsize=14)
+
+
+def open_set(sheets):
+    doc = fitz.open()
+    for sheet in sheets:
+        add_sheet(doc, *sheet)
+    handle = json.loads(pdf_server.open_document(pdf_base64=base64.b64encode(doc.tobytes()).decode()))["handle"]
+    doc.close()
+    return handle
+
+
+def test_match_pages():
+    """Test matching by content hash (even when reordered) and by pixel diff."""
+    print("\n=== Testing Revision Page Matching ===")
+
+    original = open_set([(1,), (2,), (3,)])
+    revised = open_set([(1,), (3,), (2, 2400), (4,)])
+    pages = json.loads(pdf_server.match_pages(revised, original, [1, 2, 3, 4]))["pages"]
+    assert [(p["previous_page"], p["method"]) for p in pages] == [
+        (1, "content_hash"), (3, "content_hash"), (None, None), (None, None)
+    ], pages
+    assert 0 < pages[2]["changed_fraction"] < 0.01, "A changed value should show up as a small pixel diff"
+    print("✓ Unchanged sheets match wherever they moved; the edited sheet does not")
+
+    replotted = open_set([(1, 2000, "2026-02-01")])
+    strict = json.loads(pdf_server.match_pages(replotted, original, [1]))["pages"][0]
+    assert strict["previous_page"] is None
+    lenient = json.loads(pdf_server.match_pages(replotted, original, [1], max_changed_fraction=0.01))["pages"][0]
+    assert (lenient["previous_page"], lenient["method"]) == (1, "page_diff")
+    for handle in (original, revised, replotted):
+        pdf_server.close_document(handle)
+    print(f"✓ A new plot date differs by {strict['changed_fraction']:.6f} of pixels; tolerance decides")
+
+
+def test_page_results_store():
+    """Test that stored page results round-trip and merge per page."""
+    print("\n=== Testing Page Results Store ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from backend.config import get_settings
+        settings = get_settings()
+        upload_dir = settings.upload_dir
+        settings.upload_dir = tmp
+        try:
+            from backend.revisions import is_reusable_page_result, load_page_results, save_page_results
+            assert load_page_results("up-00000001") is None
+            save_page_results("up-00000001", {1: {"text": "A", "source": "vision"}, 2: {"text": "B", "source": "vision"}}, "m")
+            save_page_results("up-00000001", {
+                2: {"text": "B2", "source": "text_layer_verified", "model": "old"},
+                3: {"text": "C", "source": "text_layer"}
+            }, "m2")
+            stored = load_page_results("up-00000001")
+            assert stored == {
+                1: {"text": "A", "source": "vision", "model": "m"},
+                2: {"text": "B2", "source": "text_layer_verified", "model": "old"},
+                3: {"text": "C", "source": "text_layer", "model": "m2"}
+            }
+            # Only vision output of the same model stands in for an extraction
+            assert [p for p in stored if is_reusable_page_result(stored[p], "m")] == [1]
+            assert [p for p in stored if is_reusable_page_result(stored[p], "old")] == [2]
+            assert not any(is_reusable_page_result(stored[p], "m2") for p in stored)
+        finally:
+            settings.upload_dir = upload_dir
+    print("✓ Later analyses update their pages and keep the rest; only same-model vision pages are reusable")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("INCREMENTAL RE-ANALYSIS TEST SUITE")
+    print("="*60)
+
+    try:
+        test_match_pages()
+        test_page_results_store()
+
+        print("\n✅ ALL INCREMENTAL RE-ANALYSIS TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for deciding when a page's embedded text layer can replace vision OCR.
+"""
+import base64
+import json
+import os
+import sys
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+from pdf_server import close_document, extract_text_layer, open_document
+
+BOILERPLATE = "COPYRIGHT 2024 ACME ENGINEERING. ALL RIGHTS RESERVED. REPRODUCTION PROHIBITED WITHOUT CONSENT. "
+
+
+def make_sheets():
+    """A drawing with outlined labels and only title-block text, and a general-notes sheet."""
+    doc = fitz.open()
+    page = doc.new_page(width=2592, height=1728)
+    for i in range(2500):
+        page.draw_line((100 + i % 50 * 40, 100 + i // 50 * 25), (130 + i % 50 * 40, 110 + i // 50 * 25))
+    for i in range(6):
+        page.insert_text((2200, 1500 + i * 12), BOILERPLATE[:60], fontsize=6)
+
+    page = doc.new_page()
+    for i in range(40):
+        page.insert_text((40, 60 + i * 18), f"{i + 1}. ALL DUCTWORK SHALL BE SEALED TO SMACNA CLASS A.", fontsize=10)
+    return doc
+
+
+def read_layers():
+    doc = make_sheets()
+    info = json.loads(open_document(pdf_base64=base64.b64encode(doc.tobytes()).decode()))
+    doc.close()
+    try:
+        return [json.loads(extract_text_layer(info["handle"], p)) for p in (1, 2)]
+    finally:
+        close_document(info["handle"])
+
+
+def test_drawing_sheet_is_not_rich():
+    """Test that boilerplate on a drawing-dense sheet does not stand in for the drawing."""
+    print("\n=== Testing Text Layer Richness ===")
+
+    from backend.server import is_rich_text_layer
+
+    drawing, notes = read_layers()
+    assert drawing["char_count"] >= 200, drawing["char_count"]
+    assert drawing["drawings"] > 2000 and drawing["text_coverage"] < 0.02, drawing
+    assert not is_rich_text_layer(drawing)
+    assert notes["text_coverage"] >= 0.02, notes
+    assert is_rich_text_layer(notes)
+    print(f"✓ drawing ({drawing['drawings']} paths, {drawing['text_coverage']:.1%} text) goes to vision; notes sheet does not")
+
+
+def main():
+    test_drawing_sheet_is_not_rich()
+    print("\n✅ All text layer tests passed")
+
+
+if __name__ == "__main__":
+    main()
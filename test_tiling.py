@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for tiled rendering of oversized sheets and tile extraction merging.
+"""
+import base64
+import json
+import os
+import sys
+
+import fitz
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend", "mcp_servers"))
+
+from pdf_server import close_document, open_document, plan_tiles, render_pages
+from backend.utils import merge_tile_extractions
+
+
+def test_plan_tiles_covers_page_with_overlap():
+    """Test that tiles respect the pixel budget, cover the page and overlap."""
+    print("\n=== Testing Tile Planning ===")
+
+    width, height, budget, overlap = 7200, 5100, 4_000_000, 96
+    tiles = plan_tiles(width, height, budget, overlap)
+
+    assert len(tiles) > 1
+    for _, _, x0, y0, x1, y1 in tiles:
+        assert (x1 - x0) * (y1 - y0) <= budget, "Tile exceeds pixel budget"
+        assert 0 <= x0 < x1 <= width and 0 <= y0 < y1 <= height
+    print(f"✓ {len(tiles)} tiles, each within {budget} pixels")
+
+    rows = sorted({t[0] for t in tiles})
+    cols = sorted({t[1] for t in tiles})
+    first_row = [t for t in tiles if t[0] == 0]
+    assert first_row[0][2] == 0 and first_row[-1][4] == width
+    for left, right in zip(first_row, first_row[1:]):
+        assert left[4] - right[2] >= overlap, "Neighbouring tiles must share the overlap band"
+    first_col = [t for t in tiles if t[1] == 0]
+    assert first_col[0][3] == 0 and first_col[-1][5] == height
+    assert len(tiles) == len(rows) * len(cols)
+    print(f"✓ {len(rows)}x{len(cols)} grid covers the page with {overlap}px overlap")
+
+    assert plan_tiles(1000, 800, budget, overlap) == [(0, 0, 0, 0, 1000, 800)]
+    print("✓ Pages under the budget are a single tile")
+
+
+def test_whole_page_budget_downscales_instead_of_tiling():
+    """Test that max_pixels renders an oversized sheet as one image within the budget."""
+    print("\n=== Testing Whole-Page Pixel Budget ===")
+
+    doc = fitz.open()
+    doc.new_page(width=2592, height=3456).insert_text((100, 100), "M-101", fontsize=24)
+    handle = json.loads(open_document(pdf_base64=base64.b64encode(doc.tobytes()).decode()))["handle"]
+    doc.close()
+    try:
+        tiled = json.loads(render_pages(handle, [1], zoom_factor=2.0, tile_max_pixels=4_000_000))["pages"][0]
+        whole = json.loads(render_pages(handle, [1], zoom_factor=2.0, max_pixels=4_000_000))["pages"][0]
+    finally:
+        close_document(handle)
+    assert len(tiled["tiles"]) > 1
+    assert "tiles" not in whole and whole["width"] * whole["height"] <= 4_000_000 * 1.01, whole
+    assert whole["zoom_factor"] < 1.0
+    print(f"✓ {len(tiled['tiles'])} tiles at 2.0x, or one {whole['width']}x{whole['height']} image at {whole['zoom_factor']}x")
+
+
+def test_merge_drops_overlap_duplicates():
+    """Test that text read twice across a tile seam is kept once."""
+    print("\n=== Testing Tile Merge ===")
+
+    merged = merge_tile_extractions([
+        (0, 1, "AHU-2 5000 CFM\nVAV-3"),
+        (0, 0, "AHU-1 2400 CFM\nVAV-3\nDUCT 24x12"),
+        (1, 0, "DUCT 24x1\nRTU-1"),
+        (2, 1, "VAV-3"),
+    ])
+
+    assert merged.index("[REGION row 1, col 1]") < merged.index("[REGION row 1, col 2]")
+    assert merged.count("VAV-3") == 2, "Seam duplicate dropped, distant repeat kept"
+    assert "DUCT 24x12" in merged and "DUCT 24x1\n" not in merged
+    assert "RTU-1" in merged and "AHU-2 5000 CFM" in merged
+    print("✓ Seam duplicates and truncated lines removed, distant repeats kept")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("TILING TEST SUITE")
+    print("="*60)
+
+    try:
+        test_plan_tiles_covers_page_with_overlap()
+        test_whole_page_budget_downscales_instead_of_tiling()
+        test_merge_drops_overlap_duplicates()
+
+        print("\n✅ ALL TILING TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for token and cost accounting from provider usage metadata.
+"""
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from backend.config import get_settings
+from backend.usage import UsageTracker, usage_scope, usage_stats
+from test_gemini_async import make_gemini_client
+from test_ollama_client import make_client
+
+
+def openai_response(content, prompt_tokens, completion_tokens):
+    return {
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "qwen2.5vl",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+
+def test_openai_usage_by_stage_and_page():
+    """Test that OpenAI-compatible usage is recorded per stage and split across batched pages."""
+    print("\n=== Testing OpenAI-Compatible Usage ===")
+
+    def handler(request):
+        body = json.loads(request.content)
+        images = [part for part in body["messages"][-1]["content"] if isinstance(part, dict) and part.get("type") == "image_url"] \
+            if isinstance(body["messages"][-1]["content"], list) else []
+        if len(images) > 1:
+            return httpx.Response(200, json=openai_response("batch", 3001, 401))
+        if images:
+            return httpx.Response(200, json=openai_response("page", 1200, 300))
+        return httpx.Response(200, json=openai_response("report", 5000, 900))
+
+    before = usage_stats()["total"]
+
+    async def scenario():
+        client = make_client(handler, "openai")
+        tracker = UsageTracker()
+        with usage_scope(tracker):
+            with usage_scope(stage="extraction", pages=[1]):
+                await client.generate_with_image("read", image_bytes=b"\x89PNG")
+            with usage_scope(stage="extraction", pages=[2, 3]):
+                await client.generate_with_images("read", [b"\x89PNG", b"\x89PNG"])
+            with usage_scope(stage="reasoning"):
+                await client.generate_text("reason")
+        await client.aclose()
+        return tracker.report()
+
+    report = asyncio.run(scenario())
+    assert report["total"]["prompt_tokens"] == 1200 + 3001 + 5000, report["total"]
+    assert report["total"]["calls"] == 3 and report["total"]["estimated_calls"] == 0
+    assert report["stages"]["extraction"]["completion_tokens"] == 300 + 401
+    assert report["stages"]["reasoning"]["total_tokens"] == 5900
+    assert report["pages"][1]["prompt_tokens"] == 1200
+    # The batched call is split evenly, and its pages add up to it
+    assert report["pages"][2]["prompt_tokens"] == 1501 and report["pages"][3]["prompt_tokens"] == 1500
+    assert report["pages"][2]["completion_tokens"] + report["pages"][3]["completion_tokens"] == 401
+    assert report["pages"][2]["calls"] + report["pages"][3]["calls"] == 1
+    assert report["total"]["cost_usd"] == 0.0
+    after = usage_stats()["total"]
+    assert after["total_tokens"] - before["total_tokens"] == report["total"]["total_tokens"]
+    print(f"✓ {report['total']['total_tokens']} tokens by stage and page; batched call split 1501/1500")
+
+
+def test_native_ollama_usage():
+    """Test that native Ollama eval counts are recorded, including the final stream chunk."""
+    print("\n=== Testing Native Ollama Usage ===")
+
+    def handler(request):
+        body = json.loads(request.content)
+        if body["stream"]:
+            lines = [{"message": {"content": part}, "done": False} for part in ("Hel", "lo")]
+            lines.append({"message": {"content": ""}, "done": True, "prompt_eval_count": 40, "eval_count": 2})
+            return httpx.Response(200, content="\n".join(json.dumps(l) for l in lines).encode())
+        return httpx.Response(200, json={
+            "message": {"role": "assistant", "content": "ok"}, "done": True, "prompt_eval_count": 900, "eval_count": 12
+        })
+
+    async def scenario():
+        client = make_client(handler, "native")
+        tracker = UsageTracker()
+        with usage_scope(tracker, "extraction", [4]):
+            await client.generate_with_image("read", image_bytes=b"\x89PNG")
+        with usage_scope(tracker, "reasoning"):
+            streamed = [c async for c in client.generate_text_stream("go")]
+        await client.aclose()
+        return tracker.report(), streamed
+
+    report, streamed = asyncio.run(scenario())
+    assert streamed == ["Hel", "lo"]
+    assert report["pages"][4]["prompt_tokens"] == 900 and report["pages"][4]["completion_tokens"] == 12
+    assert report["stages"]["reasoning"]["prompt_tokens"] == 40 and report["stages"]["reasoning"]["estimated_calls"] == 0
+    print("✓ prompt_eval_count/eval_count recorded for plain and streamed calls")
+
+
+def test_stopped_stream_is_estimated():
+    """Test that a stream closed before its usage chunk is counted with estimated tokens."""
+    print("\n=== Testing Estimated Usage for Stopped Streams ===")
+
+    def handler(request):
+        lines = [{"message": {"content": "{\"a\": 1} "}, "done": False}] * 3
+        lines.append({"message": {"content": ""}, "done": True, "prompt_eval_count": 40, "eval_count": 30})
+        return httpx.Response(200, content="\n".join(json.dumps(l) for l in lines).encode())
+
+    async def scenario():
+        client = make_client(handler, "native")
+        tracker = UsageTracker()
+        with usage_scope(tracker, "reasoning"):
+            text = await client.generate_text("go", stop=lambda generated: "}" in generated)
+        await client.aclose()
+        return tracker.report(), text
+
+    report, text = asyncio.run(scenario())
+    reasoning = report["stages"]["reasoning"]
+    assert text.startswith('{"a": 1}'), text
+    assert reasoning["calls"] == 1 and reasoning["estimated_calls"] == 1, reasoning
+    assert reasoning["prompt_tokens"] > 0 and reasoning["completion_tokens"] > 0
+    print(f"✓ stopped stream estimated at {reasoning['total_tokens']} tokens")
+
+
+def test_gemini_usage_metadata_and_cost():
+    """Test that Gemini usage metadata, thinking tokens included, is recorded and priced."""
+    print("\n=== Testing Gemini Usage Metadata ===")
+
+    class Models:
+        async def generate_content(self, model, contents, config):
+            return SimpleNamespace(text="ok", usage_metadata=SimpleNamespace(
+                prompt_token_count=1_000_000, candidates_token_count=100_000, thoughts_token_count=50_000
+            ))
+
+    settings = get_settings()
+    saved = settings.gemini_input_cost_per_million_tokens, settings.gemini_output_cost_per_million_tokens
+    settings.gemini_input_cost_per_million_tokens, settings.gemini_output_cost_per_million_tokens = 0.1, 0.4
+    client = make_gemini_client(SimpleNamespace(aio=SimpleNamespace(models=Models())))
+
+    async def scenario():
+        tracker = UsageTracker()
+        with usage_scope(tracker, "reasoning"):
+            await client.generate_text("go")
+        await client.aclose()
+        return tracker.report()
+
+    try:
+        report = asyncio.run(scenario())
+    finally:
+        settings.gemini_input_cost_per_million_tokens, settings.gemini_output_cost_per_million_tokens = saved
+    reasoning = report["stages"]["reasoning"]
+    assert reasoning["completion_tokens"] == 150_000, reasoning
+    assert abs(reasoning["cost_usd"] - (0.1 + 0.15 * 0.4)) < 1e-9, reasoning
+    assert f"gemini/{client.model_name}" in usage_stats()["models"]
+    print(f"✓ Gemini call recorded with thinking tokens, cost ${reasoning['cost_usd']}")
+
+
+def main():
+    test_openai_usage_by_stage_and_page()
+    test_native_ollama_usage()
+    test_stopped_stream_is_estimated()
+    test_gemini_usage_metadata_and_cost()
+    print("\n✅ All token usage tests passed")
+
+
+if __name__ == "__main__":
+    main()
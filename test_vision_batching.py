@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for batched multi-page vision extraction.
+"""
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from backend.config import get_settings
+from backend.utils import split_batched_extraction
+
+
+def test_split_batched_extraction():
+    """Test splitting batched output on page delimiters, all or nothing."""
+    print("\n=== Testing Batched Output Parsing ===")
+
+    text = "Sure.\n=== PAGE 3 ===\nRTU-1 2000 CFM\n\n**=== PAGE 4 ===**\nAHU-2\n=== page 7 ===\n12'6\" x 10'"
+    assert split_batched_extraction(text, [3, 4, 7]) == {3: "RTU-1 2000 CFM", 4: "AHU-2", 7: "12'6\" x 10'"}
+    print("✓ Delimiters with markdown decoration and any case are recognized")
+
+    assert split_batched_extraction(text, [3, 4]) is None
+    assert split_batched_extraction(text.replace("=== PAGE 4 ===", "PAGE FOUR"), [3, 4, 7]) is None
+    assert split_batched_extraction("=== PAGE 4 ===\nA\n=== PAGE 3 ===\nB", [3, 4]) is None
+    assert split_batched_extraction("=== PAGE 3 ===\n=== PAGE 4 ===\nB", [3, 4]) is None
+    print("✓ Missing, extra, reordered or empty pages reject the whole batch")
+
+
+def test_page_batcher():
+    """Test coalescing into full batches, the linger flush and per-page errors."""
+    print("\n=== Testing Page Batcher ===")
+
+    from backend import server
+
+    sent = []
+
+    async def send(pages):
+        sent.append([p for p, _ in pages])
+        return {p: ValueError("unreadable") if image == "bad" else f"text {p}" for p, image in pages}
+
+    async def scenario():
+        server.VISION_BATCH_LINGER_SECONDS, linger = 0.05, server.VISION_BATCH_LINGER_SECONDS
+        try:
+            batcher = server.PageBatcher(3, send)
+            images = {1: "a", 2: "bad", 3: "c", 4: "d"}
+            results = await asyncio.gather(
+                *(batcher.extract(p, image) for p, image in images.items()), return_exceptions=True
+            )
+            await batcher.aclose()
+            return results
+        finally:
+            server.VISION_BATCH_LINGER_SECONDS = linger
+
+    results = asyncio.run(scenario())
+    assert sent == [[1, 2, 3], [4]], sent
+    assert results[0] == "text 1" and isinstance(results[1], ValueError) and results[3] == "text 4", results
+    print("✓ 3 pages went in one call, the 4th after the linger; a failed page fails alone")
+
+
+def test_generate_with_images_payload():
+    """Test that every image of a batch reaches Ollama in one request, in order."""
+    print("\n=== Testing Multi-Image Requests ===")
+
+    bodies = []
+
+    def handler(request):
+        bodies.append((request.url.path, json.loads(request.content)))
+        if request.url.path == "/api/chat":
+            return httpx.Response(200, json={"message": {"role": "assistant", "content": "ok"}, "done": True})
+        return httpx.Response(200, json={
+            "id": "c", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}]
+        })
+
+    settings = get_settings()
+    saved = settings.ai_provider, settings.ollama_api_mode
+
+    async def scenario(mode):
+        settings.ai_provider, settings.ollama_api_mode = "ollama", mode
+        try:
+            from backend.ai_client import AIClient
+            client = AIClient()
+        finally:
+            settings.ai_provider, settings.ollama_api_mode = saved
+        client.http_client._transport = httpx.MockTransport(handler)
+        text = await client.generate_with_images("pages 1, 2", [b"one", "data:image/jpeg;base64,dHdv"], ["image/png", "image/jpeg"])
+        await client.aclose()
+        return text
+
+    assert asyncio.run(scenario("openai")) == "ok" and asyncio.run(scenario("native")) == "ok"
+    (_, openai_body), (_, native_body) = bodies
+    urls = [part["image_url"]["url"] for part in openai_body["messages"][0]["content"] if part["type"] == "image_url"]
+    assert urls == ["data:image/png;base64,b25l", "data:image/jpeg;base64,dHdv"], urls
+    assert native_body["messages"][0]["images"] == ["b25l", "dHdv"], native_body
+    print("✓ Both images sent in order over the OpenAI-compatible and native APIs")
+
+
+def main():
+    """Run all tests."""
+    print("\n" + "="*60)
+    print("VISION BATCHING TEST SUITE")
+    print("="*60)
+
+    try:
+        test_split_batched_extraction()
+        test_page_batcher()
+        test_generate_with_images_payload()
+
+        print("\n✅ ALL VISION BATCHING TESTS PASSED")
+        return 0
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n❌ UNEXPECTED ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())